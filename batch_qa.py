@@ -0,0 +1,111 @@
+"""
+Batch Question Answering for Knowledge Transfer Assistant
+
+Reads questions from a JSONL file (one {"question": ..., "id": ..., "doc_type": ...}
+object per line), answers them from the existing knowledge base and writes one JSONL
+record per question with the answer, sources and per-stage timings.
+
+Usage:
+    python batch_qa.py questions.jsonl --output answers.jsonl --concurrency 2
+    python batch_qa.py questions.jsonl --retrieval-only --output retrieval.jsonl
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+
+# Add src to path for imports
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+from core.batch_qa import BatchAnswerer, summarize
+from core.chat_bot import ChatBot
+from core.context_builder import ContextBuilder
+from core.embeddings import EmbeddingsManager
+from core.ollama_stub import StubOllamaServer
+from core.retriever import HybridRetriever
+
+
+def read_questions(path: str):
+    """Question dicts from a JSONL file, skipping blank lines"""
+    with open(path, 'r', encoding='utf-8') as file:
+        for line_number, line in enumerate(file, 1):
+            if line.strip():
+                item = json.loads(line)
+                item.setdefault('id', line_number)
+                yield item
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument('questions', help="JSONL file of questions")
+    parser.add_argument('--output', help="JSONL file to write (default: stdout)")
+    parser.add_argument('--db-path', default="data/processed/vector_db")
+    parser.add_argument('--collection', default=EmbeddingsManager.DEFAULT_COLLECTION)
+    parser.add_argument('--model', default="all-MiniLM-L6-v2", help="Embedding model")
+    parser.add_argument('--hybrid', action='store_true', help="Use keyword + vector search")
+    parser.add_argument('--k', type=int, default=8, help="Chunks retrieved per question")
+    parser.add_argument('--batch-size', type=int, default=64, help="Questions encoded per model call")
+    parser.add_argument('--search-workers', type=int, default=4)
+    parser.add_argument('--concurrency', type=int, default=2, help="LLM generations in flight")
+    parser.add_argument('--llm-model', default="llama3.1")
+    parser.add_argument('--ollama-url', default="http://localhost:11434")
+    parser.add_argument('--stub', action='store_true', help="Answer with a local Ollama stub")
+    parser.add_argument('--retrieval-only', action='store_true', help="Skip generation")
+    args = parser.parse_args()
+
+    # Progress messages from the library go to stderr, so stdout carries only the records
+    records_output = sys.stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        answer_questions(args, records_output)
+
+
+def answer_questions(args, records_output):
+    """Answer every question in args.questions, writing records to args.output or records_output"""
+    embeddings_manager = EmbeddingsManager(model_name=args.model, db_path=args.db_path,
+                                           collection_name=args.collection)
+    if embeddings_manager.vector_store.count() == 0:
+        sys.exit(f"❌ Knowledge base '{args.collection}' in {args.db_path} is empty; ingest documents first")
+
+    stub = StubOllamaServer().start() if args.stub and not args.retrieval_only else None
+    chat_bot = None
+    if not args.retrieval_only:
+        chat_bot = ChatBot(model=args.llm_model, base_url=stub.url if stub else args.ollama_url,
+                           pool_size=max(10, args.concurrency))
+
+    answerer = BatchAnswerer(
+        embeddings_manager, chat_bot=chat_bot,
+        retriever=HybridRetriever(embeddings_manager) if args.hybrid else None,
+        context_builder=ContextBuilder(token_budget=1500), n_results=args.k,
+        batch_size=args.batch_size, search_workers=args.search_workers,
+        generation_concurrency=args.concurrency)
+
+    output = open(args.output, 'w', encoding='utf-8') if args.output else records_output
+    records = []
+    start = time.perf_counter()
+    try:
+        for record in answerer.run(read_questions(args.questions)):
+            output.write(json.dumps(record) + "\n")
+            output.flush()
+            records.append({'error': record['error'], 'timings': record['timings']})
+    finally:
+        if args.output:
+            output.close()
+        if chat_bot is not None:
+            chat_bot.close()
+        if stub is not None:
+            stub.stop()
+        embeddings_manager.close()
+
+    summary = summarize(records)
+    elapsed = time.perf_counter() - start
+    print(f"✅ Answered {summary['questions']} questions in {elapsed:.1f}s "
+          f"({summary['errors']} errors)", file=sys.stderr)
+    for stage, seconds in summary['mean_seconds'].items():
+        print(f"   {stage}: {seconds * 1000:.1f} ms mean", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""
+Retrieval and Generation Benchmark for Knowledge Transfer Assistant
+
+Ingests a fixed synthetic corpus into a throwaway vector database, then measures
+ingestion throughput, search_similar latency percentiles, recall@k and MRR against
+the golden question set, and generation latency against a local Ollama stub.
+With --quantization the searches go through an int8 or binary index instead, and its
+recall against exact float search is reported alongside the index size.
+--vector-store numpy swaps Chroma for the in-process exact NumPy store.
+--duplicate-docs adds copies of some PDFs; with --deduplicate the ingestion section
+reports how many chunks were linked instead of embedded and the time and space saved.
+Results are written as JSON so runs can be diffed between commits and settings.
+
+Usage:
+    python benchmarks/run_benchmark.py --docs 20 --pages 10 --output bench.json
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from core.chat_bot import ChatBot
+from core.document_processor import DocumentProcessor
+from core.embeddings import EmbeddingsManager
+from core.ollama_stub import StubOllamaServer
+from core.quantized_index import measure_recall
+from core.query_cache import LRUCache
+from synthetic_corpus import generate_corpus
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """p50/p90/p99/mean of latency samples, in milliseconds"""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def pick(fraction: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))] * 1000
+
+    return {'p50_ms': pick(0.50), 'p90_ms': pick(0.90), 'p99_ms': pick(0.99),
+            'mean_ms': statistics.mean(ordered) * 1000}
+
+
+def git_commit() -> str:
+    """Current commit hash, or 'unknown' outside a git checkout"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def benchmark_ingestion(docs_dir: str, db_dir: str, args) -> Tuple[EmbeddingsManager, Dict]:
+    """Extract, chunk, embed and store the corpus, timing each phase"""
+    processor = DocumentProcessor(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap,
+                                  workers=args.workers)
+    embeddings_manager = EmbeddingsManager(model_name=args.model, db_path=db_dir, cache_dir=None,
+                                           quantization=args.quantization, vector_store=args.vector_store,
+                                           deduplicate=args.deduplicate)
+
+    start = time.perf_counter()
+    chunks = processor.process_documents(docs_dir)
+    extract_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    embeddings_manager.add_documents_stream(chunks)
+    embed_seconds = time.perf_counter() - start
+
+    total_pages = args.docs * args.pages
+    total_seconds = extract_seconds + embed_seconds
+    return embeddings_manager, {
+        'documents': args.docs,
+        'pages': total_pages,
+        'chunks': len(chunks),
+        'extract_seconds': extract_seconds,
+        'embed_seconds': embed_seconds,
+        'pages_per_sec': total_pages / total_seconds,
+        'chunks_per_sec': len(chunks) / total_seconds,
+        'embed_chunks_per_sec': len(chunks) / embed_seconds if embed_seconds else 0.0,
+        'deduplication': embeddings_manager.deduplication_report()
+    }
+
+
+def benchmark_retrieval(embeddings_manager: EmbeddingsManager, golden: List[Dict], args) -> Dict:
+    """Latency percentiles, recall@k and MRR of search_similar over the golden set"""
+    if not args.warm_cache:
+        # A zero-size cache stores nothing, so every query pays encoding and search
+        embeddings_manager.query_embedding_cache = LRUCache(max_size=0)
+        embeddings_manager.result_cache = LRUCache(max_size=0)
+
+    latencies, reciprocal_ranks, hits = [], [], 0
+    for _ in range(args.repeat):
+        for entry in golden:
+            start = time.perf_counter()
+            embeddings_manager.search_similar(entry['question'], n_results=args.k)
+            latencies.append(time.perf_counter() - start)
+
+    page_hits = 0
+    for entry in golden:
+        results = embeddings_manager.search_similar(entry['question'], n_results=args.k)
+        rank = next((i for i, result in enumerate(results, 1)
+                     if result['metadata']['source'] == entry['source']
+                     and entry['answer'] in result['content']), None)
+        hits += rank is not None
+        reciprocal_ranks.append(1.0 / rank if rank else 0.0)
+        if rank:
+            # Golden pages count from 0, chunk metadata pages from 1
+            metadata = results[rank - 1]['metadata']
+            page_hits += metadata.get('page', 0) <= entry['page'] + 1 <= metadata.get('page_end', -1)
+
+    return dict(percentiles(latencies), queries=len(latencies), k=args.k,
+                recall_at_k=hits / len(golden), mrr=statistics.mean(reciprocal_ranks),
+                page_accuracy=page_hits / hits if hits else 0.0)
+
+
+def benchmark_quantization(embeddings_manager: EmbeddingsManager, golden: List[Dict], args) -> Dict:
+    """Top-k overlap of the quantized index with exact float search, and its size"""
+    index = embeddings_manager.quantized_index
+    stored = embeddings_manager.vector_store.get(include=['embeddings'])
+    queries = np.vstack([embeddings_manager.encode_query(entry['question']) for entry in golden])
+    return dict(index.stats(), k=args.k,
+                recall_vs_float=measure_recall(index, np.asarray(stored['embeddings']), stored['ids'],
+                                               queries, k=args.k))
+
+
+def benchmark_generation(embeddings_manager: EmbeddingsManager, golden: List[Dict], args) -> Dict:
+    """Time-to-first-token and total generation time against the Ollama stub"""
+    first_token, totals = [], []
+    with StubOllamaServer(first_token_delay=args.stub_first_token_delay,
+                          token_delay=args.stub_token_delay) as stub:
+        chat_bot = ChatBot(base_url=stub.url)
+        for entry in golden[:args.generation_queries]:
+            results = embeddings_manager.search_similar(entry['question'], n_results=args.k)
+            context_text = "\n\n---\n\n".join(result['content'] for result in results)
+            timings = {}
+            for _ in chat_bot.stream(chat_bot.build_prompt(entry['question'], context_text), timings=timings):
+                pass
+            first_token.append(timings.get('time_to_first_token', timings['total']))
+            totals.append(timings['total'])
+        chat_bot.close()
+
+    return {'queries': len(totals),
+            'time_to_first_token': percentiles(first_token),
+            'total': percentiles(totals)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument('--docs', type=int, default=10, help="Synthetic PDF files")
+    parser.add_argument('--pages', type=int, default=5, help="Pages per PDF")
+    parser.add_argument('--facts', type=int, default=4, help="Golden questions per PDF")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--chunk-size', type=int, default=600)
+    parser.add_argument('--chunk-overlap', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=1, help="Extraction processes")
+    parser.add_argument('--model', default="all-MiniLM-L6-v2")
+    parser.add_argument('--k', type=int, default=3, help="Results per query")
+    parser.add_argument('--repeat', type=int, default=3, help="Latency passes over the golden set")
+    parser.add_argument('--quantization', choices=['int8', 'binary'],
+                        help="Search through a quantized index instead of HNSW")
+    parser.add_argument('--vector-store', choices=['chroma', 'numpy'], default='chroma',
+                        help="Vector store backend")
+    parser.add_argument('--duplicate-docs', type=int, default=0, help="PDFs to add a second copy of")
+    parser.add_argument('--deduplicate', action='store_true', help="Skip near-duplicate chunks at ingestion")
+    parser.add_argument('--warm-cache', action='store_true', help="Keep query/result caches enabled")
+    parser.add_argument('--generation-queries', type=int, default=10)
+    parser.add_argument('--stub-first-token-delay', type=float, default=0.0)
+    parser.add_argument('--stub-token-delay', type=float, default=0.0)
+    parser.add_argument('--output', help="JSON file to write (default: print to stdout)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="kta_bench_") as work_dir:
+        docs_dir = os.path.join(work_dir, "docs")
+        golden = generate_corpus(docs_dir, num_docs=args.docs, pages_per_doc=args.pages,
+                                 facts_per_doc=args.facts, seed=args.seed)
+        for entry in sorted({entry['source'] for entry in golden})[:args.duplicate_docs]:
+            shutil.copy(os.path.join(docs_dir, entry), os.path.join(docs_dir, entry.replace(".pdf", "_copy.pdf")))
+
+        embeddings_manager, ingestion = benchmark_ingestion(docs_dir, os.path.join(work_dir, "vector_db"), args)
+        retrieval = benchmark_retrieval(embeddings_manager, golden, args)
+        quantization = benchmark_quantization(embeddings_manager, golden, args) if args.quantization else None
+        generation = benchmark_generation(embeddings_manager, golden, args)
+        embeddings_manager.close()
+
+    results = {
+        'commit': git_commit(),
+        'config': vars(args),
+        'ingestion': ingestion,
+        'retrieval': retrieval,
+        'quantization': quantization,
+        'generation': generation
+    }
+    output = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(output + "\n")
+        print(f"✅ Benchmark results written to {args.output}")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Synthetic Corpus for Knowledge Transfer Assistant benchmarks
+Generates reproducible PDF runbooks with planted facts and a golden question set
+"""
+
+import random
+import textwrap
+from pathlib import Path
+from typing import Dict, List
+
+
+DOC_TOPICS = ["datapower", "architecture", "standards", "general"]
+
+FILLER_WORDS = [
+    "gateway", "service", "policy", "endpoint", "certificate", "domain", "cluster",
+    "configuration", "deployment", "environment", "request", "response", "firewall",
+    "profile", "handler", "monitor", "queue", "transaction", "schema", "validation",
+    "credential", "token", "routing", "logging", "backup", "restore", "release",
+    "review", "approval", "operator", "runbook", "procedure", "network", "latency",
+    "throughput", "capacity", "failover", "replica", "mapping", "transform"
+]
+
+COMPONENTS = ["gateway", "key store", "message queue", "load balancer", "API manager",
+              "portal", "analytics node", "log target", "crypto profile", "XML firewall"]
+SETTINGS = ["listener port", "timeout in seconds", "retry limit", "pool size",
+            "heartbeat interval", "maximum payload size", "audit level"]
+CODENAMES = ["Orion", "Lyra", "Draco", "Vega", "Altair", "Rigel", "Sirius", "Castor",
+             "Pollux", "Deneb", "Mira", "Antares"]
+
+
+def _pdf_escape(text: str) -> str:
+    """Escape text for a PDF string literal"""
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def write_pdf(path: Path, pages: List[List[str]]) -> None:
+    """Write a minimal text-only PDF, one list of lines per page"""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for lines in pages:
+        stream = "BT /F1 10 Tf 12 TL 50 780 Td " + " ".join(
+            f"({_pdf_escape(line)}) Tj T*" for line in lines) + " ET"
+        stream_bytes = stream.encode('latin-1', errors='replace')
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream_bytes) + stream_bytes + b"\nendstream")
+        content_id = len(objects)
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id)
+        page_ids.append(len(objects))
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+    objects[1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode('ascii')
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref_offset = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        output += b"%010d 00000 n \n" % offset
+    output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+    path.write_bytes(bytes(output))
+
+
+def generate_corpus(output_dir: str, num_docs: int = 10, pages_per_doc: int = 5,
+                    facts_per_doc: int = 4, seed: int = 42) -> List[Dict]:
+    """
+    Write synthetic runbook PDFs and return the golden question set
+
+    Each document is filler prose with a few planted facts that use unique
+    codenames and values, so the chunk answering a question is unambiguous.
+
+    Args:
+        output_dir: Folder to write PDFs into
+        num_docs: Number of PDF files
+        pages_per_doc: Pages per file
+        facts_per_doc: Facts (and golden questions) planted per file
+        seed: Random seed; the same arguments always produce the same corpus
+
+    Returns:
+        Golden entries with question, answer, source and page
+    """
+    rng = random.Random(seed)
+    output = Path(output_dir)
+    output.mkdir(parents=True, exist_ok=True)
+    golden = []
+
+    for doc_index in range(num_docs):
+        topic = DOC_TOPICS[doc_index % len(DOC_TOPICS)]
+        filename = f"synthetic_{topic}_{doc_index:03d}.pdf"
+
+        # Plant facts on random pages
+        facts_by_page: Dict[int, List[str]] = {}
+        for fact_index in range(facts_per_doc):
+            codename = f"{rng.choice(CODENAMES)}-{doc_index:03d}{fact_index}"
+            component, setting = rng.choice(COMPONENTS), rng.choice(SETTINGS)
+            value = str(rng.randint(10000, 99999))
+            page = rng.randrange(pages_per_doc)
+            facts_by_page.setdefault(page, []).append(
+                f"The {setting} of the {component} in environment {codename} is {value}.")
+            golden.append({
+                'question': f"What is the {setting} of the {component} in environment {codename}?",
+                'answer': value,
+                'source': filename,
+                'page': page
+            })
+
+        pages = []
+        for page in range(pages_per_doc):
+            sentences = [" ".join(rng.choice(FILLER_WORDS) for _ in range(rng.randint(8, 16))).capitalize() + "."
+                         for _ in range(18)]
+            for fact in facts_by_page.get(page, []):
+                sentences.insert(rng.randrange(len(sentences) + 1), fact)
+            pages.append(textwrap.wrap(" ".join(sentences), width=95))
+        write_pdf(output / filename, pages)
+
+    return golden
@@ -0,0 +1,148 @@
+"""
+Answer Cache for Knowledge Transfer Assistant
+Persistent cache of generated answers, reused for paraphrased questions with the same context
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+class AnswerCache:
+    """Answers keyed by question embedding similarity and the exact chunks they were based on"""
+
+    def __init__(self, path: str, similarity_threshold: float = 0.92, max_entries: int = 1000,
+                 max_age: Optional[float] = 7 * 24 * 3600):
+        """
+        Initialize the answer cache
+
+        Args:
+            path: SQLite database file
+            similarity_threshold: Cosine similarity a new question needs to a cached one
+            max_entries: Entries kept before the least recently used ones are evicted
+            max_age: Seconds an answer stays valid (None keeps answers until evicted)
+        """
+        self.path = path
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS answers (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    model TEXT NOT NULL,
+                    context_key TEXT NOT NULL,
+                    question TEXT NOT NULL,
+                    embedding BLOB NOT NULL,
+                    answer TEXT NOT NULL,
+                    chunk_ids TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )""")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS answers_context ON answers (context_key)")
+
+    @staticmethod
+    def context_key(results: List[Dict]) -> str:
+        """
+        Fingerprint of the set of retrieved chunks, independent of their order
+
+        Chunk text is part of the fingerprint, so an answer is never reused once one of
+        its chunks was re-ingested with different content, even by another process.
+        """
+        digest = hashlib.sha1()
+        for chunk_id, content in sorted((result.get('id') or "", result['content']) for result in results):
+            digest.update(chunk_id.encode('utf-8'))
+            digest.update(hashlib.sha1(content.encode('utf-8')).digest())
+        return digest.hexdigest()
+
+    def lookup(self, query_embedding: np.ndarray, context_key: str, model: str = "") -> Optional[Dict]:
+        """
+        Cached answer to a similar question asked with the same context
+
+        Returns:
+            Dict with 'answer', the cached 'question' and its 'similarity', or None
+        """
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, question, embedding, answer, created FROM answers "
+                "WHERE context_key = ? AND model = ?", (context_key, model)).fetchall()
+            best, best_similarity = None, self.similarity_threshold
+            for row in rows:
+                if self.max_age is not None and now - row[4] > self.max_age:
+                    continue
+                similarity = self._cosine(query_embedding, np.frombuffer(row[2], dtype=np.float32))
+                if similarity >= best_similarity:
+                    best, best_similarity = row, similarity
+
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            with self._conn:
+                self._conn.execute("UPDATE answers SET last_used = ? WHERE id = ?", (now, best[0]))
+        return {'answer': best[3], 'question': best[1], 'similarity': best_similarity}
+
+    def store(self, question: str, query_embedding: np.ndarray, context_key: str,
+              chunk_ids: List[str], answer: str, model: str = "") -> None:
+        """Cache an answer, then evict expired and least recently used entries"""
+        now = time.time()
+        embedding = np.asarray(query_embedding, dtype=np.float32).tobytes()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO answers (model, context_key, question, embedding, answer, chunk_ids, "
+                "created, last_used) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (model, context_key, question, embedding, answer, json.dumps(sorted(chunk_ids)), now, now))
+            if self.max_age is not None:
+                self._conn.execute("DELETE FROM answers WHERE created < ?", (now - self.max_age,))
+            self._conn.execute(
+                "DELETE FROM answers WHERE id NOT IN "
+                "(SELECT id FROM answers ORDER BY last_used DESC LIMIT ?)", (self.max_entries,))
+
+    def invalidate_chunks(self, chunk_ids: List[str]) -> int:
+        """Drop answers based on any of the given chunks; returns how many were dropped"""
+        changed = set(chunk_ids)
+        if not changed:
+            return 0
+        with self._lock, self._conn:
+            stale = [row[0] for row in self._conn.execute("SELECT id, chunk_ids FROM answers")
+                     if changed.intersection(json.loads(row[1]))]
+            self._conn.executemany("DELETE FROM answers WHERE id = ?", [(entry_id,) for entry_id in stale])
+        return len(stale)
+
+    def clear(self) -> None:
+        """Drop every cached answer"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM answers")
+
+    def stats(self) -> Dict:
+        """Size and hit/miss counters"""
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {'size': size, 'hits': self.hits, 'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0}
+
+    def close(self) -> None:
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _cosine(a: np.ndarray, b: np.ndarray) -> float:
+        """Cosine similarity of two vectors"""
+        if a.shape != b.shape:
+            return -1.0
+        return float(np.dot(a, b) / max(np.linalg.norm(a) * np.linalg.norm(b), 1e-12))
@@ -0,0 +1,137 @@
+"""
+Batch Question Answering for Knowledge Transfer Assistant
+Runs many questions through retrieval and generation concurrently, with per-stage timings
+"""
+
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from .chat_bot import ChatBotError
+from .context_builder import ContextBuilder
+
+
+class BatchAnswerer:
+    """Answers questions in batches: one encode call, concurrent searches, bounded LLM concurrency"""
+
+    def __init__(self, embeddings_manager, chat_bot=None, retriever=None,
+                 context_builder: Optional[ContextBuilder] = None, n_results: int = 8,
+                 batch_size: int = 64, search_workers: int = 4, generation_concurrency: int = 2):
+        """
+        Initialize the batch answerer
+
+        Args:
+            embeddings_manager: EmbeddingsManager used to encode the questions
+            chat_bot: ChatBot that generates answers (None only retrieves)
+            retriever: HybridRetriever or KnowledgeBaseRouter to search with (default
+                the embeddings manager's vector search)
+            context_builder: Packs search results into prompt context
+            n_results: Chunks retrieved per question
+            batch_size: Questions encoded per model call
+            search_workers: Searches run concurrently
+            generation_concurrency: LLM generations in flight at once
+        """
+        self.embeddings_manager = embeddings_manager
+        self.chat_bot = chat_bot
+        self.retriever = retriever or embeddings_manager
+        self.context_builder = context_builder or ContextBuilder()
+        self.n_results = n_results
+        self.batch_size = batch_size
+        self.search_workers = search_workers
+        self.generation_concurrency = generation_concurrency
+
+    def run(self, questions: Iterable[Dict]) -> Iterator[Dict]:
+        """
+        Answer questions, yielding one record per question in input order
+
+        Args:
+            questions: Dicts with a 'question' and optionally 'id' and 'doc_type'
+
+        Yields:
+            The question dict plus 'answer', 'sources', 'error' and per-stage 'timings'
+            in seconds (encode is the question's share of its batch's encode call)
+        """
+        questions = iter(questions)
+        with ThreadPoolExecutor(self.search_workers, thread_name_prefix="batch-search") as search_pool, \
+                ThreadPoolExecutor(self.generation_concurrency, thread_name_prefix="batch-llm") as llm_pool:
+            pending = deque()
+            while True:
+                batch = list(islice(questions, self.batch_size))
+                if not batch:
+                    break
+
+                # Encoding the whole batch at once fills the query embedding cache,
+                # so the searches below skip the model
+                start = time.perf_counter()
+                self.embeddings_manager.encode_queries([item['question'] for item in batch])
+                encode_share = (time.perf_counter() - start) / len(batch)
+
+                for record in search_pool.map(self._retrieve, batch):
+                    record['timings']['encode'] = encode_share
+                    pending.append(llm_pool.submit(self._generate, record))
+
+                # Keep at most about two batches of contexts waiting for the LLM
+                while len(pending) > 2 * self.batch_size:
+                    yield pending.popleft().result()
+
+            while pending:
+                yield pending.popleft().result()
+
+    def _retrieve(self, item: Dict) -> Dict:
+        """Search results and packed context for one question"""
+        record = dict(item, answer=None, sources=[], error=None, timings={})
+        search = getattr(self.retriever, 'search', None) or self.retriever.search_similar
+
+        record['context_text'] = ""
+        try:
+            start = time.perf_counter()
+            results = search(item['question'], n_results=self.n_results, doc_type=item.get('doc_type'))
+            record['timings']['search'] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            context = self.context_builder.build(results)
+            record['timings']['context'] = time.perf_counter() - start
+        except Exception as e:
+            # One failing question should not stop the batch
+            record['error'] = f"Search failed: {str(e)}"
+            return record
+
+        record['context_text'] = context['text']
+        record['sources'] = [{
+            'source': passage['metadata']['source'],
+            'page': passage['metadata'].get('page'),
+            'score': passage['similarity_score']
+        } for passage in context['passages']]
+        return record
+
+    def _generate(self, record: Dict) -> Dict:
+        """Generate the answer for one retrieved question"""
+        context_text = record.pop('context_text')
+        if self.chat_bot is not None and record['error'] is None:
+            timings: Dict[str, float] = {}
+            try:
+                prompt = self.chat_bot.build_prompt(record['question'], context_text)
+                record['answer'] = "".join(self.chat_bot.stream(prompt, timings=timings))
+            except ChatBotError as e:
+                record['error'] = str(e)
+            record['timings']['time_to_first_token'] = timings.get('time_to_first_token')
+            record['timings']['generate'] = timings.get('total')
+        record['timings']['total'] = sum(record['timings'].get(stage) or 0.0
+                                         for stage in ('encode', 'search', 'context', 'generate'))
+        return record
+
+
+def summarize(records: List[Dict]) -> Dict:
+    """Question and error counts plus mean seconds per stage"""
+    stages: Dict[str, List[float]] = {}
+    for record in records:
+        for stage, seconds in record['timings'].items():
+            if seconds is not None:
+                stages.setdefault(stage, []).append(seconds)
+    return {
+        'questions': len(records),
+        'errors': sum(1 for record in records if record['error']),
+        'mean_seconds': {stage: sum(values) / len(values) for stage, values in stages.items()}
+    }
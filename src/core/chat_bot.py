@@ -0,0 +1,171 @@
+"""
+Chat Bot for Knowledge Transfer Assistant
+Streams answers from a local Ollama model over a pooled HTTP session
+"""
+
+import json
+import threading
+import time
+from typing import Dict, Iterator, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .instrumentation import metrics
+
+
+class ChatBotError(Exception):
+    """Raised when the LLM cannot be reached or fails to answer in time"""
+
+
+class ChatBot:
+    """Generates answers to questions from retrieved documentation using Ollama"""
+
+    def __init__(self, model: str = "llama3.1", base_url: str = "http://localhost:11434",
+                 connect_timeout: float = 3.05, read_timeout: float = 60.0,
+                 max_duration: Optional[float] = 300.0, pool_size: int = 10):
+        """
+        Initialize the chat bot
+
+        Args:
+            model: Ollama model name
+            base_url: Ollama server URL
+            connect_timeout: Seconds to wait for the connection to open
+            read_timeout: Seconds to wait for the next streamed token before giving up
+            max_duration: Seconds after which a generation is cancelled (None for no limit)
+            pool_size: Keep-alive connections kept open to the server
+        """
+        self.model = model
+        self.base_url = base_url.rstrip('/')
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_duration = max_duration
+
+        # One pooled session reuses connections instead of opening one per message
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        # Timings of the most recent generation, in seconds
+        self.last_timings: Dict[str, float] = {}
+
+    @staticmethod
+    def build_prompt(question: str, context_text: str, history: str = "") -> str:
+        """Prompt asking the model to answer from the documentation excerpts (and earlier turns, if any)"""
+        conversation = f"""
+CONVERSATION SO FAR (use it to resolve what the question refers to):
+{history}
+""" if history else ""
+        return f"""You are a helpful technical assistant specializing in DataPower, API Connect, and IT environment management.
+
+Based on the following documentation excerpts, provide a clear, structured answer to the user's question.
+{conversation}
+DOCUMENTATION:
+{context_text}
+
+USER QUESTION: {question}
+
+Please provide:
+1. A direct answer to the question
+2. Step-by-step instructions if applicable
+3. Key points organized clearly
+4. Mention which aspects come from the documentation
+
+Format your response to be helpful for someone learning these technologies."""
+
+    def stream(self, prompt: str, cancel_event: Optional[threading.Event] = None,
+               timings: Optional[Dict[str, float]] = None) -> Iterator[str]:
+        """
+        Yield response tokens as the model generates them
+
+        The generation is cancelled (and the connection closed) when cancel_event is
+        set, when max_duration is exceeded, or when the caller stops iterating.
+
+        Args:
+            prompt: Full prompt to send
+            cancel_event: Set from another thread to stop the generation
+            timings: Dict filled with time_to_first_token and total (also kept in last_timings)
+
+        Raises:
+            ChatBotError: If the server cannot be reached, errors, or stalls past read_timeout
+        """
+        start = time.perf_counter()
+        # Written through the local name, so concurrent streams never fill each other's dict
+        timings = timings if timings is not None else {}
+        self.last_timings = timings
+        try:
+            response = self.session.post(
+                f"{self.base_url}/api/generate",
+                json={'model': self.model, 'prompt': prompt, 'stream': True},
+                stream=True,
+                timeout=(self.connect_timeout, self.read_timeout)
+            )
+        except requests.Timeout as e:
+            raise ChatBotError(f"Ollama did not respond in time: {str(e)}") from e
+        except requests.RequestException as e:
+            raise ChatBotError(f"Could not reach Ollama at {self.base_url}: {str(e)}") from e
+
+        try:
+            if response.status_code != 200:
+                raise ChatBotError(f"Ollama returned HTTP {response.status_code}: {response.text[:200]}")
+
+            for line in response.iter_lines():
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+                if self.max_duration is not None and time.perf_counter() - start > self.max_duration:
+                    raise ChatBotError(f"Generation cancelled after {self.max_duration:.0f}s")
+                if not line:
+                    continue
+
+                chunk = json.loads(line)
+                if chunk.get('error'):
+                    raise ChatBotError(f"Ollama error: {chunk['error']}")
+                token = chunk.get('response', '')
+                if token:
+                    if 'time_to_first_token' not in timings:
+                        timings['time_to_first_token'] = time.perf_counter() - start
+                        metrics.observe("llm_time_to_first_token", timings['time_to_first_token'])
+                    yield token
+                if chunk.get('done'):
+                    break
+
+        except requests.RequestException as e:
+            raise ChatBotError(f"Ollama stopped responding: {str(e)}") from e
+        except ValueError as e:
+            raise ChatBotError(f"Unexpected response from Ollama: {str(e)}") from e
+        finally:
+            # Closing the response aborts the generation on the server side
+            response.close()
+            timings['total'] = time.perf_counter() - start
+            metrics.observe("llm_generate", timings['total'])
+
+    def generate(self, prompt: str) -> str:
+        """Full response text for a prompt"""
+        return "".join(self.stream(prompt))
+
+    def is_available(self) -> bool:
+        """True if the Ollama server answers"""
+        try:
+            return self.session.get(f"{self.base_url}/api/tags", timeout=self.connect_timeout).ok
+        except requests.RequestException:
+            return False
+
+    @staticmethod
+    def format_sources(results: List[Dict]) -> str:
+        """Markdown list of the sources behind an answer"""
+        sources = "---\n**📚 Sources:**"
+        for result in results:
+            metadata = result['metadata']
+            pages = ""
+            if metadata.get('page') is not None:
+                page_end = metadata.get('page_end', metadata['page'])
+                pages = f", p. {metadata['page']}"
+                if page_end != metadata['page']:
+                    pages = f", pp. {metadata['page']}-{page_end}"
+            sources += f"\n- **{metadata['source']}**{pages} (Relevance: {result['similarity_score']:.2f})"
+        return sources
+
+    def close(self) -> None:
+        """Close pooled connections"""
+        self.session.close()
@@ -0,0 +1,171 @@
+"""
+Context Builder for Knowledge Transfer Assistant
+Packs retrieved chunks into a token budget, merging overlaps and dropping near-duplicates
+"""
+
+import re
+from typing import Dict, List, Optional, Set
+
+from .instrumentation import metrics
+
+
+class ContextBuilder:
+    """Turns search results into compact prompt context"""
+
+    def __init__(self, token_budget: int = 1500, chars_per_token: float = 4.0,
+                 dedup_threshold: float = 0.8, min_passage_tokens: int = 50,
+                 max_overlap_chars: int = 1000, separator: str = "\n\n---\n\n"):
+        """
+        Initialize the context builder
+
+        Args:
+            token_budget: Maximum estimated tokens of context text
+            chars_per_token: Characters per token used for the estimate
+            dedup_threshold: Shingle overlap at which a passage counts as a near-duplicate
+            min_passage_tokens: Smallest truncated passage worth including at the end of the budget
+            max_overlap_chars: Longest text overlap searched for between adjacent chunks
+            separator: Text placed between passages
+        """
+        self.token_budget = token_budget
+        self.chars_per_token = chars_per_token
+        self.dedup_threshold = dedup_threshold
+        self.min_passage_tokens = min_passage_tokens
+        self.max_overlap_chars = max_overlap_chars
+        self.separator = separator
+
+    def estimate_tokens(self, text: str) -> int:
+        """Rough token count without loading a tokenizer"""
+        return int(len(text) / self.chars_per_token + 0.5)
+
+    @metrics.timed("context_build")
+    def build(self, results: List[Dict]) -> Dict:
+        """
+        Build prompt context from search results
+
+        Adjacent chunks of the same source are merged into one passage, near-duplicate
+        passages are dropped, and the highest-scoring passages are packed into the budget.
+        Passages are ranked by rerank_score if every result was reranked, otherwise by
+        similarity_score.
+
+        Args:
+            results: Results from search_similar or HybridRetriever.search
+
+        Returns:
+            Dict with 'text', estimated 'tokens', and 'passages' (in the search result
+            format, with the chunk IDs they cover under 'ids')
+        """
+        passages = self._merge_adjacent(results)
+        passages = self._drop_near_duplicates(passages)
+
+        packed, used_tokens = [], 0
+        separator_tokens = self.estimate_tokens(self.separator)
+        for passage in passages:
+            remaining = self.token_budget - used_tokens - (separator_tokens if packed else 0)
+            tokens = self.estimate_tokens(passage['content'])
+            if tokens > remaining:
+                if remaining < self.min_passage_tokens:
+                    continue
+                passage = dict(passage, content=self._truncate(passage['content'], remaining), truncated=True)
+                tokens = self.estimate_tokens(passage['content'])
+            packed.append(passage)
+            used_tokens += tokens + (separator_tokens if len(packed) > 1 else 0)
+
+        metrics.increment("context_tokens", used_tokens)
+        return {
+            'text': self.separator.join(passage['content'] for passage in packed),
+            'tokens': used_tokens,
+            'passages': packed
+        }
+
+    def _merge_adjacent(self, results: List[Dict]) -> List[Dict]:
+        """Merge runs of consecutive chunk_ids from the same source, best ranked first"""
+        by_source: Dict[str, List[Dict]] = {}
+        for result in results:
+            by_source.setdefault(result['metadata']['source'], []).append(result)
+
+        passages = []
+        for source_results in by_source.values():
+            source_results.sort(key=lambda result: result['metadata'].get('chunk_id', 0))
+            current: Optional[Dict] = None
+            for result in source_results:
+                chunk_id = result['metadata'].get('chunk_id')
+                if current is not None and chunk_id is not None and chunk_id == current['last_chunk_id'] + 1:
+                    current['content'] = self._join_overlapping(current['content'], result['content'])
+                    current['ids'].append(result.get('id'))
+                    current['similarity_score'] = max(current['similarity_score'], result['similarity_score'])
+                    if 'rerank_score' in result:
+                        current['rerank_score'] = max(current.get('rerank_score', result['rerank_score']),
+                                                      result['rerank_score'])
+                    current['last_chunk_id'] = chunk_id
+                    # The merged passage ends where the later chunk does
+                    for key in ('page_end', 'char_end'):
+                        if key in result['metadata']:
+                            current['metadata'][key] = result['metadata'][key]
+                    continue
+                if current is not None:
+                    passages.append(current)
+                current = {
+                    'content': result['content'],
+                    'metadata': dict(result['metadata']),
+                    'similarity_score': result['similarity_score'],
+                    'ids': [result.get('id')],
+                    'last_chunk_id': chunk_id if chunk_id is not None else -2
+                }
+                if 'rerank_score' in result:
+                    current['rerank_score'] = result['rerank_score']
+            if current is not None:
+                passages.append(current)
+
+        for passage in passages:
+            del passage['last_chunk_id']
+        # Cross-encoder scores where every result has one: fused or vector scores would undo their order
+        reranked = all('rerank_score' in passage for passage in passages)
+        return sorted(passages, key=lambda passage: passage['rerank_score' if reranked else 'similarity_score'],
+                      reverse=True)
+
+    def _join_overlapping(self, first: str, second: str) -> str:
+        """Concatenate two chunks, keeping the text they share only once"""
+        tail = first[-self.max_overlap_chars:]
+        probe = second[:20]
+        start = tail.find(probe) if probe else -1
+        while start != -1:
+            overlap = tail[start:]
+            if second.startswith(overlap):
+                return first + second[len(overlap):]
+            start = tail.find(probe, start + 1)
+        return first + "\n" + second
+
+    def _drop_near_duplicates(self, passages: List[Dict]) -> List[Dict]:
+        """Keep a passage only if it is not mostly contained in a better-scoring one"""
+        kept, kept_shingles = [], []
+        for passage in passages:
+            shingles = self._shingles(passage['content'])
+            if any(self._containment(shingles, other) >= self.dedup_threshold for other in kept_shingles):
+                continue
+            kept.append(passage)
+            kept_shingles.append(shingles)
+        return kept
+
+    @staticmethod
+    def _shingles(text: str, size: int = 5) -> Set[tuple]:
+        """Word n-grams of the text"""
+        words = re.findall(r"\w+", text.lower())
+        if len(words) < size:
+            return {tuple(words)} if words else set()
+        return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+    @staticmethod
+    def _containment(shingles: Set[tuple], other: Set[tuple]) -> float:
+        """Fraction of shingles that also appear in other"""
+        if not shingles:
+            return 1.0
+        return len(shingles & other) / len(shingles)
+
+    def _truncate(self, text: str, tokens: int) -> str:
+        """Cut text to roughly the given number of tokens, at a sentence or word boundary"""
+        limit = int(tokens * self.chars_per_token)
+        cut = text[:limit]
+        boundary = max(cut.rfind(". "), cut.rfind("\n"))
+        if boundary < limit // 2:
+            boundary = cut.rfind(" ")
+        return cut[:boundary + 1].rstrip() if boundary > 0 else cut
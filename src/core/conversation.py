@@ -0,0 +1,195 @@
+"""
+Conversation Memory for Knowledge Transfer Assistant
+Bounded chat history for follow-up questions: recent turns verbatim, older ones as a rolling summary
+"""
+
+import re
+import threading
+from concurrent.futures import Executor
+from typing import Dict, List, Optional
+
+from .chat_bot import ChatBotError
+from .instrumentation import metrics
+from .retriever import tokenize
+
+
+# Words that carry no topic, left out of the terms a follow-up query inherits
+STOPWORDS = frozenset("""
+a about after all also am an and any are as at be been before but by can could do does
+did for from get got had has have how i if in into is it its just me my need no not of
+on one or our please should so some tell than that the their them then there these they
+this those to up us use using was we what when where which who why will with would you your
+""".split())
+
+# A question opening with one of these leans on the previous turn, as does one using a
+# pronoun as the object of a verb ("renew it"); "that", "one" and "there" are left out
+# because standalone questions use them too ("the command that...", "how does one...")
+FOLLOW_UP_OPENERS = ("and ", "but ", "also ", "then ", "so ", "what about", "how about", "what if")
+FOLLOW_UP_PRONOUNS = frozenset(("it", "its", "this", "those", "these", "they", "them"))
+
+
+class ConversationMemory:
+    """One chat session's history, rewriting follow-ups into standalone queries for retrieval"""
+
+    def __init__(self, chat_bot=None, executor: Optional[Executor] = None, recent_turns: int = 3,
+                 max_summary_chars: int = 1200, max_answer_chars: int = 400, max_topic_terms: int = 8):
+        """
+        Initialize the conversation memory
+
+        Args:
+            chat_bot: ChatBot that folds old turns into the summary (None keeps an
+                extractive summary of the questions and first answer sentences)
+            executor: Runs summary updates in the background (None updates inline)
+            recent_turns: Turns kept verbatim; older ones only survive in the summary
+            max_summary_chars: Upper bound on the summary length
+            max_answer_chars: Characters of each recent answer included in the prompt
+            max_topic_terms: Terms from earlier questions added to a follow-up query
+        """
+        self.chat_bot = chat_bot
+        self.executor = executor
+        self.recent_turns = recent_turns
+        self.max_summary_chars = max_summary_chars
+        self.max_answer_chars = max_answer_chars
+        self.max_topic_terms = max_topic_terms
+
+        self.turns: List[Dict] = []
+        self.summary = ""
+        self._summarized = 0  # turns folded into the summary so far
+        self._updating = False
+        self._lock = threading.Lock()
+
+    def is_follow_up(self, question: str) -> bool:
+        """True if the question probably depends on earlier turns to make sense"""
+        if not self.turns:
+            return False
+        text = question.strip().lower()
+        tokens = tokenize(text)
+        if text.startswith(FOLLOW_UP_OPENERS) or all(token in STOPWORDS for token in tokens):
+            return True
+        # A pronoun right after a topic word is its object: "how do I renew it"
+        return any(token in FOLLOW_UP_PRONOUNS and tokens[i - 1] not in STOPWORDS
+                   for i, token in enumerate(tokens) if i > 0)
+
+    @metrics.timed("query_rewrite")
+    def rewrite_query(self, question: str) -> str:
+        """
+        Standalone search query for a question
+
+        Follow-ups inherit the topic terms of the previous query they build on, e.g.
+        "and how do I renew it?" after "How do I install an SSL certificate?" becomes
+        "and how do I renew it? install ssl certificate". Other questions are returned
+        unchanged. No model call is made, so rewriting adds no noticeable latency.
+        """
+        if not self.is_follow_up(question):
+            return question
+        with self._lock:
+            previous = self.turns[-1]['query']
+        own_terms = set(tokenize(question))
+        inherited = []
+        for token in tokenize(previous):
+            if token not in STOPWORDS and token not in own_terms and token not in inherited and len(token) > 1:
+                inherited.append(token)
+        if not inherited:
+            return question
+        return f"{question.strip()} {' '.join(inherited[:self.max_topic_terms])}"
+
+    def add_turn(self, question: str, answer: str, query: Optional[str] = None) -> None:
+        """
+        Record a finished exchange
+
+        Turns that fall out of the recent window are folded into the summary in the
+        background, so the next question never waits for it.
+
+        Args:
+            question: What the user asked
+            answer: The answer shown (without the sources list)
+            query: The rewritten query used for retrieval (default the question)
+        """
+        with self._lock:
+            self.turns.append({'question': question, 'answer': answer, 'query': query or question})
+        self._schedule_summary()
+
+    def history_text(self) -> str:
+        """Summary plus the recent turns, for the prompt; bounded whatever the chat length"""
+        with self._lock:
+            summary = self.summary
+            # Turns still waiting for a background summary are shown verbatim, up to a limit
+            recent = self.turns[max(self._summarized, len(self.turns) - 2 * self.recent_turns):]
+        parts = [f"Summary of earlier conversation: {summary}"] if summary else []
+        for turn in recent:
+            answer = self._truncate(turn['answer'], self.max_answer_chars)
+            parts.append(f"User: {turn['question']}\nAssistant: {answer}")
+        return "\n\n".join(parts)
+
+    def clear(self) -> None:
+        """Forget the conversation"""
+        with self._lock:
+            self.turns, self.summary, self._summarized = [], "", 0
+
+    def _schedule_summary(self) -> None:
+        """Start a summary update if turns left the recent window and none is running"""
+        with self._lock:
+            if self._updating or len(self.turns) - self._summarized <= self.recent_turns:
+                return
+            self._updating = True
+        if self.executor is None:
+            self._update_summary()
+        else:
+            self.executor.submit(self._update_summary)
+
+    def _update_summary(self) -> None:
+        """Fold every turn older than the recent window into the summary"""
+        try:
+            with self._lock:
+                summary = self.summary
+                end = len(self.turns) - self.recent_turns
+                old_turns = self.turns[self._summarized:end]
+                cleared = self.turns
+            with metrics.span("conversation_summary"):
+                summary = self._summarize(summary, old_turns)
+            with self._lock:
+                # A clear() while summarizing starts over with a new turns list
+                if self.turns is cleared:
+                    self.summary = summary
+                    self._summarized = end
+        finally:
+            with self._lock:
+                self._updating = False
+        # Turns may have been added while the model was summarizing
+        self._schedule_summary()
+
+    def _summarize(self, summary: str, turns: List[Dict]) -> str:
+        """New summary covering the old summary and the given turns"""
+        if self.chat_bot is not None:
+            exchanges = "\n\n".join(f"User: {turn['question']}\nAssistant: {self._truncate(turn['answer'], 1000)}"
+                                    for turn in turns)
+            prompt = f"""Update the summary of a technical support conversation with the new exchanges.
+Keep the products, components, settings and decisions discussed. Answer with the summary only,
+in at most {self.max_summary_chars // 6} words.
+
+CURRENT SUMMARY:
+{summary or "(none)"}
+
+NEW EXCHANGES:
+{exchanges}"""
+            try:
+                return self._truncate(self.chat_bot.generate(prompt).strip(), self.max_summary_chars)
+            except ChatBotError as e:
+                print(f"Falling back to an extractive conversation summary: {str(e)}")
+
+        # Extractive fallback: each question with the first sentence of its answer,
+        # dropping the oldest material once the summary is full
+        lines = [summary] if summary else []
+        for turn in turns:
+            first_sentence = re.split(r"(?<=[.!?])\s", turn['answer'].strip(), maxsplit=1)[0]
+            lines.append(f"Asked: {turn['question']} Answer: {self._truncate(first_sentence, 200)}")
+        text = " ".join(lines)
+        if len(text) > self.max_summary_chars:
+            text = text[-self.max_summary_chars:]
+            text = text[max(0, text.find("Asked: ")):]
+        return text
+
+    @staticmethod
+    def _truncate(text: str, max_chars: int) -> str:
+        """Text cut to max_chars, marked with an ellipsis if it was cut"""
+        return text if len(text) <= max_chars else text[:max_chars].rstrip() + "..."
@@ -0,0 +1,275 @@
+"""
+Near-Duplicate Detection for Knowledge Transfer Assistant
+MinHash signatures with LSH banding, so copies and revisions of a chunk are embedded only once
+"""
+
+import hashlib
+import json
+import os
+import threading
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .retriever import tokenize
+
+
+# Prime just above 2**32: (a * x + b) % p stays exact in uint64 for 32-bit a, b and x
+HASH_PRIME = np.uint64(4294967311)
+
+
+class NearDuplicateIndex:
+    """MinHash index over stored chunks, linking new chunks that nearly repeat one of them"""
+
+    def __init__(self, path: Optional[str] = None, threshold: float = 0.8, num_perm: int = 128,
+                 bands: int = 32, shingle_size: int = 3, seed: int = 1):
+        """
+        Initialize the near-duplicate index
+
+        Args:
+            path: Folder the index is saved in (None keeps it in memory only)
+            threshold: Estimated Jaccard similarity of word shingles at which a chunk
+                counts as a duplicate
+            num_perm: MinHash permutations per signature
+            bands: LSH bands (num_perm must divide evenly); more bands find less similar candidates
+            shingle_size: Words per shingle
+            seed: Seed of the hash permutations (must not change once an index is saved)
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.path = path
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, 2 ** 32, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, 2 ** 32, size=num_perm, dtype=np.uint64)
+
+        self.signatures: Dict[str, np.ndarray] = {}     # canonical chunk ID -> signature
+        self.content_hashes: Dict[str, str] = {}        # exact content hash -> canonical chunk ID
+        self._hash_of: Dict[str, str] = {}              # canonical chunk ID -> its content hash
+        self.links: Dict[str, Dict] = {}                # duplicate chunk ID -> canonical ID, similarity, chunk
+        self._buckets: Dict[Tuple[int, bytes], set] = defaultdict(set)
+        # Chunks encoded and the seconds that took, and the vector dimension, saved with
+        # the index so the savings of linking duplicates can be reported after a restart
+        self.encoding = {'chunks': 0, 'seconds': 0.0, 'dimension': 0}
+        self._dirty = False  # changed since the last save or load
+        self._lock = threading.Lock()
+
+        if path and os.path.exists(os.path.join(path, "index.json")):
+            self.load()
+
+    def __len__(self) -> int:
+        return len(self.signatures)
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash signature of a text's word shingles"""
+        tokens = tokenize(text)
+        size = min(self.shingle_size, len(tokens)) or 1
+        shingles = {" ".join(tokens[i:i + size]) for i in range(max(1, len(tokens) - size + 1))}
+        hashes = np.fromiter((zlib.crc32(shingle.encode('utf-8')) for shingle in shingles),
+                             dtype=np.uint64, count=len(shingles))
+        permuted = (self._a[:, None] * hashes[None, :] + self._b[:, None]) % HASH_PRIME
+        return permuted.min(axis=1).astype(np.uint32)
+
+    def filter(self, documents: List[Dict], ids: List[str]) -> Tuple[List[Dict], List[str], List[Dict]]:
+        """
+        Chunks that are not near-duplicates of an indexed chunk
+
+        Kept chunks are indexed, so later chunks (also in the same call) are checked
+        against them; duplicates are linked to the chunk they repeat instead.
+
+        Args:
+            documents: Chunk dicts, as passed to EmbeddingsManager.add_documents_stream
+            ids: Vector database ID of each chunk
+
+        Returns:
+            The chunks to store; the IDs of stored chunks that were re-ingested as
+            duplicates, which must be deleted from the vector database; and the linked
+            copies of re-ingested stored chunks, which must be ingested again to be
+            checked against the new version
+        """
+        kept, replaced, orphans = [], [], []
+        with self._lock:
+            self._dirty = self._dirty or bool(documents)
+            for doc, chunk_id in zip(documents, ids):
+                # A re-ingested chunk replaces its earlier self, and the copies linked to it
+                # no longer necessarily repeat it
+                stored = chunk_id in self.signatures
+                if stored:
+                    orphans.extend(self.links.pop(duplicate_id)['chunk']
+                                   for duplicate_id in self._copies_of(chunk_id))
+                self._remove(chunk_id)
+                signature = self.signature(doc['content'])
+                content_hash = self._content_hash(doc['content'])
+
+                match = self._find(signature, content_hash)
+                if match is None:
+                    self._add(chunk_id, signature, content_hash)
+                    kept.append(doc)
+                else:
+                    canonical_id, similarity = match
+                    self.links[chunk_id] = {'canonical': canonical_id, 'similarity': similarity, 'chunk': dict(doc)}
+                    if stored:
+                        replaced.append(chunk_id)
+        return kept, replaced, orphans
+
+    def add(self, ids: List[str], texts: List[str]) -> None:
+        """Index chunks as canonical without checking them, e.g. when rebuilding from the vector database"""
+        with self._lock:
+            self._dirty = self._dirty or bool(ids)
+            for chunk_id, text in zip(ids, texts):
+                self._remove(chunk_id)
+                self._add(chunk_id, self.signature(text), self._content_hash(text))
+
+    def remove(self, ids: List[str]) -> List[Dict]:
+        """
+        Forget chunks
+
+        Returns:
+            Linked duplicates whose canonical chunk was removed but which were not
+            removed themselves; they must be ingested again to stay searchable
+        """
+        removed = set(ids)
+        with self._lock:
+            for chunk_id in removed:
+                self._remove(chunk_id)
+            orphaned = [chunk_id for chunk_id, link in self.links.items()
+                        if link['canonical'] in removed or link['canonical'] not in self.signatures]
+            return [self.links.pop(chunk_id)['chunk'] for chunk_id in orphaned]
+
+    def record_encoding(self, chunks: int, seconds: float, dimension: int) -> None:
+        """Add the cost of encoding kept chunks, for estimating what skipping duplicates saved"""
+        with self._lock:
+            self.encoding['chunks'] += chunks
+            self.encoding['seconds'] += seconds
+            self.encoding['dimension'] = dimension
+            self._dirty = True
+
+    def duplicate_ids(self, source: str) -> List[str]:
+        """IDs of the linked duplicates from a source file"""
+        with self._lock:
+            return [chunk_id for chunk_id, link in self.links.items() if link['chunk']['source'] == source]
+
+    def duplicates_of(self, chunk_id: str) -> List[Dict]:
+        """Chunks linked to a stored chunk, e.g. the same passage in other versions of a guide"""
+        with self._lock:
+            return [dict(self.links[duplicate_id]['chunk'], id=duplicate_id,
+                         similarity=self.links[duplicate_id]['similarity'])
+                    for duplicate_id in self._copies_of(chunk_id)]
+
+    def clear(self) -> None:
+        """Forget every chunk and link"""
+        with self._lock:
+            self.signatures, self.content_hashes, self._hash_of, self.links = {}, {}, {}, {}
+            self._buckets = defaultdict(set)
+            self._dirty = True
+
+    def stats(self) -> Dict:
+        """Indexed chunks, linked duplicates, the text they did not add to the index and the encoding cost"""
+        with self._lock:
+            return {
+                'indexed_chunks': len(self.signatures),
+                'duplicates': len(self.links),
+                'duplicate_chars': sum(len(link['chunk']['content']) for link in self.links.values()),
+                'encoding': dict(self.encoding)
+            }
+
+    def save(self) -> None:
+        """Write the index to disk atomically, if it changed"""
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            os.makedirs(self.path, exist_ok=True)
+            ids = list(self.signatures)
+            signatures = np.vstack([self.signatures[chunk_id] for chunk_id in ids]) if ids \
+                else np.empty((0, self.num_perm), dtype=np.uint32)
+            with open(os.path.join(self.path, "signatures.npy.tmp"), 'wb') as file:
+                np.save(file, signatures)
+            tmp_path = os.path.join(self.path, "index.json.tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as file:
+                json.dump({'num_perm': self.num_perm, 'ids': ids,
+                           'content_hashes': [self._hash_of.get(chunk_id) for chunk_id in ids],
+                           'links': self.links, 'encoding': self.encoding}, file)
+            os.replace(os.path.join(self.path, "signatures.npy.tmp"), os.path.join(self.path, "signatures.npy"))
+            os.replace(tmp_path, os.path.join(self.path, "index.json"))
+            self._dirty = False
+
+    def load(self) -> None:
+        """Load the index from disk, starting empty if it is unreadable"""
+        try:
+            with open(os.path.join(self.path, "index.json"), 'r', encoding='utf-8') as file:
+                data = json.load(file)
+            signatures = np.load(os.path.join(self.path, "signatures.npy"))
+            if data['num_perm'] != self.num_perm or len(signatures) != len(data['ids']):
+                raise ValueError("index was built with different settings")
+            self.clear()
+            for chunk_id, signature, content_hash in zip(data['ids'], signatures, data['content_hashes']):
+                self._add(chunk_id, signature, content_hash)
+            self.links = data['links']
+            self.encoding = data.get('encoding', self.encoding)
+            self._dirty = False
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Ignoring unreadable duplicate index {self.path}: {str(e)}")
+            self.clear()
+
+    def _find(self, signature: np.ndarray, content_hash: str) -> Optional[Tuple[str, float]]:
+        """Most similar indexed chunk at or above the threshold; caller holds the lock"""
+        if content_hash in self.content_hashes:
+            return self.content_hashes[content_hash], 1.0
+        candidates = set()
+        for band, key in enumerate(self._band_keys(signature)):
+            candidates.update(self._buckets.get((band, key), ()))
+        best = None
+        for candidate in candidates:
+            similarity = float(np.mean(self.signatures[candidate] == signature))
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (candidate, similarity)
+        return best
+
+    def _copies_of(self, chunk_id: str) -> List[str]:
+        """IDs of the duplicates linked to a canonical chunk; caller holds the lock"""
+        return [duplicate_id for duplicate_id, link in self.links.items() if link['canonical'] == chunk_id]
+
+    def _add(self, chunk_id: str, signature: np.ndarray, content_hash: Optional[str]) -> None:
+        """Index a canonical chunk; caller holds the lock"""
+        self.signatures[chunk_id] = signature
+        if content_hash:
+            self._hash_of[chunk_id] = content_hash
+            self.content_hashes.setdefault(content_hash, chunk_id)
+        for band, key in enumerate(self._band_keys(signature)):
+            self._buckets[(band, key)].add(chunk_id)
+
+    def _remove(self, chunk_id: str) -> None:
+        """Drop a chunk or link; caller holds the lock"""
+        if self.links.pop(chunk_id, None) is not None:
+            self._dirty = True
+        signature = self.signatures.pop(chunk_id, None)
+        if signature is None:
+            return
+        self._dirty = True
+        for band, key in enumerate(self._band_keys(signature)):
+            bucket = self._buckets.get((band, key))
+            if bucket is not None:
+                bucket.discard(chunk_id)
+                if not bucket:
+                    del self._buckets[(band, key)]
+        content_hash = self._hash_of.pop(chunk_id, None)
+        if self.content_hashes.get(content_hash) == chunk_id:
+            del self.content_hashes[content_hash]
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        """LSH bucket key of each band of a signature"""
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    @staticmethod
+    def _content_hash(text: str) -> str:
+        """Hash of a chunk's normalized words, for exact duplicates"""
+        return hashlib.sha1(" ".join(tokenize(text)).encode('utf-8')).hexdigest()
@@ -4,83 +4,241 @@ Handles multiple document types: DataPower, Architecture, Web Standards
 """
 
 import os
-from typing import List, Dict
+import bisect
+import hashlib
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Iterable, Iterator, Optional, Tuple
 from pathlib import Path
 try:
     import PyPDF2
 except ImportError:
     import pypdf as PyPDF2
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from .instrumentation import metrics
+from .text_splitter import RecursiveTextSplitter
+
+
+def _extract_pages(file_path: str, start: int = 0, end: Optional[int] = None) -> List[str]:
+    """Extract the text of pages [start, end) of a PDF (runs in worker processes)"""
+    try:
+        with open(file_path, 'rb') as file:
+            pdf_reader = PyPDF2.PdfReader(file)
+            end = len(pdf_reader.pages) if end is None else min(end, len(pdf_reader.pages))
+            return [pdf_reader.pages[page_num].extract_text() for page_num in range(start, end)]
+            
+    except Exception as e:
+        print(f"Error reading PDF {file_path}: {str(e)}")
+        return []
+
+
+def _count_pages(file_path: str) -> int:
+    """Number of pages in a PDF, or 0 if it cannot be read"""
+    try:
+        with open(file_path, 'rb') as file:
+            return len(PyPDF2.PdfReader(file).pages)
+    except Exception as e:
+        print(f"Error reading PDF {file_path}: {str(e)}")
+        return 0
 
 
 class DocumentProcessor:
     """Processes various document types for RAG system"""
     
-    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200):
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200,
+                 workers: Optional[int] = 1, max_in_flight: Optional[int] = None,
+                 pages_per_task: Optional[int] = None, splitter: str = "native",
+                 page_store=None):
         """
         Initialize the document processor
         
         Args:
             chunk_size: Size of text chunks for processing
             chunk_overlap: Overlap between chunks to maintain context
+            workers: Extraction processes (1 extracts in-process, None uses one per CPU core)
+            max_in_flight: Extraction tasks allowed to run ahead of the consumer (default 2 per worker)
+            pages_per_task: Split large PDFs into page ranges of this size (default one task per file)
+            splitter: "native" for the built-in recursive splitter, or "langchain" for
+                LangChain's RecursiveCharacterTextSplitter (same chunks, slower import)
+            page_store: Optional PageStore the extracted page text of each file is saved to
         """
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size,
-            chunk_overlap=chunk_overlap
-        )
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        self.max_in_flight = max_in_flight or 2 * self.workers
+        self.pages_per_task = pages_per_task
+        self.page_store = page_store
+        if splitter == "langchain":
+            from langchain.text_splitter import RecursiveCharacterTextSplitter
+            self.text_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=chunk_size,
+                chunk_overlap=chunk_overlap
+            )
+        elif splitter == "native":
+            self.text_splitter = RecursiveTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        else:
+            raise ValueError(f"Unknown splitter: {splitter}")
         
     def load_pdf(self, file_path: str) -> str:
         """Extract text from PDF file"""
-        try:
-            with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                text = ""
-                
-                # Read each page
-                for page_num in range(len(pdf_reader.pages)):
-                    page = pdf_reader.pages[page_num]
-                    text += page.extract_text() + "\n"
-                
-                return text.strip()
-                
-        except Exception as e:
-            print(f"Error reading PDF {file_path}: {str(e)}")
-            return ""
+        return self._join_pages(self.load_pages(file_path))
     
-    def process_documents(self, docs_folder: str) -> List[Dict]:
-        """Process all documents in a folder and split into chunks"""
-        processed_docs = []
-        
-        # Get all PDF files in the folder
-        docs_path = Path(docs_folder)
-        pdf_files = list(docs_path.glob("*.pdf"))
+    @metrics.timed("pdf_extract")
+    def load_pages(self, file_path: str) -> List[str]:
+        """Extract the text of each page of a PDF file"""
+        return _extract_pages(file_path)
+    
+    def process_file(self, pdf_file: Path) -> List[Dict]:
+        """Extract a single PDF and split it into chunk dicts"""
+        pdf_file = Path(pdf_file)
+        return self._split_document(pdf_file, self.load_pages(str(pdf_file)))
+    
+    def iter_files(self, pdf_files: Iterable[Path]) -> Iterator[Tuple[Path, List[Dict]]]:
+        """
+        Yield (pdf_file, chunks) for each file, in order, as extraction finishes
         
-        print(f"Found {len(pdf_files)} PDF files to process...")
+        With more than one worker, files (or page ranges of them) are extracted in a
+        process pool while the caller consumes earlier results. At most max_in_flight
+        tasks are pending at a time, so memory is bounded by that window rather than
+        by the size of the corpus.
+        """
+        pdf_files = [Path(pdf_file) for pdf_file in pdf_files]
+        if self.workers <= 1:
+            for pdf_file in pdf_files:
+                yield pdf_file, self.process_file(pdf_file)
+            return
         
-        for pdf_file in pdf_files:
-            print(f"Processing: {pdf_file.name}")
-            
-            # Extract text from PDF
-            text = self.load_pdf(str(pdf_file))
+        # Workers are spawned rather than forked: the app extracts from a worker thread of
+        # a multi-threaded process (possibly with torch loaded), where a fork can deadlock
+        with ProcessPoolExecutor(max_workers=self.workers,
+                                 mp_context=multiprocessing.get_context("spawn")) as executor:
+            # (pdf_file, futures for its page ranges), oldest first
+            pending = deque()
+            in_flight = 0
             
-            if text:
-                # Split text into chunks
-                chunks = self.text_splitter.split_text(text)
+            for pdf_file in pdf_files:
+                futures = [executor.submit(_extract_pages, str(pdf_file), start, end)
+                           for start, end in self._page_ranges(pdf_file)]
+                pending.append((pdf_file, futures))
+                in_flight += len(futures)
                 
-                # Create metadata for each chunk
-                for i, chunk in enumerate(chunks):
-                    doc_info = {
-                        'content': chunk,
-                        'source': pdf_file.name,
-                        'chunk_id': i,
-                        'doc_type': self._classify_document(pdf_file.name)
-                    }
-                    processed_docs.append(doc_info)
+                # Backpressure: hand finished files to the caller before submitting more
+                while pending and in_flight >= self.max_in_flight:
+                    done_file, done_futures = pending.popleft()
+                    in_flight -= len(done_futures)
+                    yield done_file, self._collect(done_file, done_futures)
+            
+            while pending:
+                done_file, done_futures = pending.popleft()
+                yield done_file, self._collect(done_file, done_futures)
+    
+    def iter_documents(self, docs_folder: str) -> Iterator[Dict]:
+        """Stream the chunks of every PDF in a folder, so embedding can start before parsing ends"""
+        pdf_files = self.list_documents(docs_folder)
+        print(f"Found {len(pdf_files)} PDF files to process...")
+        
+        for pdf_file, chunks in self.iter_files(pdf_files):
+            print(f"Processed: {pdf_file.name} ({len(chunks)} chunks)")
+            yield from chunks
+    
+    def process_documents(self, docs_folder: str) -> List[Dict]:
+        """Process all documents in a folder and split into chunks"""
+        processed_docs = list(self.iter_documents(docs_folder))
         
         print(f"Created {len(processed_docs)} chunks from all documents")
         return processed_docs
+    
+    def list_documents(self, docs_folder: str) -> List[Path]:
+        """List the PDF files in a folder in a stable order"""
+        return sorted(Path(docs_folder).glob("*.pdf"))
+    
+    def chunking_params(self) -> Dict:
+        """Parameters that change the chunks produced for the same file"""
+        return {
+            'chunk_size': self.chunk_size,
+            'chunk_overlap': self.chunk_overlap,
+            'page_offsets': True
+        }
+    
+    def _page_ranges(self, pdf_file: Path) -> List[Tuple[int, Optional[int]]]:
+        """Page ranges to extract a file in; a single open range unless pages_per_task is set"""
+        if not self.pages_per_task:
+            return [(0, None)]
+        page_count = _count_pages(str(pdf_file))
+        return [(start, start + self.pages_per_task)
+                for start in range(0, page_count, self.pages_per_task)] or [(0, None)]
+    
+    def _collect(self, pdf_file: Path, futures: List) -> List[Dict]:
+        """Wait for a file's page-range tasks and chunk the reassembled pages"""
+        pages = []
+        with metrics.span("pdf_extract_wait"):
+            for future in futures:
+                pages.extend(future.result())
+        return self._split_document(pdf_file, pages)
+    
+    @staticmethod
+    def _join_pages(pages: List[str]) -> str:
+        """Join extracted page texts into one document string"""
+        return "\n".join(pages).strip()
+    
+    @staticmethod
+    def page_starts(pages: List[str]) -> List[int]:
+        """Offset of each page in the text _join_pages builds from them"""
+        joined = "\n".join(pages)
+        leading = len(joined) - len(joined.lstrip())
+        starts, offset = [], -leading
+        for page in pages:
+            starts.append(offset)
+            offset += len(page) + 1
+        return starts
+    
+    @metrics.timed("chunk_split")
+    def _split_document(self, pdf_file: Path, pages: List[str]) -> List[Dict]:
+        """Split a document's pages into chunk dicts with page and character offset metadata"""
+        text = self._join_pages(pages)
+        if not text:
+            return []
+        
+        page_starts = self.page_starts(pages)
+        if self.page_store is not None:
+            self.page_store.put(pdf_file.name, pages, page_starts)
+        
+        # Split text into chunks
+        chunks = self.text_splitter.split_text(text)
+        metrics.increment("chunks_created", len(chunks))
+        
+        # Create metadata for each chunk
+        doc_type = self._classify_document(pdf_file.name)
+        documents, search_from = [], 0
+        for i, chunk in enumerate(chunks):
+            doc = {
+                'content': chunk,
+                'source': pdf_file.name,
+                'chunk_id': i,
+                'doc_type': doc_type
+            }
+            
+            # Chunks are cut from the text in order, overlapping, so each one is found
+            # just after the start of the previous one
+            char_start = text.find(chunk, search_from)
+            if char_start != -1:
+                char_end = char_start + len(chunk)
+                doc.update(page=bisect.bisect_right(page_starts, char_start),
+                           page_end=bisect.bisect_right(page_starts, char_end - 1),
+                           char_start=char_start, char_end=char_end)
+                search_from = char_start + 1
+            documents.append(doc)
+        return documents
+    
+    @staticmethod
+    def file_hash(file_path: str, block_size: int = 1 << 20) -> str:
+        """SHA-256 of a file's bytes, read in blocks"""
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as file:
+            for block in iter(lambda: file.read(block_size), b''):
+                digest.update(block)
+        return digest.hexdigest()
 
     def _classify_document(self, filename: str) -> str:
         """Classify document type based on filename"""
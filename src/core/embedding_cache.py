@@ -0,0 +1,269 @@
+"""
+Embedding Cache for Knowledge Transfer Assistant
+Persists chunk embeddings per model so unchanged text is never encoded twice
+"""
+
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the instances within one process are coordinated
+    fcntl = None
+
+
+class EmbeddingCache:
+    """
+    On-disk cache of embeddings keyed by (model_name, normalized text hash)
+
+    Several processes (or instances) may share a cache folder. Each row of the vector
+    file is stored with the hash of its text, so a lookup only returns a vector whose
+    row still belongs to that text; writers hold a file lock and re-read the row
+    hashes before allocating rows. Least recently used entries are evicted first, as
+    far as the evicting process has seen them used.
+    """
+
+    INITIAL_CAPACITY = 1024
+    KEY_BYTES = 32  # sha256 digest
+
+    def __init__(self, model_name: str, cache_dir: str = "data/processed/embedding_cache",
+                 max_size_mb: float = 512):
+        """
+        Initialize the embedding cache
+
+        Args:
+            model_name: Embedding model the cached vectors belong to
+            cache_dir: Root folder; each model gets its own subfolder
+            max_size_mb: Size of the vector file at which least recently used entries are evicted
+        """
+        self.model_name = model_name
+        self.max_size_mb = max_size_mb
+        self.path = os.path.join(cache_dir, re.sub(r'[^A-Za-z0-9_.-]+', '_', model_name))
+        self.vectors_path = os.path.join(self.path, "vectors.npy")
+        self.keys_path = os.path.join(self.path, "keys.npy")
+        self.generation_path = os.path.join(self.path, "generation")
+        self.lock_path = os.path.join(self.path, "lock")
+
+        # text hash -> row in the vector file, least recently used first
+        self.slots: "OrderedDict[bytes, int]" = OrderedDict()
+        self.vectors: Optional[np.memmap] = None
+        self.keys: Optional[np.memmap] = None  # (rows, KEY_BYTES) uint8, text hash of each row
+        self.hits = 0
+        self.misses = 0
+
+        self._next_row = 0          # first row never used
+        self._file_id = None        # (inode, size) of the mapped vector file
+        self._generation = None     # token of the last write seen, see _sync
+        self._lock = threading.Lock()
+        self._load()
+
+    @staticmethod
+    def text_key(text: str) -> bytes:
+        """Hash of the text with whitespace normalized"""
+        return hashlib.sha256(" ".join(text.split()).encode('utf-8')).digest()
+
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Cached float32 vector for each text, or None where it has not been embedded"""
+        keys = [self.text_key(text) for text in texts]
+        results = []
+        with self._lock:
+            if any(key not in self.slots for key in keys):
+                # Another process may have embedded them since the last look
+                with FileLock(self.lock_path):
+                    self._sync()
+            for key in keys:
+                vector = self._read(key)
+                if vector is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+                    self.slots.move_to_end(key)
+                results.append(vector)
+        return results
+
+    def put_many(self, texts: List[str], embeddings: np.ndarray) -> None:
+        """Store embeddings for texts, evicting least recently used entries when full"""
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        with self._lock, FileLock(self.lock_path):
+            self._sync()
+            if self.vectors is None or self.vectors.shape[1] != embeddings.shape[1]:
+                self._create(embeddings.shape[1], self.INITIAL_CAPACITY)
+
+            written = False
+            for text, embedding in zip(texts, embeddings):
+                key = self.text_key(text)
+                if key in self.slots:
+                    self.slots.move_to_end(key)
+                    continue
+                slot = self._allocate_slot(key)
+                # The row's hash is cleared while the vector is written, see _read
+                self.keys[slot] = 0
+                self.vectors[slot] = embedding
+                self.keys[slot] = np.frombuffer(key, dtype=np.uint8)
+                written = True
+            if written:
+                self._bump_generation()
+
+    def flush(self) -> None:
+        """Write vectors and their text hashes to disk"""
+        with self._lock:
+            if self.vectors is None:
+                return
+            self.vectors.flush()
+            self.keys.flush()
+
+    def stats(self) -> dict:
+        """Entry count, size on disk and hit/miss counters"""
+        size_bytes = self.vectors.nbytes if self.vectors is not None else 0
+        return {'entries': len(self.slots), 'size_mb': size_bytes / 2**20,
+                'hits': self.hits, 'misses': self.misses}
+
+    def _read(self, key: bytes) -> Optional[np.ndarray]:
+        """Copy of the vector cached for a text hash, if its row still holds it; caller holds the lock"""
+        slot = self.slots.get(key)
+        if slot is None:
+            return None
+        digest = np.frombuffer(key, dtype=np.uint8)
+        if not np.array_equal(self.keys[slot], digest):
+            del self.slots[key]
+            return None
+        vector = np.array(self.vectors[slot])
+        # Checked again in case another process reused the row during the copy
+        if not np.array_equal(self.keys[slot], digest):
+            del self.slots[key]
+            return None
+        return vector
+
+    def _max_entries(self, dim: int) -> int:
+        """Number of vectors that fit in max_size_mb"""
+        return max(1, int(self.max_size_mb * 2**20) // (dim * 4))
+
+    def _allocate_slot(self, key: bytes) -> int:
+        """Row for a new entry: a fresh one, a grown file, or the least recently used one"""
+        capacity, dim = self.vectors.shape
+        if self._next_row >= capacity and capacity < self._max_entries(dim):
+            self._grow(min(capacity * 2, self._max_entries(dim)))
+        if self._next_row < self.vectors.shape[0]:
+            slot = self._next_row
+            self._next_row += 1
+        else:
+            _, slot = self.slots.popitem(last=False)
+        self.slots[key] = slot
+        return slot
+
+    def _create(self, dim: int, capacity: int) -> None:
+        """Start empty files, discarding any entries of a different dimension; caller holds the file lock"""
+        os.makedirs(self.path, exist_ok=True)
+        self.slots.clear()
+        self._next_row = 0
+        self._write_files(np.zeros((0, dim), dtype=np.float32), np.zeros((0, self.KEY_BYTES), dtype=np.uint8),
+                          min(capacity, self._max_entries(dim)))
+        self._bump_generation()
+
+    def _grow(self, capacity: int) -> None:
+        """Copy the files into larger ones; caller holds the file lock"""
+        self._write_files(self.vectors, self.keys, capacity)
+
+    def _write_files(self, vectors: np.ndarray, keys: np.ndarray, capacity: int) -> None:
+        """Replace the files with ones of the given capacity starting with the given rows, and map them"""
+        for path, rows in ((self.keys_path, keys), (self.vectors_path, vectors)):
+            tmp_path = f"{path}.tmp.npy"
+            resized = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=rows.dtype,
+                                                shape=(capacity,) + rows.shape[1:])
+            resized[:len(rows)] = rows
+            resized.flush()
+            del resized
+            os.replace(tmp_path, path)
+        self._open()
+
+    def _open(self) -> None:
+        """Map the vector and hash files"""
+        self.vectors = np.load(self.vectors_path, mmap_mode='r+')
+        self.keys = np.load(self.keys_path, mmap_mode='r+')
+        if self.keys.shape != (self.vectors.shape[0], self.KEY_BYTES):
+            raise ValueError("hash file does not match the vector file")
+        stat = os.stat(self.vectors_path)
+        self._file_id = (stat.st_ino, stat.st_size)
+
+    def _sync(self) -> None:
+        """Pick up rows written by other processes; caller holds both locks"""
+        generation = self._read_generation()
+        try:
+            stat = os.stat(self.vectors_path)
+            if (stat.st_ino, stat.st_size) != self._file_id:
+                # Another process created or grew the files
+                self._open()
+            elif generation == self._generation:
+                return
+        except (OSError, ValueError):
+            self.vectors = self.keys = self._file_id = None
+            self.slots.clear()
+            self._next_row = 0
+            return
+        self._index_rows(generation)
+
+    def _index_rows(self, generation: Optional[str]) -> None:
+        """Rebuild the slots from the row hashes in the file"""
+        used = np.flatnonzero(self.keys.any(axis=1))
+        blob = np.ascontiguousarray(self.keys[used]).tobytes()
+        present = {blob[i * self.KEY_BYTES:(i + 1) * self.KEY_BYTES]: int(row) for i, row in enumerate(used)}
+        # Keep this process's order of use; entries new to it count as just used
+        slots = OrderedDict((key, present.pop(key)) for key in self.slots if key in present)
+        slots.update(present)
+        self.slots = slots
+        self._next_row = int(used[-1]) + 1 if len(used) else 0
+        self._generation = generation
+
+    def _read_generation(self) -> Optional[str]:
+        """Token of the last write to the cache folder"""
+        try:
+            with open(self.generation_path, 'r', encoding='utf-8') as file:
+                return file.read()
+        except OSError:
+            return None
+
+    def _bump_generation(self) -> None:
+        """Record a write, so other processes re-read the row hashes; caller holds the file lock"""
+        self._generation = os.urandom(8).hex()
+        with open(self.generation_path, 'w', encoding='utf-8') as file:
+            file.write(self._generation)
+
+    def _load(self) -> None:
+        """Open an existing cache, starting empty if it is missing or unreadable"""
+        if not (os.path.exists(self.vectors_path) and os.path.exists(self.keys_path)):
+            return
+        with FileLock(self.lock_path):
+            try:
+                self._open()
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable embedding cache {self.path}: {str(e)}")
+                self.vectors = self.keys = self._file_id = None
+                return
+            self._index_rows(self._read_generation())
+
+
+class FileLock:
+    """Exclusive lock on a file for the duration of a with block, across processes"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._file = open(self.path, 'a')
+        if fcntl is not None:
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc_info):
+        if fcntl is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._file.close()
+        self._file = None
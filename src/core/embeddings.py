@@ -3,41 +3,134 @@ Embeddings Generator for Knowledge Transfer Assistant
 Converts text chunks to vector embeddings for similarity search
 """
 
-import chromadb
-from sentence_transformers import SentenceTransformer
-from typing import List, Dict
+import numpy as np
+from itertools import islice
+from typing import List, Dict, Iterable, Callable, Optional, Union
+import json
 import os
+import time
+
+from . import resources
+from .dedup import NearDuplicateIndex
+from .instrumentation import metrics
+from .quantized_index import QuantizedIndex, compute_distances
+from .query_cache import LRUCache, normalize_query
+from .retriever import BM25Index
+from .vector_store import VectorStore, create_vector_store
 
 
 class EmbeddingsManager:
     """Manages text embeddings and vector database operations"""
     
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2", db_path: str = "data/processed/vector_db"):
+    DEFAULT_COLLECTION = "knowledge_base"
+    POSITION_FIELDS = ('page', 'page_end', 'char_start', 'char_end')
+    
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", db_path: str = "data/processed/vector_db",
+                 cache_dir: Optional[str] = "data/processed/embedding_cache",
+                 exact_search_threshold: int = 500, quantization: Optional[str] = None,
+                 keep_float_vectors: bool = False, collection_name: str = DEFAULT_COLLECTION,
+                 vector_store: Union[str, VectorStore] = "chroma", deduplicate: bool = False,
+                 duplicate_threshold: float = 0.8):
         """
         Initialize embeddings manager
         
         Args:
             model_name: Sentence transformer model for embeddings
-            db_path: Path to store vector database
+            db_path: Path to store vector database (None keeps a numpy store and its
+                indexes in memory only, e.g. for tests)
+            cache_dir: Folder for the persistent embedding cache (None disables it)
+            exact_search_threshold: Filtered searches matching at most this many chunks
+                are scored exactly instead of through the HNSW index
+            quantization: "int8" or "binary" to answer unfiltered searches from a compact
+                memory-mapped index instead of the HNSW index (None disables it). The
+                index is an addition: Chroma still keeps its float32 vectors and HNSW
+                index on disk, so disk use grows (by a quarter for int8); what shrinks is
+                the memory an unfiltered search needs, as the HNSW index is not loaded
+                for it
+            keep_float_vectors: Keep a float32 copy of the vectors next to the quantized
+                index for exact rescoring (by default candidates are rescored with their
+                int8 codes, or with the vectors of an exact in-process store)
+            collection_name: Knowledge base to use; each has its own collection, keyword
+                index and ingestion manifest inside db_path
+            vector_store: "chroma" (persistent database with an HNSW index), "numpy"
+                (exact in-process search, for small corpora) or a VectorStore instance
+            deduplicate: Link chunks that nearly repeat a stored chunk (copies and
+                revisions of a document) to it instead of embedding and storing them
+            duplicate_threshold: Estimated word-shingle Jaccard similarity at which a
+                chunk counts as a near-duplicate
         """
         self.model_name = model_name
         self.db_path = db_path
+        self.collection_name = collection_name
+        self.exact_search_threshold = exact_search_threshold
+        self.cache_dir = cache_dir
+        # Managers sharing a cache folder share one cache instance
+        self.embedding_cache = resources.get_embedding_cache(model_name, cache_dir) if cache_dir else None
+        
+        # In-memory caches for repeated questions; results are keyed on the
+        # collection version so any write invalidates them
+        self.query_embedding_cache = LRUCache(max_size=1024)
+        self.result_cache = LRUCache(max_size=256, ttl=300)
+        self.collection_version = 0
+        self.change_listeners: List[Callable[[List[str]], None]] = []
+        
+        # Embedding model and database client are shared by every manager in the process;
+        # the model is only loaded when something first needs encoding
+        self._embedding_model = None
+        if isinstance(vector_store, VectorStore):
+            self.vector_store = vector_store
+        else:
+            self.vector_store = create_vector_store(vector_store, db_path, collection_name,
+                                                    self.index_path("numpy_store"))
+        self._closed = False
         
-        # Initialize embedding model
-        print(f"Loading embedding model: {model_name}")
-        self.embedding_model = SentenceTransformer(model_name)
+        # Keyword index kept in step with the collection for hybrid search
+        self.keyword_index = BM25Index(self.index_path("bm25_index.json"))
+        if len(self.keyword_index) != self.vector_store.count():
+            self.rebuild_keyword_index()
         
-        # Initialize vector database
-        os.makedirs(db_path, exist_ok=True)
-        self.chroma_client = chromadb.PersistentClient(path=db_path)
-        self.collection = self._get_or_create_collection()
+        # Optional quantized copy of the vectors, also kept in step with the collection
+        self.quantized_index = None
+        if quantization:
+            self.quantized_index = QuantizedIndex(self.index_path(f"quantized_{quantization}"),
+                                                  precision=quantization, space=self._space(),
+                                                  keep_float=keep_float_vectors)
+            if len(self.quantized_index) != self.vector_store.count():
+                self.rebuild_quantized_index()
         
-    def _get_or_create_collection(self):
-        """Get or create ChromaDB collection"""
-        try:
-            return self.chroma_client.get_collection("knowledge_base")
-        except:
-            return self.chroma_client.create_collection("knowledge_base")
+        # Optional MinHash index of the stored chunks, for skipping near-duplicates before encoding
+        self.duplicate_index = None
+        if deduplicate:
+            self.duplicate_index = NearDuplicateIndex(self.index_path("near_duplicates"),
+                                                      threshold=duplicate_threshold)
+            if len(self.duplicate_index) != self.vector_store.count():
+                self.rebuild_duplicate_index()
+    
+    def index_path(self, filename: str) -> Optional[str]:
+        """Location of a file kept alongside this knowledge base's collection (None in memory)"""
+        if self.db_path is None:
+            return None
+        # The default knowledge base keeps its files at the top of db_path, as before
+        if self.collection_name == self.DEFAULT_COLLECTION:
+            return os.path.join(self.db_path, filename)
+        return os.path.join(self.db_path, "collections", self.collection_name, filename)
+    
+    @property
+    def embedding_model(self):
+        """Shared SentenceTransformer, loaded on first use"""
+        if self._embedding_model is None:
+            self._embedding_model = resources.get_embedding_model(self.model_name)
+        return self._embedding_model
+    
+    def close(self) -> None:
+        """Release this manager's references to the shared model, embedding cache and vector store"""
+        if not self._closed:
+            self._closed = True
+            if self._embedding_model is not None:
+                resources.release(resources.model_key(self.model_name))
+            if self.embedding_cache is not None:
+                resources.release(resources.cache_key(self.model_name, self.cache_dir))
+            self.vector_store.close()
     
     def add_documents(self, documents: List[Dict]) -> None:
         """Add processed documents to vector database"""
@@ -47,46 +140,416 @@ class EmbeddingsManager:
             
         print(f"Adding {len(documents)} chunks to vector database...")
         
-        # Prepare data for ChromaDB
-        texts = [doc['content'] for doc in documents]
+        self.add_documents_stream(documents)
+        
+        print(f"✅ Successfully added {len(documents)} chunks to database")
+    
+    def add_documents_stream(self, documents: Iterable[Dict], encode_batch_size: int = 64,
+                             write_batch_size: int = 512,
+                             progress_callback: Optional[Callable[[Dict], None]] = None,
+                             save: bool = True) -> int:
+        """
+        Encode and store chunks from any iterable in bounded batches
+        
+        Only one write batch of chunks and their float32 embeddings is held at a time,
+        so memory does not grow with the size of the corpus. With deduplication on,
+        near-duplicates of stored chunks are linked to them and never encoded; a stored
+        chunk re-ingested as a duplicate is deleted, and copies linked to a re-ingested
+        chunk are checked again against its new text.
+        
+        Args:
+            documents: Iterable of chunk dicts (e.g. DocumentProcessor.iter_documents)
+            encode_batch_size: Chunks per SentenceTransformer forward pass
+            write_batch_size: Chunks per upsert, capped at the client's max batch size
+            progress_callback: Called after each write with chunks, duplicates, batches,
+                elapsed and chunks_per_sec
+            save: Save the indexes when done (False leaves it to a later save_indexes
+                call, e.g. once per sync instead of once per file)
+            
+        Returns:
+            Number of chunks written
+        """
+        write_batch_size = max(1, min(write_batch_size, self.vector_store.max_batch_size))
+        
+        stats = {'chunks': 0, 'duplicates': 0, 'batches': 0, 'elapsed': 0.0, 'chunks_per_sec': 0.0}
+        start = time.perf_counter()
+        pending_docs, pending_embeddings = [], []
+        # Copies that were linked to re-ingested chunks, checked again once the input is done
+        orphans: Dict[str, Dict] = {}
+        
+        documents = iter(documents)
+        while True:
+            batch = list(islice(documents, encode_batch_size))
+            if not batch and orphans:
+                documents, orphans = iter(list(orphans.values())), {}
+                batch = list(islice(documents, encode_batch_size))
+            finished = not batch
+            if batch and self.duplicate_index is not None:
+                ids = self.chunk_ids(batch)
+                kept, replaced, orphaned = self.duplicate_index.filter(batch, ids)
+                stats['duplicates'] += len(batch) - len(kept)
+                batch = kept
+                if replaced:
+                    # Stored chunks whose new text repeats another chunk are only linked now
+                    self._delete_stored(replaced)
+                    self._collection_changed(replaced)
+                for chunk_id in ids:
+                    orphans.pop(chunk_id, None)  # a newer version of the copy is already in
+                orphans.update(zip(self.chunk_ids(orphaned), orphaned))
+            if batch:
+                pending_docs.extend(batch)
+                encode_start = time.perf_counter()
+                pending_embeddings.append(self._encode([doc['content'] for doc in batch], encode_batch_size))
+                if self.duplicate_index is not None:
+                    self.duplicate_index.record_encoding(len(batch), time.perf_counter() - encode_start,
+                                                         pending_embeddings[-1].shape[1])
+            
+            # Write full batches once buffered, and whatever is left at the end; a batch never
+            # exceeds write_batch_size, the rest waits for the next encode batch
+            while pending_docs and (len(pending_docs) >= write_batch_size or finished):
+                embeddings = np.vstack(pending_embeddings)
+                docs, pending_docs = pending_docs[:write_batch_size], pending_docs[write_batch_size:]
+                self._write_batch(docs, embeddings[:len(docs)])
+                pending_embeddings = [embeddings[len(docs):]] if pending_docs else []
+                stats['chunks'] += len(docs)
+                stats['batches'] += 1
+                stats['elapsed'] = time.perf_counter() - start
+                stats['chunks_per_sec'] = stats['chunks'] / stats['elapsed'] if stats['elapsed'] else 0.0
+                if progress_callback:
+                    progress_callback(dict(stats))
+            
+            if finished:
+                if save:
+                    self.save_indexes()
+                return stats['chunks']
+    
+    def save_indexes(self) -> None:
+        """Write the vector store, embedding cache and companion indexes; unchanged ones are skipped"""
+        if self.embedding_cache is not None:
+            self.embedding_cache.flush()
+        self.vector_store.save()
+        self.keyword_index.save()
+        if self.quantized_index is not None:
+            self.quantized_index.save()
+        if self.duplicate_index is not None:
+            self.duplicate_index.save()
+    
+    @metrics.timed("embed_chunks")
+    def _encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        """Encode texts into a float32 matrix, reusing cached embeddings where possible"""
+        if self.embedding_cache is None:
+            return self._encode_uncached(texts, batch_size)
+        
+        cached = self.embedding_cache.get_many(texts)
+        missing = [i for i, embedding in enumerate(cached) if embedding is None]
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            encoded = self._encode_uncached(missing_texts, batch_size)
+            self.embedding_cache.put_many(missing_texts, encoded)
+            for i, embedding in zip(missing, encoded):
+                cached[i] = embedding
+        return np.vstack(cached).astype(np.float32, copy=False)
+    
+    def _encode_uncached(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        """Run the embedding model over texts"""
+        metrics.increment("texts_encoded", len(texts))
+        embeddings = self.embedding_model.encode(texts, batch_size=batch_size, convert_to_numpy=True)
+        return np.asarray(embeddings, dtype=np.float32)
+    
+    @metrics.timed("vector_write")
+    def _write_batch(self, documents: List[Dict], embeddings: np.ndarray) -> None:
+        """Upsert one batch of chunks and their embeddings"""
         metadatas = [{
             'source': doc['source'],
             'chunk_id': doc['chunk_id'],
-            'doc_type': doc['doc_type']
+            'doc_type': doc['doc_type'],
+            # Page and character offsets, for chunks that have them
+            **{key: doc[key] for key in self.POSITION_FIELDS if doc.get(key) is not None}
         } for doc in documents]
-        ids = [f"{doc['source']}_{doc['chunk_id']}" for doc in documents]
         
-        # Generate embeddings
-        embeddings = self.embedding_model.encode(texts).tolist()
+        texts = [doc['content'] for doc in documents]
+        ids = self.chunk_ids(documents)
         
-        # Add to vector database
-        self.collection.add(
-            embeddings=embeddings,
-            documents=texts,
-            metadatas=metadatas,
-            ids=ids
-        )
+        # Upsert so re-ingested chunks replace old ones
+        self.vector_store.upsert(ids, embeddings, texts, metadatas)
+        self.keyword_index.add(ids, texts, metadatas)
+        if self.quantized_index is not None:
+            self.quantized_index.add(ids, embeddings)
+        self._collection_changed(ids)
+    
+    def delete_documents(self, ids: List[str] = None, source: str = None, save: bool = True) -> None:
+        """Delete chunks by ID, or every chunk of a source file (save as in add_documents_stream)"""
+        where = None
+        if ids:
+            ids = list(ids)
+        elif source is not None:
+            ids = self.keyword_index.ids_where({'source': source})
+            where = {'source': source}
+        else:
+            return
+        self._delete_stored(ids, where)
         
-        print(f"✅ Successfully added {len(documents)} chunks to database")
+        orphans = []
+        if self.duplicate_index is not None:
+            if source is not None:
+                ids = ids + self.duplicate_index.duplicate_ids(source)
+            orphans = self.duplicate_index.remove(ids)
+        self._collection_changed(ids)
+        
+        if orphans:
+            # Copies that were only linked to the deleted chunks are stored in their place
+            self.add_documents_stream(orphans, save=False)
+        if save:
+            self.save_indexes()
     
-    def search_similar(self, query: str, n_results: int = 5) -> List[Dict]:
-        """Search for similar documents based on query"""
+    def _delete_stored(self, ids: List[str], where: Optional[Dict] = None) -> None:
+        """Delete chunks from the vector store and the indexes kept in step with it"""
+        if where is not None:
+            self.vector_store.delete(where=where)
+        else:
+            self.vector_store.delete(ids=ids)
+        self.keyword_index.remove(ids)
+        if self.quantized_index is not None:
+            self.quantized_index.remove(ids)
+    
+    def rebuild_keyword_index(self, page_size: int = 1000) -> None:
+        """Rebuild the BM25 index from the documents stored in the collection"""
+        print("Building keyword index from vector database...")
+        self.keyword_index = BM25Index(self.keyword_index.path)
+        offset = 0
+        while True:
+            page = self.vector_store.get(include=['documents', 'metadatas'], limit=page_size, offset=offset)
+            if not page['ids']:
+                break
+            self.keyword_index.add(page['ids'], page['documents'], page['metadatas'])
+            offset += len(page['ids'])
+        self.keyword_index.save()
+    
+    def rebuild_quantized_index(self, page_size: int = 1000) -> None:
+        """Rebuild the quantized index from the embeddings stored in the collection"""
+        print(f"Building {self.quantized_index.precision} index from vector database...")
+        self.quantized_index.clear()
+        offset = 0
+        while True:
+            page = self.vector_store.get(include=['embeddings'], limit=page_size, offset=offset)
+            if not page['ids']:
+                break
+            self.quantized_index.add(page['ids'], np.asarray(page['embeddings'], dtype=np.float32))
+            offset += len(page['ids'])
+        self.quantized_index.save()
+    
+    def rebuild_duplicate_index(self, page_size: int = 1000) -> None:
+        """Rebuild the near-duplicate index from the documents stored in the collection"""
+        print("Building near-duplicate index from vector database...")
+        self.duplicate_index.clear()
+        offset = 0
+        while True:
+            page = self.vector_store.get(include=['documents'], limit=page_size, offset=offset)
+            if not page['ids']:
+                break
+            self.duplicate_index.add(page['ids'], page['documents'])
+            offset += len(page['ids'])
+        self.duplicate_index.save()
+    
+    def deduplication_report(self) -> Optional[Dict]:
+        """
+        Linked near-duplicates and what skipping them saved (None if deduplication is off)
+        
+        Vector bytes are float32 embeddings that were not stored; embedding seconds are
+        estimated from the average encode time per chunk, recorded in the index.
+        """
+        if self.duplicate_index is None:
+            return None
+        stats = self.duplicate_index.stats()
+        encoding = stats.pop('encoding')
+        seconds_per_chunk = encoding['seconds'] / encoding['chunks'] if encoding['chunks'] else 0.0
+        dimension = encoding['dimension']
+        if not dimension and self.vector_store.count():
+            # Index rebuilt from the database without encoding anything yet
+            dimension = len(self.vector_store.get(include=['embeddings'], limit=1)['embeddings'][0])
+        total = stats['indexed_chunks'] + stats['duplicates']
+        return dict(stats,
+                    duplicate_ratio=stats['duplicates'] / total if total else 0.0,
+                    vector_bytes_saved=stats['duplicates'] * dimension * 4,
+                    embed_seconds_saved=stats['duplicates'] * seconds_per_chunk)
+    
+    def add_change_listener(self, listener: Callable[[List[str]], None]) -> None:
+        """Call listener with the chunk IDs of every write or delete, e.g. to invalidate caches"""
+        self.change_listeners.append(listener)
+    
+    def _collection_changed(self, ids: List[str]) -> None:
+        """Invalidate cached search results after the collection was modified"""
+        self.collection_version += 1
+        self.result_cache.clear()
+        for listener in self.change_listeners:
+            listener(list(ids))
+    
+    @staticmethod
+    def chunk_ids(documents: List[Dict]) -> List[str]:
+        """Vector database IDs for processed chunks"""
+        return [f"{doc['source']}_{doc['chunk_id']}" for doc in documents]
+    
+    def encode_query(self, query: str) -> np.ndarray:
+        """Embedding of a query string, cached across calls"""
+        key = normalize_query(query)
+        embedding = self.query_embedding_cache.get(key)
+        if embedding is None:
+            with metrics.span("query_encode"):
+                embedding = self._encode_uncached([key])[0]
+            self.query_embedding_cache.put(key, embedding)
+        return embedding
+    
+    def encode_queries(self, queries: List[str], batch_size: int = 64) -> np.ndarray:
+        """Embeddings of many queries, encoding the uncached ones in one batched model call"""
+        keys = [normalize_query(query) for query in queries]
+        embeddings = {key: self.query_embedding_cache.get(key) for key in keys}
+        missing = [key for key, embedding in embeddings.items() if embedding is None]
+        if missing:
+            with metrics.span("query_encode"):
+                encoded = self._encode_uncached(missing, batch_size)
+            for key, embedding in zip(missing, encoded):
+                embeddings[key] = embedding
+                self.query_embedding_cache.put(key, embedding)
+        return np.vstack([embeddings[key] for key in keys]) if keys else np.empty((0, 0), dtype=np.float32)
+    
+    @metrics.timed("search_similar")
+    def search_similar(self, query: str, n_results: int = 5,
+                       doc_type: Union[str, List[str], None] = None,
+                       source: Union[str, List[str], None] = None) -> List[Dict]:
+        """
+        Search for similar documents based on query
+        
+        Args:
+            query: Question or search text
+            n_results: Number of chunks to return
+            doc_type: Only search chunks of this document type (or any of a list of types)
+            source: Only search chunks from this source file (or any of a list of files)
+        """
+        where = self.build_where(doc_type=doc_type, source=source)
+        cache_key = (normalize_query(query), n_results, json.dumps(where, sort_keys=True),
+                     self.collection_version)
+        cached = self.result_cache.get(cache_key)
+        if cached is not None:
+            metrics.increment("search_cache_hits")
+            return self._copy_results(cached)
+        metrics.increment("search_cache_misses")
+        
         # Generate query embedding
-        query_embedding = self.embedding_model.encode([query]).tolist()
+        query_embedding = self.encode_query(query)
+        
+        if where is None:
+            if self.quantized_index is not None:
+                formatted_results = self._query_quantized(query_embedding, n_results)
+            else:
+                formatted_results = self._query_index(query_embedding, n_results)
+        else:
+            if self.vector_store.exact:
+                formatted_results = self._query_index(query_embedding, n_results, where)
+            else:
+                # Small filtered subsets are cheaper (and exact) to score directly; one ID past
+                # the threshold is enough to tell, so large subsets are not listed
+                matching_ids = self.vector_store.get(where=where, include=[],
+                                                     limit=self.exact_search_threshold + 1)['ids']
+                if len(matching_ids) <= self.exact_search_threshold:
+                    formatted_results = self._exact_search(query_embedding, matching_ids, n_results)
+                else:
+                    formatted_results = self._query_index(query_embedding, n_results, where)
+        
+        self.result_cache.put(cache_key, formatted_results)
+        return self._copy_results(formatted_results)
+    
+    @staticmethod
+    def build_where(**filters) -> Optional[Dict]:
+        """Chroma where clause for metadata filters; list values match any of their items"""
+        clauses = []
+        for key, value in filters.items():
+            if value is None or (isinstance(value, (list, tuple, set)) and not value):
+                continue
+            if isinstance(value, (list, tuple, set)):
+                clauses.append({key: {'$in': sorted(value)}})
+            else:
+                clauses.append({key: value})
         
+        if not clauses:
+            return None
+        return clauses[0] if len(clauses) == 1 else {'$and': clauses}
+    
+    @metrics.timed("vector_query")
+    def _query_index(self, query_embedding: np.ndarray, n_results: int,
+                     where: Optional[Dict] = None) -> List[Dict]:
+        """Nearest neighbour search through the vector store's index"""
         # Search in vector database
-        results = self.collection.query(
-            query_embeddings=query_embedding,
-            n_results=n_results
-        )
+        results = self.vector_store.query(query_embedding, n_results, where)
         
         # Format results
         formatted_results = []
-        for i in range(len(results['documents'][0])):
+        for i in range(len(results['documents'])):
             formatted_results.append({
-                'content': results['documents'][0][i],
-                'metadata': results['metadatas'][0][i],
-                'similarity_score': 1 - results['distances'][0][i]  # Convert distance to similarity
+                'id': results['ids'][i],
+                'content': results['documents'][i],
+                'metadata': results['metadatas'][i],
+                'similarity_score': 1 - results['distances'][i]  # Convert distance to similarity
             })
+        return formatted_results
+    
+    @metrics.timed("quantized_query")
+    def _query_quantized(self, query_embedding: np.ndarray, n_results: int) -> List[Dict]:
+        """Search the quantized index, then fetch the chunks it found from the collection"""
+        if not self.quantized_index.keep_float and self.vector_store.exact:
+            # Rescore the candidates with their stored vectors, fetched along with the chunks
+            # (Chroma only reads vectors through its HNSW index, so it is not asked for them)
+            candidates = self.quantized_index.candidates(query_embedding, n_results)
+            return self._exact_search(query_embedding, candidates, n_results)
+        
+        hits = self.quantized_index.search(query_embedding, n_results)
+        if not hits:
+            return []
         
-        return formatted_results
\ No newline at end of file
+        stored = self.vector_store.get(ids=[chunk_id for chunk_id, _ in hits], include=['documents', 'metadatas'])
+        by_id = {chunk_id: i for i, chunk_id in enumerate(stored['ids'])}
+        return [{
+            'id': chunk_id,
+            'content': stored['documents'][by_id[chunk_id]],
+            'metadata': stored['metadatas'][by_id[chunk_id]],
+            'similarity_score': 1 - distance
+        } for chunk_id, distance in hits if chunk_id in by_id]
+    
+    @metrics.timed("exact_search")
+    def _exact_search(self, query_embedding: np.ndarray, ids: List[str], n_results: int) -> List[Dict]:
+        """Brute-force search over the given chunks, scored like the collection's index"""
+        if not ids:
+            return []
+        
+        stored = self.vector_store.get(ids=ids, include=['embeddings', 'documents', 'metadatas'])
+        embeddings = np.asarray(stored['embeddings'], dtype=np.float32)
+        distances = self._distances(query_embedding.astype(np.float32), embeddings)
+        top = np.argsort(distances)[:n_results]
+        
+        return [{
+            'id': stored['ids'][i],
+            'content': stored['documents'][i],
+            'metadata': stored['metadatas'][i],
+            'similarity_score': 1 - float(distances[i])
+        } for i in top]
+    
+    def _distances(self, query_embedding: np.ndarray, embeddings: np.ndarray) -> np.ndarray:
+        """Distances using the same metric as the vector store"""
+        return compute_distances(query_embedding, embeddings, self._space())
+    
+    def _space(self) -> str:
+        """Distance space of the vector store"""
+        return self.vector_store.space
+    
+    def cache_stats(self) -> Dict:
+        """Hit/miss counters for the query embedding and result caches"""
+        return {
+            'query_embeddings': self.query_embedding_cache.stats(),
+            'results': self.result_cache.stats(),
+            'collection_version': self.collection_version,
+            'quantized_index': self.quantized_index.stats() if self.quantized_index is not None else None
+        }
+    
+    @staticmethod
+    def _copy_results(results: List[Dict]) -> List[Dict]:
+        """Copies of cached results, so callers cannot modify the cache"""
+        return [dict(result, metadata=dict(result['metadata'])) for result in results]
@@ -0,0 +1,207 @@
+"""
+Incremental Ingestion for Knowledge Transfer Assistant
+Keeps the vector database in sync with a docs folder using a content-hashed manifest
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+
+class IngestionManifest:
+    """Persistent record of which files are in the vector database, and as which chunks"""
+
+    FILENAME = "ingestion_manifest.json"
+
+    def __init__(self, path: str):
+        """
+        Initialize the manifest
+
+        Args:
+            path: JSON file the manifest is stored in
+        """
+        self.path = path
+        self.params: Dict = {}
+        self.files: Dict[str, Dict] = {}
+        self.load()
+
+    def load(self) -> None:
+        """Load the manifest from disk, starting empty if it is missing or unreadable"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+            self.params = data.get('params', {})
+            self.files = data.get('files', {})
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable manifest {self.path}: {str(e)}")
+            self.params, self.files = {}, {}
+
+    def save(self) -> None:
+        """Write the manifest atomically so an interrupted run never leaves it half-written"""
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump({'params': self.params, 'files': self.files}, file, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def reset(self, params: Dict) -> None:
+        """Forget every file, e.g. after chunking parameters or the model changed"""
+        self.params = dict(params)
+        self.files = {}
+
+    def is_current(self, name: str, file_hash: str) -> bool:
+        """True if the file was ingested with this exact content"""
+        entry = self.files.get(name)
+        return entry is not None and entry.get('hash') == file_hash
+
+    def chunk_ids(self, name: str) -> List[str]:
+        """Chunk IDs stored for a file on its last ingestion"""
+        return self.files.get(name, {}).get('chunk_ids', [])
+
+    def record(self, name: str, file_hash: str, chunk_ids: List[str]) -> None:
+        """Remember that a file's content is stored as the given chunks"""
+        self.files[name] = {'hash': file_hash, 'chunk_ids': list(chunk_ids)}
+
+    def remove(self, name: str) -> None:
+        """Drop a file from the manifest"""
+        self.files.pop(name, None)
+
+
+def sync_documents(docs_folder: str, processor, embeddings_manager,
+                   manifest_path: Optional[str] = None,
+                   progress_callback: Optional[Callable[[Dict], None]] = None,
+                   pdf_files: Optional[List[Path]] = None,
+                   cancel_event: Optional[threading.Event] = None,
+                   checkpoint_seconds: float = 30.0) -> Dict:
+    """
+    Bring the vector database in line with a docs folder
+
+    Unchanged PDFs are skipped, modified PDFs have their stale chunks replaced,
+    and PDFs that were removed from the folder are purged. The indexes and the
+    manifest are saved together every checkpoint_seconds and at the end (rewriting
+    them after every file made large syncs quadratic), so an interrupted sync
+    resumes from the last checkpoint: after a crash, up to checkpoint_seconds of
+    work is done again.
+
+    Args:
+        docs_folder: Folder of PDF files to ingest
+        processor: DocumentProcessor used to extract and chunk files
+        embeddings_manager: EmbeddingsManager holding the vector database
+        manifest_path: Manifest location (defaults to the knowledge base's folder in the vector database)
+        progress_callback: Called as chunks are written with files_done, files_total,
+            chunks, elapsed and chunks_per_sec
+        pdf_files: Only sync these files (nothing is purged); default every PDF in the folder
+        cancel_event: Stop after the current file once set
+        checkpoint_seconds: Seconds between saves of the indexes and manifest
+
+    Returns:
+        Counts of added, updated, removed and unchanged files, plus total chunks,
+        whether the sync was cancelled and, with deduplication on, its report
+    """
+    if manifest_path is None:
+        manifest_path = embeddings_manager.index_path(IngestionManifest.FILENAME)
+    manifest = IngestionManifest(manifest_path)
+
+    # Chunk IDs depend on chunking parameters and vectors on the model, so a
+    # change to either invalidates everything that was ingested before
+    params = dict(processor.chunking_params(), model_name=embeddings_manager.model_name)
+    if manifest.params != params or (manifest.files and embeddings_manager.vector_store.count() == 0):
+        if manifest.files:
+            print("Ingestion settings changed, re-ingesting all documents")
+        stale_sources = list(manifest.files)
+        manifest.reset(params)
+        for name in stale_sources:
+            embeddings_manager.delete_documents(source=name, save=False)
+
+    summary = {'added': 0, 'updated': 0, 'removed': 0, 'unchanged': 0, 'cancelled': False}
+    purge_missing = pdf_files is None
+    if pdf_files is None:
+        pdf_files = processor.list_documents(docs_folder)
+    pdf_files = [Path(pdf_file) for pdf_file in pdf_files]
+    print(f"Found {len(pdf_files)} PDF files to check...")
+
+    changed = []
+    for pdf_file in pdf_files:
+        file_hash = processor.file_hash(str(pdf_file))
+        if manifest.is_current(pdf_file.name, file_hash):
+            summary['unchanged'] += 1
+        else:
+            changed.append((pdf_file, file_hash))
+    file_hashes = dict(changed)
+
+    progress = {'files_done': 0, 'files_total': len(changed), 'chunks': 0,
+                'elapsed': 0.0, 'chunks_per_sec': 0.0}
+    start = last_checkpoint = time.perf_counter()
+
+    def checkpoint() -> None:
+        # Manifest entries are only written with the chunks they describe
+        embeddings_manager.save_indexes()
+        manifest.save()
+
+    def report(file_chunks: int) -> None:
+        progress['elapsed'] = time.perf_counter() - start
+        chunks = progress['chunks'] + file_chunks
+        progress['chunks_per_sec'] = chunks / progress['elapsed'] if progress['elapsed'] else 0.0
+        if progress_callback:
+            progress_callback(dict(progress, chunks=chunks))
+
+    try:
+        # Changed files are extracted (in parallel if the processor has workers)
+        # while earlier ones are being embedded
+        for pdf_file, docs in processor.iter_files([pdf_file for pdf_file, _ in changed]):
+            if cancel_event is not None and cancel_event.is_set():
+                summary['cancelled'] = True
+                break
+            previously_ingested = pdf_file.name in manifest.files
+            print(f"Processing: {pdf_file.name}")
+            new_ids = embeddings_manager.chunk_ids(docs)
+
+            # Delete only the chunks the new version no longer produces; the rest are upserted
+            stale_ids = set(manifest.chunk_ids(pdf_file.name)) - set(new_ids)
+            if stale_ids:
+                embeddings_manager.delete_documents(ids=sorted(stale_ids), save=False)
+            elif not previously_ingested:
+                # Clears chunks written before the manifest existed
+                embeddings_manager.delete_documents(source=pdf_file.name, save=False)
+            written = embeddings_manager.add_documents_stream(
+                docs, progress_callback=lambda stats: report(stats['chunks']), save=False)
+
+            manifest.record(pdf_file.name, file_hashes[pdf_file], new_ids)
+            summary['updated' if previously_ingested else 'added'] += 1
+            progress['files_done'] += 1
+            progress['chunks'] += written
+            report(0)
+            if time.perf_counter() - last_checkpoint >= checkpoint_seconds:
+                checkpoint()
+                last_checkpoint = time.perf_counter()
+
+        current_names = {pdf_file.name for pdf_file in pdf_files}
+        removed_names = [name for name in manifest.files if name not in current_names]
+        if not purge_missing or summary['cancelled']:
+            removed_names = []
+        for name in removed_names:
+            print(f"Removing: {name}")
+            embeddings_manager.delete_documents(ids=manifest.chunk_ids(name), save=False)
+            if getattr(processor, 'page_store', None) is not None:
+                processor.page_store.remove(name)
+            manifest.remove(name)
+            summary['removed'] += 1
+    finally:
+        checkpoint()
+    summary['total_chunks'] = embeddings_manager.vector_store.count()
+    status = "⏸️ Sync cancelled" if summary['cancelled'] else "✅ Sync complete"
+    print(f"{status}: {summary['added']} added, {summary['updated']} updated, "
+          f"{summary['removed']} removed, {summary['unchanged']} unchanged")
+    
+    dedup_report = embeddings_manager.deduplication_report()
+    if dedup_report is not None:
+        summary['deduplication'] = dedup_report
+        print(f"♻️ {dedup_report['duplicates']} near-duplicate chunks linked instead of embedded "
+              f"({dedup_report['vector_bytes_saved'] / 1e6:.2f} MB of vectors, "
+              f"~{dedup_report['embed_seconds_saved']:.1f}s of embedding saved)")
+    return summary
@@ -0,0 +1,241 @@
+"""
+Background Ingestion for Knowledge Transfer Assistant
+Persistent job queue and a worker thread that syncs documents while the index stays searchable
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+from .ingestion import sync_documents
+
+
+class JobQueue:
+    """First-in, first-out ingestion jobs stored in SQLite, so they survive restarts"""
+
+    FILENAME = "ingestion_jobs.sqlite3"
+
+    def __init__(self, path: str):
+        """
+        Initialize the job queue
+
+        Args:
+            path: SQLite database file
+        """
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    target TEXT NOT NULL,
+                    sync INTEGER NOT NULL DEFAULT 0,
+                    status TEXT NOT NULL DEFAULT 'queued',
+                    created REAL NOT NULL,
+                    started REAL,
+                    finished REAL,
+                    files_done INTEGER NOT NULL DEFAULT 0,
+                    files_total INTEGER NOT NULL DEFAULT 0,
+                    chunks INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    summary TEXT
+                )""")
+
+    def submit(self, target: str, sync: bool = False) -> int:
+        """Queue a folder or PDF file; returns the job ID"""
+        with self._lock, self._conn:
+            cursor = self._conn.execute("INSERT INTO jobs (target, sync, created) VALUES (?, ?, ?)",
+                                        (target, int(sync), time.time()))
+            return cursor.lastrowid
+
+    def claim(self) -> Optional[Dict]:
+        """Mark the oldest queued job as running and return it"""
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1").fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE jobs SET status = 'running', started = ?, error = NULL WHERE id = ?",
+                               (time.time(), row['id']))
+        return self.get(row['id'])
+
+    def update(self, job_id: int, **fields) -> None:
+        """Set columns of a job, e.g. progress counters or its final status"""
+        if 'summary' in fields:
+            fields['summary'] = json.dumps(fields['summary'])
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock, self._conn:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def get(self, job_id: int) -> Optional[Dict]:
+        """A job as a dict, or None if there is no such job"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row is not None else None
+
+    def jobs(self, limit: int = 20) -> List[Dict]:
+        """Most recent jobs, newest first"""
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def pending(self) -> int:
+        """Number of jobs queued or running"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')").fetchone()[0]
+
+    def cancel(self, job_id: int) -> bool:
+        """Cancel a job that has not started yet"""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished = ? WHERE id = ? AND status = 'queued'",
+                (time.time(), job_id))
+            return cursor.rowcount > 0
+
+    def requeue_interrupted(self) -> int:
+        """Queue jobs left running by a process that stopped; returns how many"""
+        with self._lock, self._conn:
+            return self._conn.execute("UPDATE jobs SET status = 'queued' WHERE status = 'running'").rowcount
+
+    def close(self) -> None:
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict:
+        """Job row as a dict with its summary decoded"""
+        job = dict(row)
+        job['sync'] = bool(job['sync'])
+        job['summary'] = json.loads(job['summary']) if job['summary'] else None
+        return job
+
+
+class IngestionWorker:
+    """Runs queued ingestion jobs one at a time on a background thread"""
+
+    def __init__(self, embeddings_manager, processor, queue_path: Optional[str] = None,
+                 poll_interval: float = 1.0):
+        """
+        Initialize the worker
+
+        Args:
+            embeddings_manager: EmbeddingsManager the documents are written to
+            processor: DocumentProcessor used to extract and chunk files
+            queue_path: Job database (defaults to the knowledge base's folder in the vector database)
+            poll_interval: Seconds between checks for new jobs while idle
+        """
+        self.embeddings_manager = embeddings_manager
+        self.processor = processor
+        self.poll_interval = poll_interval
+        self.queue = JobQueue(queue_path or embeddings_manager.index_path(JobQueue.FILENAME))
+        self.current_job_id: Optional[int] = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        # Files saved at the last sync checkpoint are in the manifest, so requeued jobs
+        # only process what is left; after a crash that includes up to the last
+        # checkpoint_seconds (30 s) of files
+        resumed = self.queue.requeue_interrupted()
+        if resumed:
+            print(f"Resuming {resumed} interrupted ingestion job(s)")
+
+    def start(self) -> "IngestionWorker":
+        """Start the background thread"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="ingestion-worker", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop after the current file; an unfinished job is queued again for next time"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def submit(self, target: str, sync: bool = False) -> int:
+        """
+        Queue a folder or PDF file for ingestion
+
+        Args:
+            target: Folder of PDFs or a single PDF file
+            sync: For a folder, also purge documents that are no longer in it
+
+        Returns:
+            Job ID, for progress()
+        """
+        job_id = self.queue.submit(os.path.abspath(target), sync=sync)
+        self._wake.set()
+        return job_id
+
+    def progress(self, job_id: int) -> Optional[Dict]:
+        """Job status and counters, with elapsed seconds and an ETA while running"""
+        job = self.queue.get(job_id)
+        if job is None:
+            return None
+        end = job['finished'] or time.time()
+        job['elapsed'] = end - job['started'] if job['started'] else 0.0
+        job['eta_seconds'] = None
+        if job['status'] == 'running' and job['files_done']:
+            per_file = job['elapsed'] / job['files_done']
+            job['eta_seconds'] = per_file * (job['files_total'] - job['files_done'])
+        return job
+
+    def is_busy(self) -> bool:
+        """True while a job is running or waiting"""
+        return self.current_job_id is not None or self.queue.pending() > 0
+
+    def _run(self) -> None:
+        """Worker loop: claim and process jobs until stopped"""
+        while not self._stop.is_set():
+            job = self.queue.claim()
+            if job is None:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                continue
+            self.current_job_id = job['id']
+            try:
+                self._process(job)
+            finally:
+                self.current_job_id = None
+
+    def _process(self, job: Dict) -> None:
+        """Sync one job's target, recording progress as files are written"""
+        job_id, target = job['id'], job['target']
+        print(f"Ingestion job {job_id}: {target}")
+
+        def record_progress(stats: Dict) -> None:
+            self.queue.update(job_id, files_done=stats['files_done'], files_total=stats['files_total'],
+                              chunks=stats['chunks'])
+
+        try:
+            if os.path.isdir(target):
+                pdf_files = None if job['sync'] else self.processor.list_documents(target)
+                folder = target
+            elif os.path.isfile(target):
+                pdf_files, folder = [target], os.path.dirname(target)
+            else:
+                raise FileNotFoundError(f"No such file or folder: {target}")
+
+            summary = sync_documents(folder, self.processor, self.embeddings_manager,
+                                     progress_callback=record_progress, pdf_files=pdf_files,
+                                     cancel_event=self._stop)
+        except Exception as e:
+            print(f"❌ Ingestion job {job_id} failed: {str(e)}")
+            self.queue.update(job_id, status='failed', finished=time.time(), error=str(e))
+            return
+
+        if summary['cancelled']:
+            self.queue.update(job_id, status='queued')
+        else:
+            self.queue.update(job_id, status='done', finished=time.time(), summary=summary)
@@ -0,0 +1,199 @@
+"""
+Instrumentation for Knowledge Transfer Assistant
+Timing spans, counters and latency histograms for the ingestion and RAG request paths
+"""
+
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+
+# Histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram in the Prometheus style"""
+
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.last = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        """Record one sample"""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.last = value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Approximate quantile: upper bound of the bucket holding it"""
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for bound, count in zip(self.buckets + (self.max,), self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+class _NoopSpan:
+    """Span used while metrics are disabled; does nothing"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    """Times a block and records it as a stage latency and a trace entry"""
+
+    def __init__(self, metrics: "Metrics", name: str):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        stack = self.metrics._stack()
+        self.parent = stack[-1] if stack else None
+        stack.append(self.name)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        duration = time.perf_counter() - self.start
+        self.metrics._stack().pop()
+        self.metrics.observe(self.name, duration)
+        self.metrics._record_span(self.name, self.parent, duration, error=exc_type is not None)
+        return False
+
+
+class Metrics:
+    """Process-wide registry of stage latencies, counters and recent spans"""
+
+    def __init__(self, enabled: bool = False, max_spans: int = 1000):
+        """
+        Initialize the registry
+
+        Args:
+            enabled: Record anything at all; when False spans and counters cost a flag check
+            max_spans: Recent spans kept for JSON export
+        """
+        self.enabled = enabled
+        self.histograms: Dict[str, Histogram] = {}
+        self.counters: Dict[str, float] = {}
+        self.spans = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def span(self, name: str):
+        """Context manager timing a stage, e.g. `with metrics.span("vector_query"):`"""
+        if not self.enabled:
+            return _NOOP_SPAN
+        return _Span(self, name)
+
+    def timed(self, name: str) -> Callable:
+        """Decorator timing every call of a function as a stage"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with _Span(self, name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def increment(self, name: str, value: float = 1) -> None:
+        """Add to a counter"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name: str, seconds: float) -> None:
+        """Record a stage latency"""
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+    def reset(self) -> None:
+        """Forget everything recorded so far"""
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+            self.spans.clear()
+
+    def summary(self) -> List[Dict]:
+        """Per-stage count, mean, p50, p95 and last latency in milliseconds"""
+        with self._lock:
+            return [{
+                'stage': name,
+                'count': histogram.count,
+                'mean_ms': histogram.sum / histogram.count * 1000,
+                'p50_ms': histogram.quantile(0.50) * 1000,
+                'p95_ms': histogram.quantile(0.95) * 1000,
+                'last_ms': histogram.last * 1000
+            } for name, histogram in sorted(self.histograms.items())]
+
+    def to_prometheus(self, prefix: str = "kta") -> str:
+        """Metrics in the Prometheus text exposition format"""
+        lines = [f"# TYPE {prefix}_stage_seconds histogram"]
+        with self._lock:
+            for name, histogram in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + (float('inf'),), histogram.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float('inf') else repr(bound)
+                    lines.append(f'{prefix}_stage_seconds_bucket{{stage="{name}",le="{le}"}} {cumulative}')
+                lines.append(f'{prefix}_stage_seconds_sum{{stage="{name}"}} {histogram.sum}')
+                lines.append(f'{prefix}_stage_seconds_count{{stage="{name}"}} {histogram.count}')
+            for name, value in sorted(self.counters.items()):
+                lines.append(f"# TYPE {prefix}_{name}_total counter")
+                lines.append(f"{prefix}_{name}_total {value}")
+        return "\n".join(lines) + "\n"
+
+    def to_json_lines(self) -> str:
+        """Recent spans, then one line per stage summary and counter"""
+        with self._lock:
+            records = list(self.spans)
+            records += [{'type': 'counter', 'name': name, 'value': value}
+                        for name, value in sorted(self.counters.items())]
+        records += [dict(stage, type='stage') for stage in self.summary()]
+        return "".join(json.dumps(record) + "\n" for record in records)
+
+    def _stack(self) -> List[str]:
+        """Names of the spans open on this thread"""
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _record_span(self, name: str, parent: Optional[str], duration: float, error: bool) -> None:
+        """Keep a trace entry for JSON export"""
+        self.spans.append({'type': 'span', 'name': name, 'parent': parent, 'timestamp': time.time(),
+                           'duration_ms': duration * 1000, 'error': error,
+                           'thread': threading.current_thread().name})
+
+
+# Shared registry, enabled with KTA_METRICS=1
+metrics = Metrics(enabled=os.environ.get("KTA_METRICS", "").lower() in ("1", "true", "yes"))
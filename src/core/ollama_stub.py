@@ -0,0 +1,123 @@
+"""
+Ollama Stub Server for Knowledge Transfer Assistant
+Minimal local stand-in for the Ollama generate API, for tests and benchmarks
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+
+class StubOllamaServer:
+    """Serves /api/generate with a canned answer, streamed token by token"""
+
+    def __init__(self, response_text: str = "This is a stub answer based on the documentation.",
+                 first_token_delay: float = 0.0, token_delay: float = 0.0,
+                 host: str = "127.0.0.1", port: int = 0):
+        """
+        Initialize the stub server
+
+        Args:
+            response_text: Answer returned for every prompt, split into word tokens
+            first_token_delay: Seconds before the first token (simulated prompt processing)
+            token_delay: Seconds between tokens (simulated generation speed)
+            host: Interface to listen on
+            port: Port to listen on (0 picks a free port)
+        """
+        self.response_text = response_text
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self.requests_served = 0
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """Base URL to pass to ChatBot"""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubOllamaServer":
+        """Serve requests in a background thread"""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Shut the server down"""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "StubOllamaServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def _tokens(self):
+        """Word-sized tokens of the canned answer, keeping the spaces"""
+        words = self.response_text.split(" ")
+        return [word + " " for word in words[:-1]] + words[-1:]
+
+    def _handler(self):
+        """Request handler class bound to this server's settings"""
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path == "/api/tags":
+                    self._send_json({'models': [{'name': 'stub'}]})
+                else:
+                    self.send_error(404)
+
+            def do_POST(self):
+                if self.path != "/api/generate":
+                    self.send_error(404)
+                    return
+                length = int(self.headers.get('Content-Length', 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                stub.requests_served += 1
+                time.sleep(stub.first_token_delay)
+
+                if not request.get('stream', True):
+                    self._send_json({'model': request.get('model'), 'response': stub.response_text,
+                                     'done': True})
+                    return
+
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/x-ndjson')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                try:
+                    for i, token in enumerate(stub._tokens()):
+                        if i:
+                            time.sleep(stub.token_delay)
+                        self._send_chunk({'model': request.get('model'), 'response': token, 'done': False})
+                    self._send_chunk({'model': request.get('model'), 'response': '', 'done': True})
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    # Client cancelled the generation
+                    self.close_connection = True
+
+            def _send_chunk(self, payload):
+                data = json.dumps(payload).encode('utf-8') + b"\n"
+                self.wfile.write(f"{len(data):X}\r\n".encode('ascii') + data + b"\r\n")
+                self.wfile.flush()
+
+            def _send_json(self, payload):
+                data = json.dumps(payload).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
@@ -0,0 +1,136 @@
+"""
+Page Store for Knowledge Transfer Assistant
+Extracted PDF page text cached on disk, readable by (source, page) without reopening the PDF
+"""
+
+import bisect
+import hashlib
+import json
+import os
+import threading
+import zlib
+from typing import Dict, List, Optional
+
+
+class PageStore:
+    """Compressed page text per source file, with an offset index for constant-time page reads"""
+
+    def __init__(self, path: str = "data/processed/page_store"):
+        """
+        Initialize the page store
+
+        Args:
+            path: Folder holding one .pages data file and one .json index per source
+        """
+        self.path = path
+        self._indexes: Dict[str, Optional[Dict]] = {}
+        self._lock = threading.Lock()
+
+    def put(self, source: str, pages: List[str], page_starts: List[int]) -> None:
+        """
+        Store a source's pages
+
+        Args:
+            source: Source file name, as in chunk metadata
+            pages: Text of each page, in order
+            page_starts: Offset of each page in the document text the chunks were cut from
+        """
+        os.makedirs(self.path, exist_ok=True)
+        data_path, index_path = self._paths(source)
+        offsets = [0]
+        with open(f"{data_path}.tmp", 'wb') as file:
+            for page in pages:
+                blob = zlib.compress(page.encode('utf-8'))
+                file.write(blob)
+                offsets.append(offsets[-1] + len(blob))
+        index = {'source': source, 'offsets': offsets, 'page_starts': list(page_starts)}
+        with open(f"{index_path}.tmp", 'w', encoding='utf-8') as file:
+            json.dump(index, file)
+
+        with self._lock:
+            os.replace(f"{data_path}.tmp", data_path)
+            os.replace(f"{index_path}.tmp", index_path)
+            self._indexes[source] = index
+
+    def remove(self, source: str) -> None:
+        """Forget a source's pages"""
+        with self._lock:
+            for path in self._paths(source):
+                if os.path.exists(path):
+                    os.remove(path)
+            self._indexes.pop(source, None)
+
+    def page_count(self, source: str) -> int:
+        """Number of pages stored for a source (0 if none)"""
+        index = self._index(source)
+        return len(index['offsets']) - 1 if index else 0
+
+    def get_page(self, source: str, page: int) -> Optional[str]:
+        """Text of a page (numbered from 1), or None if it is not stored"""
+        pages = self.get_pages(source, page, page)
+        return pages[0] if pages else None
+
+    def get_pages(self, source: str, first: int, last: int) -> List[str]:
+        """Text of pages first..last inclusive (numbered from 1), clipped to the pages stored"""
+        index = self._index(source)
+        if index is None:
+            return []
+        first, last = max(1, first), min(last, len(index['offsets']) - 1)
+        if first > last:
+            return []
+        offsets = index['offsets']
+        with open(self._paths(source)[0], 'rb') as file:
+            file.seek(offsets[first - 1])
+            data = file.read(offsets[last] - offsets[first - 1])
+        return [zlib.decompress(data[offsets[i - 1] - offsets[first - 1]:offsets[i] - offsets[first - 1]]).decode('utf-8')
+                for i in range(first, last + 1)]
+
+    def page_of(self, source: str, char_offset: int) -> Optional[int]:
+        """Page (numbered from 1) containing a document text offset"""
+        index = self._index(source)
+        if index is None:
+            return None
+        return max(1, bisect.bisect_right(index['page_starts'], char_offset))
+
+    def get_text(self, source: str, char_start: int, char_end: int) -> Optional[str]:
+        """Document text between two offsets, read from only the pages that span them"""
+        index = self._index(source)
+        if index is None:
+            return None
+        first, last = self.page_of(source, char_start), self.page_of(source, max(char_start, char_end - 1))
+        base = index['page_starts'][first - 1]
+        text = "\n".join(self.get_pages(source, first, last))
+        return text[max(0, char_start - base):max(0, char_end - base)]
+
+    def expand(self, result: Dict, context_chars: int = 500) -> Dict:
+        """
+        A search result widened by up to context_chars of surrounding text on each side
+
+        Returns the result unchanged if it has no offsets or its source is not stored.
+        """
+        metadata = result['metadata']
+        if metadata.get('char_start') is None:
+            return result
+        start = max(0, metadata['char_start'] - context_chars)
+        end = metadata['char_end'] + context_chars
+        text = self.get_text(metadata['source'], start, end)
+        if text is None:
+            return result
+        return dict(result, content=text.strip(), expanded=True)
+
+    def _index(self, source: str) -> Optional[Dict]:
+        """Offset index of a source, read from disk once"""
+        with self._lock:
+            if source not in self._indexes:
+                index_path = self._paths(source)[1]
+                try:
+                    with open(index_path, 'r', encoding='utf-8') as file:
+                        self._indexes[source] = json.load(file)
+                except (OSError, ValueError):
+                    return None
+            return self._indexes[source]
+
+    def _paths(self, source: str) -> tuple:
+        """Data and index file of a source"""
+        key = hashlib.sha1(source.encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.path, f"{key}.pages"), os.path.join(self.path, f"{key}.json")
@@ -0,0 +1,374 @@
+"""
+Quantized Index for Knowledge Transfer Assistant
+Compact int8 / binary embedding search with rescoring of the top candidates
+"""
+
+import json
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+# Number of set bits in every byte value, for Hamming distances on packed codes
+POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+# int8 rows scored per matrix product, bounding the float32 copy made of each block
+SCORE_BLOCK_ROWS = 8192
+
+
+def compute_distances(query: np.ndarray, embeddings: np.ndarray, space: str = "l2") -> np.ndarray:
+    """Distances in the same convention as Chroma's HNSW spaces"""
+    if space == 'cosine':
+        norms = np.linalg.norm(embeddings, axis=1) * np.linalg.norm(query)
+        return 1 - embeddings @ query / np.maximum(norms, 1e-12)
+    if space == 'ip':
+        return 1 - embeddings @ query
+    # Chroma's l2 space reports squared euclidean distance
+    return np.sum((embeddings - query) ** 2, axis=1)
+
+
+class QuantizedIndex:
+    """
+    Memory-mapped int8 or binary embeddings, searched approximately then rescored
+
+    Rows added since the last save are kept in memory next to the mapped arrays,
+    and removed rows are only masked until save() writes the surviving rows to new
+    files block by block, so writes never read the whole mapped matrix into memory.
+    """
+
+    PRECISIONS = ("int8", "binary")
+
+    def __init__(self, path: Optional[str], precision: str = "int8", space: str = "l2",
+                 rescore_multiplier: int = 4, keep_float: bool = False):
+        """
+        Initialize the quantized index
+
+        Args:
+            path: Folder the index files are stored in (None keeps it in memory only)
+            precision: "int8" (4x smaller) or "binary" (32x smaller in memory; int8
+                codes are kept on disk for rescoring)
+            space: Distance space, as in Chroma: "l2", "cosine" or "ip"
+            rescore_multiplier: Candidates rescored per requested result
+            keep_float: Also keep float32 vectors on disk so search() rescores exactly;
+                without them search() rescores with the int8 codes, and callers can
+                rescore candidates() from their own vectors
+        """
+        if precision not in self.PRECISIONS:
+            raise ValueError(f"Unknown precision: {precision}")
+        self.path = path
+        self.precision = precision
+        self.space = space
+        self.rescore_multiplier = rescore_multiplier
+        self.keep_float = keep_float
+
+        self.ids: List[Optional[str]] = []             # row -> chunk ID, None once removed
+        self._positions: Dict[str, int] = {}
+        # Saved rows, memory-mapped on load (scales, norms and binary codes are read into memory)
+        self.int8_codes: Optional[np.ndarray] = None   # (n, d) int8
+        self.scales: Optional[np.ndarray] = None       # (n,) float32, per-vector int8 scale
+        self.norms: Optional[np.ndarray] = None        # (n,) float32, norm of each dequantized vector
+        self.binary_codes: Optional[np.ndarray] = None  # (n, d/8) packed sign bits
+        self.floats: Optional[np.ndarray] = None       # (n, d) float32, only with keep_float
+        # Rows added since the last save, by array name; added rows are buffered and
+        # concatenated once, before the next read or save
+        self._tail: Dict[str, np.ndarray] = {}
+        self._pending: List[Dict[str, np.ndarray]] = []
+        self._removed_rows: List[int] = []             # rows of removed IDs, dropped on save
+        self._dirty = False  # changed since the last save or load
+        self._lock = threading.Lock()
+
+        if path and os.path.exists(os.path.join(path, "ids.json")):
+            self.load()
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    @staticmethod
+    def quantize_int8(embeddings: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Symmetric per-vector int8 quantization: codes and the scale to undo it"""
+        scales = np.max(np.abs(embeddings), axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.clip(np.round(embeddings / scales[:, None]), -127, 127).astype(np.int8)
+        return codes, scales.astype(np.float32)
+
+    @staticmethod
+    def quantize_binary(embeddings: np.ndarray) -> np.ndarray:
+        """One sign bit per dimension, packed into bytes"""
+        return np.packbits(embeddings > 0, axis=1)
+
+    def add(self, ids: List[str], embeddings: np.ndarray) -> None:
+        """Add vectors, replacing any already stored under the same IDs"""
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        with self._lock:
+            self._remove(ids)
+            codes, scales = self.quantize_int8(embeddings)
+            norms = (np.linalg.norm(codes.astype(np.float32), axis=1) * scales).astype(np.float32)
+            rows = {'int8_codes': codes, 'scales': scales, 'norms': norms}
+            if self.precision == "binary":
+                rows['binary_codes'] = self.quantize_binary(embeddings)
+            if self.keep_float:
+                rows['floats'] = embeddings
+            self._pending.append(rows)
+            for chunk_id in ids:
+                self._positions[chunk_id] = len(self.ids)
+                self.ids.append(chunk_id)
+            self._dirty = True
+
+    def remove(self, ids: List[str]) -> None:
+        """Remove vectors by ID"""
+        with self._lock:
+            self._remove(ids)
+
+    def clear(self) -> None:
+        """Remove every vector"""
+        with self._lock:
+            self.ids, self._positions, self._pending, self._tail, self._removed_rows = [], {}, [], {}, []
+            self.int8_codes = self.scales = self.norms = self.binary_codes = self.floats = None
+            self._dirty = True
+
+    def search(self, query: np.ndarray, n_results: int = 5) -> List[Tuple[str, float]]:
+        """
+        Nearest (ID, distance) pairs for a float query
+
+        The candidates() are rescored with float vectors if kept, otherwise with
+        their int8 codes.
+        """
+        query = np.asarray(query, dtype=np.float32)
+        with self._lock:
+            if not self._positions:
+                return []
+            candidates, approximate = self._candidates(query, n_results)
+
+            if self.keep_float:
+                distances = compute_distances(query, self._take('floats', candidates), self.space)
+            elif self.precision == "binary":
+                distances = self._int8_distances(query, candidates)
+            else:
+                distances = approximate[candidates]
+
+            order = np.argsort(distances)[:n_results]
+            return [(self.ids[candidates[i]], float(distances[i])) for i in order]
+
+    def candidates(self, query: np.ndarray, n_results: int = 5) -> List[str]:
+        """
+        IDs of the rescore_multiplier * n_results approximate nearest vectors
+
+        Scored on the quantized codes only (Hamming distance for binary, float query
+        x int8 codes for int8), for callers that rescore them with their own vectors.
+        """
+        query = np.asarray(query, dtype=np.float32)
+        with self._lock:
+            if not self._positions:
+                return []
+            candidates, _ = self._candidates(query, n_results)
+            return [self.ids[row] for row in candidates]
+
+    def save(self) -> None:
+        """
+        Write the index files if anything changed; arrays are memory-mapped again on load
+
+        The rows still in the index are copied block by block into new files, which are
+        written under a temporary name and swapped in, so arrays that are still mapped
+        from the previous save are never written to.
+        """
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            self._consolidate()
+            os.makedirs(self.path, exist_ok=True)
+            live = np.array(sorted(self._positions.values()), dtype=np.int64)
+            for name in self._names():
+                tmp_path = os.path.join(self.path, f"{name}.npy.tmp")
+                self._write_rows(name, live, tmp_path)
+                os.replace(tmp_path, os.path.join(self.path, f"{name}.npy"))
+            ids = [self.ids[row] for row in live]
+            tmp_path = os.path.join(self.path, "ids.json.tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as file:
+                json.dump({'precision': self.precision, 'space': self.space, 'ids': ids}, file)
+            os.replace(tmp_path, os.path.join(self.path, "ids.json"))
+            self._open(ids)
+            self._dirty = False
+
+    def load(self) -> None:
+        """Open saved index files; binary codes are read into memory, the rest stay on disk"""
+        try:
+            with open(os.path.join(self.path, "ids.json"), 'r', encoding='utf-8') as file:
+                data = json.load(file)
+            if data['precision'] != self.precision or data['space'] != self.space:
+                raise ValueError("index was built with different settings")
+            self._open(data['ids'])
+            self._dirty = False
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Ignoring unusable quantized index {self.path}: {str(e)}")
+            self.clear()
+
+    def stats(self) -> Dict:
+        """Bytes used by each representation, and the float32 baseline for comparison"""
+        with self._lock:
+            self._consolidate()
+            sizes = {name: sum(int(array.nbytes) for array in (getattr(self, name), self._tail.get(name))
+                               if array is not None)
+                     for name in self._names()}
+            codes = self.int8_codes if self.int8_codes is not None else self._tail.get('int8_codes')
+            dim = codes.shape[1] if codes is not None else 0
+            vectors = len(self._positions)
+        in_memory = (sizes.get('binary_codes', sizes.get('int8_codes', 0)) + sizes.get('scales', 0)
+                     + sizes.get('norms', 0))
+        return {'vectors': vectors, 'precision': self.precision, 'bytes': sizes,
+                'search_bytes': in_memory, 'float32_bytes': vectors * dim * 4}
+
+    def _candidates(self, query: np.ndarray, n_results: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Rows of the best approximate matches, and every row's approximate distance; caller holds the lock"""
+        self._consolidate()
+        n_candidates = min(len(self._positions), max(n_results, n_results * self.rescore_multiplier))
+        if self.precision == "binary":
+            query_code = self.quantize_binary(query[None, :])[0]
+            approximate = np.concatenate([
+                POPCOUNT[np.bitwise_xor(codes, query_code)].sum(axis=1, dtype=np.int32).astype(np.float32)
+                for codes in self._segments('binary_codes')])
+        else:
+            approximate = self._int8_distances(query)
+        if self._removed_rows:
+            approximate[self._removed_rows] = np.inf
+        return self._top(approximate, n_candidates), approximate
+
+    def _int8_distances(self, query: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Distances between a float query and int8 vectors (all rows by default)
+
+        Dot products are taken on the codes block by block and scaled afterwards, so
+        the matrix is never dequantized as a whole; the stored norms give cosine and l2.
+        """
+        if rows is None:
+            blocks = [codes[start:start + SCORE_BLOCK_ROWS]
+                      for codes in self._segments('int8_codes')
+                      for start in range(0, len(codes), SCORE_BLOCK_ROWS)]
+            scales = np.concatenate(list(self._segments('scales')))
+            norms = np.concatenate(list(self._segments('norms')))
+        else:
+            blocks = [self._take('int8_codes', rows)]
+            scales, norms = self._take('scales', rows), self._take('norms', rows)
+        dots = np.concatenate([block @ query for block in blocks]).astype(np.float32) if blocks \
+            else np.empty(0, dtype=np.float32)
+        dots *= scales
+
+        if self.space == 'cosine':
+            return 1 - dots / np.maximum(norms * np.linalg.norm(query), 1e-12)
+        if self.space == 'ip':
+            return 1 - dots
+        return norms ** 2 - 2 * dots + float(query @ query)
+
+    @staticmethod
+    def _top(distances: np.ndarray, count: int) -> np.ndarray:
+        """Row numbers of the count smallest distances"""
+        if count >= len(distances):
+            return np.arange(len(distances))
+        return np.argpartition(distances, count - 1)[:count]
+
+    def _names(self) -> List[str]:
+        """Names of the arrays this index keeps, which are also their file names"""
+        names = ['int8_codes', 'scales', 'norms']
+        if self.precision == "binary":
+            names.append('binary_codes')
+        if self.keep_float:
+            names.append('floats')
+        return names
+
+    def _segments(self, name: str) -> List[np.ndarray]:
+        """Saved rows and rows added since, of one array; caller holds the lock"""
+        return [array for array in (getattr(self, name), self._tail.get(name)) if array is not None]
+
+    def _take(self, name: str, rows: np.ndarray) -> np.ndarray:
+        """Copy of some rows of one array, read from the saved and added rows; caller holds the lock"""
+        rows = np.asarray(rows, dtype=np.int64)
+        saved = getattr(self, name)
+        n_saved = len(saved) if saved is not None else 0
+        parts = []
+        if n_saved:
+            parts.append((rows < n_saved, saved))
+        if name in self._tail:
+            parts.append((rows >= n_saved, self._tail[name]))
+        taken = None
+        for mask, array in parts:
+            selected = rows[mask] - (0 if array is saved else n_saved)
+            values = np.asarray(array[np.sort(selected)] if len(selected) else array[:0])
+            if taken is None:
+                taken = np.empty((len(rows),) + array.shape[1:], dtype=array.dtype)
+            # Rows are read in file order and put back in the requested order
+            taken[np.flatnonzero(mask)[np.argsort(selected, kind='stable')]] = values
+        return taken
+
+    def _write_rows(self, name: str, rows: np.ndarray, path: str) -> None:
+        """Write some rows of one array to a .npy file, a block at a time; caller holds the lock"""
+        segments = self._segments(name)
+        template = max(segments, key=len) if segments else None
+        if template is not None:
+            shape, dtype = (len(rows),) + template.shape[1:], template.dtype
+        else:
+            shape, dtype = ((0,) if name in ('scales', 'norms') else (0, 0)), np.float32
+        output = np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=shape)
+        for start in range(0, len(rows), SCORE_BLOCK_ROWS):
+            output[start:start + SCORE_BLOCK_ROWS] = self._take(name, rows[start:start + SCORE_BLOCK_ROWS])
+        output.flush()
+        del output
+
+    def _open(self, ids: List[str]) -> None:
+        """Map the saved index files and forget the rows added and removed before; caller holds the lock"""
+        self.int8_codes = np.load(os.path.join(self.path, "int8_codes.npy"), mmap_mode='r')
+        self.scales = np.load(os.path.join(self.path, "scales.npy"))
+        self.norms = np.load(os.path.join(self.path, "norms.npy"))
+        self.binary_codes = None
+        if self.precision == "binary":
+            self.binary_codes = np.load(os.path.join(self.path, "binary_codes.npy"))
+        self.floats = None
+        if self.keep_float:
+            self.floats = np.load(os.path.join(self.path, "floats.npy"), mmap_mode='r')
+        self.ids = list(ids)
+        self._positions = {chunk_id: i for i, chunk_id in enumerate(self.ids)}
+        self._tail, self._pending, self._removed_rows = {}, [], []
+
+    def _consolidate(self) -> None:
+        """Append buffered rows to the rows added since the last save; caller holds the lock"""
+        if not self._pending:
+            return
+        for name in self._pending[0]:
+            parts = [rows[name] for rows in self._pending]
+            if name in self._tail:
+                parts.insert(0, self._tail[name])
+            self._tail[name] = np.concatenate(parts)
+        self._pending = []
+
+    def _remove(self, ids: List[str]) -> None:
+        """Mask the rows of IDs until the next save; caller holds the lock"""
+        for chunk_id in ids:
+            row = self._positions.pop(chunk_id, None)
+            if row is not None:
+                self.ids[row] = None
+                self._removed_rows.append(row)
+                self._dirty = True
+        if not self.path and len(self._removed_rows) > len(self._positions):
+            # Nothing is saved without a path, so masked rows are dropped once they are the majority
+            self._consolidate()
+            live = np.array(sorted(self._positions.values()), dtype=np.int64)
+            for name in self._names():
+                setattr(self, name, self._take(name, live))
+            self.ids = [self.ids[row] for row in live]
+            self._positions = {chunk_id: i for i, chunk_id in enumerate(self.ids)}
+            self._tail, self._removed_rows = {}, []
+
+
+def measure_recall(index: QuantizedIndex, embeddings: np.ndarray, ids: List[str],
+                   queries: np.ndarray, k: int = 10) -> float:
+    """Mean overlap between the index's top-k and exact float top-k for each query"""
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    overlaps = []
+    for query in np.asarray(queries, dtype=np.float32):
+        exact = np.argsort(compute_distances(query, embeddings, index.space))[:k]
+        expected = {ids[i] for i in exact}
+        found = {chunk_id for chunk_id, _ in index.search(query, k)}
+        overlaps.append(len(expected & found) / len(expected))
+    return float(np.mean(overlaps)) if overlaps else 0.0
@@ -0,0 +1,156 @@
+"""
+Reranker for Knowledge Transfer Assistant
+Re-scores first-stage search results with a cross-encoder, within a latency budget
+"""
+
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from typing import Dict, List, Optional
+
+from . import resources
+from .instrumentation import metrics
+from .query_cache import LRUCache, normalize_query
+
+
+class CrossEncoderReranker:
+    """Reorders candidates by cross-encoder relevance, falling back to first-stage order when slow"""
+
+    def __init__(self, model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2",
+                 candidate_pool: int = 20, batch_size: int = 32,
+                 latency_budget: Optional[float] = 0.5, cache_size: int = 4096):
+        """
+        Initialize the reranker
+
+        Args:
+            model_name: Sentence-transformers CrossEncoder model
+            candidate_pool: First-stage results scored per query
+            batch_size: Pairs per forward pass
+            latency_budget: Seconds a rerank may take before the first-stage order is
+                returned instead (None waits for scoring to finish)
+            cache_size: (query, chunk) pair scores kept in memory
+        """
+        self.model_name = model_name
+        self.candidate_pool = candidate_pool
+        self.batch_size = batch_size
+        self.latency_budget = latency_budget
+        self.pair_cache = LRUCache(max_size=cache_size)
+        self.fallbacks = 0
+        self.disabled_reason: Optional[str] = None
+        self._model = None
+
+        # Exponential moving average of scoring time per pair, used to skip
+        # scoring up front when it clearly will not fit the budget
+        self.seconds_per_pair: Optional[float] = None
+
+        # Scoring runs on one worker thread so a slow batch can be abandoned by
+        # the caller while it finishes (and fills the cache) in the background
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="reranker")
+        # Pairs submitted to the worker and not yet scored, so callers can tell
+        # how long their batch would wait behind others
+        self._queued_pairs = 0
+        self._queue_lock = threading.Lock()
+
+    def rerank(self, query: str, results: List[Dict], n_results: Optional[int] = None) -> List[Dict]:
+        """
+        Reorder results by cross-encoder score
+
+        Args:
+            query: The search query
+            results: First-stage results, best first (only the first candidate_pool are scored)
+            n_results: Number of results to return (default all candidates)
+
+        Returns:
+            Results with a 'rerank_score', best first; the first-stage order if the
+            model is unavailable or scoring would exceed the latency budget
+        """
+        candidates = results[:self.candidate_pool]
+        n_results = n_results or len(candidates)
+        if not candidates or self.disabled_reason:
+            return results[:n_results]
+
+        start = time.perf_counter()
+        query_key = normalize_query(query)
+        keys = [(query_key, self._chunk_key(result)) for result in candidates]
+        scores = [self.pair_cache.get(key) for key in keys]
+        missing = [i for i, score in enumerate(scores) if score is None]
+
+        # Shrink the pool to the uncached pairs the budget can pay for, after
+        # waiting for the batches already queued on the worker
+        if missing and self.latency_budget is not None and self.seconds_per_pair:
+            with self._queue_lock:
+                queued = self._queued_pairs
+            remaining = self.latency_budget - (time.perf_counter() - start) - queued * self.seconds_per_pair
+            affordable = max(0, int(remaining / self.seconds_per_pair))
+            if len(missing) > affordable:
+                cutoff = missing[affordable]
+                if cutoff < n_results:
+                    return self._fallback(results, n_results)
+                candidates, keys, scores = candidates[:cutoff], keys[:cutoff], scores[:cutoff]
+                missing = missing[:affordable]
+
+        if missing:
+
+            pairs = [(query, candidates[i]['content']) for i in missing]
+            with self._queue_lock:
+                self._queued_pairs += len(pairs)
+            future = self._executor.submit(self._score_pairs, pairs, [keys[i] for i in missing])
+            future.add_done_callback(lambda _: self._dequeue(len(pairs)))
+            timeout = None
+            if self.latency_budget is not None:
+                timeout = max(0.0, self.latency_budget - (time.perf_counter() - start))
+            try:
+                new_scores = future.result(timeout=timeout)
+            except TimeoutError:
+                # A batch still waiting in the queue is dropped, so abandoned work never
+                # piles up; one already running finishes and fills the cache
+                future.cancel()
+                return self._fallback(results, n_results)
+            except Exception as e:
+                self.disabled_reason = str(e)
+                print(f"Reranking disabled, cross-encoder unavailable: {self.disabled_reason}")
+                return results[:n_results]
+            for i, score in zip(missing, new_scores):
+                scores[i] = score
+
+        reranked = [dict(result, rerank_score=score) for result, score in zip(candidates, scores)]
+        reranked.sort(key=lambda result: result['rerank_score'], reverse=True)
+        metrics.observe("rerank", time.perf_counter() - start)
+        return reranked[:n_results]
+
+    def _score_pairs(self, pairs: List[tuple], keys: List[tuple]) -> List[float]:
+        """Score pairs in one batched pass and cache the scores (runs on the worker thread)"""
+        if self._model is None:
+            self._model = resources.get_cross_encoder(self.model_name)
+        start = time.perf_counter()
+        scores = [float(score) for score in self._model.predict(pairs, batch_size=self.batch_size)]
+        per_pair = (time.perf_counter() - start) / len(pairs)
+        self.seconds_per_pair = per_pair if self.seconds_per_pair is None else (
+            0.8 * self.seconds_per_pair + 0.2 * per_pair)
+
+        for key, score in zip(keys, scores):
+            self.pair_cache.put(key, score)
+        return scores
+
+    def _dequeue(self, count: int) -> None:
+        """Forget a finished or cancelled batch's pairs"""
+        with self._queue_lock:
+            self._queued_pairs -= count
+
+    def _fallback(self, results: List[Dict], n_results: int) -> List[Dict]:
+        """First-stage order, counted so budget misses are visible"""
+        self.fallbacks += 1
+        metrics.increment("rerank_fallbacks")
+        return results[:n_results]
+
+    @staticmethod
+    def _chunk_key(result: Dict) -> str:
+        """Cache key of a candidate's text, so re-ingested chunks are scored afresh"""
+        return hashlib.sha1(result['content'].encode('utf-8')).hexdigest()
+
+    def stats(self) -> Dict:
+        """Fallback count, pair cache counters, the per-pair cost estimate and the worker's backlog"""
+        return {'fallbacks': self.fallbacks, 'pair_cache': self.pair_cache.stats(),
+                'seconds_per_pair': self.seconds_per_pair, 'queued_pairs': self._queued_pairs,
+                'disabled_reason': self.disabled_reason}
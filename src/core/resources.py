@@ -0,0 +1,121 @@
+"""
+Shared Resources for Knowledge Transfer Assistant
+Process-wide, lazily created instances of the embedding model, embedding cache and vector database client
+
+chromadb and sentence_transformers (which pulls in torch) are imported inside the
+loaders, so importing the core modules stays cheap until a model or client is needed.
+"""
+
+import os
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+
+class SharedResource:
+    """A lazily created, reference-counted instance shared by every caller in the process"""
+
+    def __init__(self, factory: Callable[[], Any], keep_alive: bool = True):
+        """
+        Initialize the shared resource
+
+        Args:
+            factory: Creates the instance on first acquire
+            keep_alive: Keep the instance after the last release (avoids reloading models)
+        """
+        self.factory = factory
+        self.keep_alive = keep_alive
+        self.instance = None
+        self.ref_count = 0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> Any:
+        """Instance of the resource, created by the first caller only"""
+        with self._lock:
+            if self.instance is None:
+                self.instance = self.factory()
+            self.ref_count += 1
+            return self.instance
+
+    def release(self) -> None:
+        """Give up one reference; the instance is dropped at zero unless kept alive"""
+        with self._lock:
+            self.ref_count = max(0, self.ref_count - 1)
+            if self.ref_count == 0 and not self.keep_alive:
+                self.instance = None
+
+
+_resources: Dict[Hashable, SharedResource] = {}
+_registry_lock = threading.Lock()
+
+
+def acquire(key: Hashable, factory: Callable[[], Any], keep_alive: bool = True) -> Any:
+    """Shared instance for key, created with factory if this is the first request"""
+    with _registry_lock:
+        resource = _resources.get(key)
+        if resource is None:
+            resource = _resources[key] = SharedResource(factory, keep_alive)
+    return resource.acquire()
+
+
+def release(key: Hashable) -> None:
+    """Release one reference to the shared instance for key"""
+    with _registry_lock:
+        resource = _resources.get(key)
+    if resource is not None:
+        resource.release()
+
+
+def ref_counts() -> Dict[Hashable, int]:
+    """Current reference count of every shared resource"""
+    with _registry_lock:
+        return {key: resource.ref_count for key, resource in _resources.items()}
+
+
+def model_key(model_name: str) -> tuple:
+    """Registry key of an embedding model"""
+    return ('embedding_model', model_name)
+
+
+def cache_key(model_name: str, cache_dir: str) -> tuple:
+    """Registry key of an embedding cache folder"""
+    return ('embedding_cache', os.path.abspath(cache_dir), model_name)
+
+
+def client_key(db_path: str) -> tuple:
+    """Registry key of a vector database client"""
+    return ('chroma_client', os.path.abspath(db_path))
+
+
+def get_embedding_model(model_name: str):
+    """Shared SentenceTransformer, loaded from disk once per process"""
+    def load():
+        from sentence_transformers import SentenceTransformer
+        print(f"Loading embedding model: {model_name}")
+        return SentenceTransformer(model_name)
+    return acquire(model_key(model_name), load)
+
+
+def get_cross_encoder(model_name: str):
+    """Shared CrossEncoder reranking model"""
+    def load():
+        from sentence_transformers import CrossEncoder
+        print(f"Loading reranking model: {model_name}")
+        return CrossEncoder(model_name)
+    return acquire(('cross_encoder', model_name), load)
+
+
+def get_embedding_cache(model_name: str, cache_dir: str):
+    """Shared EmbeddingCache for a model's vectors in a cache folder"""
+    def open_cache():
+        from .embedding_cache import EmbeddingCache
+        return EmbeddingCache(model_name, cache_dir)
+    return acquire(cache_key(model_name, cache_dir), open_cache, keep_alive=False)
+
+
+def get_chroma_client(db_path: str):
+    """Shared ChromaDB client for a database folder"""
+    def connect():
+        import chromadb
+        os.makedirs(db_path, exist_ok=True)
+        return chromadb.PersistentClient(path=db_path)
+    return acquire(client_key(db_path), connect)
@@ -0,0 +1,264 @@
+"""
+Hybrid Retriever for Knowledge Transfer Assistant
+Combines a BM25 keyword index with vector search so exact technical terms are not missed
+"""
+
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from .instrumentation import metrics
+
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase alphanumeric tokens, so 'SSL/TLS' matches 'ssl' and 'tls'"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """Inverted index with Okapi BM25 scoring, persisted next to the vector database"""
+
+    def __init__(self, path: Optional[str] = None, k1: float = 1.5, b: float = 0.75):
+        """
+        Initialize the keyword index
+
+        Args:
+            path: JSON file the index is stored in (None keeps it in memory only)
+            k1: Term frequency saturation
+            b: Document length normalization
+        """
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        # chunk ID -> {'content', 'metadata', 'length'}
+        self.docs: Dict[str, Dict] = {}
+        # term -> {chunk ID: term frequency}
+        self.postings: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self.total_length = 0
+        self._dirty = False  # changed since the last save or load
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            self.load()
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def add(self, ids: List[str], texts: List[str], metadatas: List[Dict]) -> None:
+        """Index chunks, replacing any already indexed under the same ID"""
+        with self._lock:
+            for chunk_id, text, metadata in zip(ids, texts, metadatas):
+                self._remove(chunk_id)
+                term_counts = Counter(tokenize(text))
+                for term, count in term_counts.items():
+                    self.postings[term][chunk_id] = count
+                length = sum(term_counts.values())
+                self.docs[chunk_id] = {'content': text, 'metadata': dict(metadata), 'length': length}
+                self.total_length += length
+                self._dirty = True
+
+    def remove(self, ids: List[str]) -> None:
+        """Remove chunks from the index"""
+        with self._lock:
+            for chunk_id in ids:
+                self._remove(chunk_id)
+
+    def ids_where(self, filters: Dict) -> List[str]:
+        """IDs of chunks whose metadata matches every filter"""
+        with self._lock:
+            return [chunk_id for chunk_id, doc in self.docs.items()
+                    if self._matches(doc['metadata'], filters)]
+
+    @metrics.timed("bm25_search")
+    def search(self, query: str, n_results: int = 10,
+               filters: Optional[Dict] = None) -> List[Tuple[str, float]]:
+        """
+        Top (chunk ID, BM25 score) pairs for the query
+
+        Args:
+            query: Search text
+            n_results: Number of pairs to return
+            filters: Metadata key -> value (or list of accepted values) chunks must match
+        """
+        with self._lock:
+            if not self.docs:
+                return []
+            doc_count = len(self.docs)
+            avg_length = self.total_length / doc_count or 1.0
+            scores: Dict[str, float] = defaultdict(float)
+
+            for term in set(tokenize(query)):
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for chunk_id, tf in postings.items():
+                    if filters and not self._matches(self.docs[chunk_id]['metadata'], filters):
+                        continue
+                    length = self.docs[chunk_id]['length']
+                    norm = self.k1 * (1 - self.b + self.b * length / avg_length)
+                    scores[chunk_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:n_results]
+
+    def get(self, chunk_id: str) -> Optional[Dict]:
+        """Stored content and metadata of a chunk"""
+        return self.docs.get(chunk_id)
+
+    def save(self) -> None:
+        """Write the index to disk atomically, if it changed"""
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as file:
+                json.dump({'docs': self.docs, 'postings': self.postings}, file)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+
+    def load(self) -> None:
+        """Load the index from disk, starting empty if it is unreadable"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+            self.docs = data['docs']
+            self.postings = defaultdict(dict, data['postings'])
+            self.total_length = sum(doc['length'] for doc in self.docs.values())
+            self._dirty = False
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Ignoring unreadable keyword index {self.path}: {str(e)}")
+            self.docs, self.postings, self.total_length = {}, defaultdict(dict), 0
+
+    @staticmethod
+    def _matches(metadata: Dict, filters: Dict) -> bool:
+        """True if metadata satisfies every filter; None filters are ignored"""
+        for key, value in filters.items():
+            if value is None:
+                continue
+            if isinstance(value, (list, tuple, set)):
+                if value and metadata.get(key) not in value:
+                    return False
+            elif metadata.get(key) != value:
+                return False
+        return True
+
+    def _remove(self, chunk_id: str) -> None:
+        """Remove one chunk; caller holds the lock"""
+        doc = self.docs.pop(chunk_id, None)
+        if doc is None:
+            return
+        self.total_length -= doc['length']
+        self._dirty = True
+        for term in set(tokenize(doc['content'])):
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(chunk_id, None)
+                if not postings:
+                    del self.postings[term]
+
+
+class HybridRetriever:
+    """Fuses BM25 keyword results with vector search results from an EmbeddingsManager"""
+
+    def __init__(self, embeddings_manager, fusion: str = "rrf", alpha: float = 0.5,
+                 rrf_k: int = 60, candidate_pool: int = 20, reranker=None):
+        """
+        Initialize the hybrid retriever
+
+        Args:
+            embeddings_manager: EmbeddingsManager whose collection and keyword index are searched
+            fusion: "rrf" (reciprocal rank fusion) or "weighted" (min-max normalized score blend)
+            alpha: Weight of the vector score in weighted fusion (1 - alpha goes to BM25)
+            rrf_k: Rank offset in reciprocal rank fusion
+            candidate_pool: Results fetched from each retriever before fusion
+            reranker: Optional CrossEncoderReranker applied to the fused candidates
+        """
+        if fusion not in ("rrf", "weighted"):
+            raise ValueError(f"Unknown fusion method: {fusion}")
+        self.embeddings_manager = embeddings_manager
+        self.fusion = fusion
+        self.alpha = alpha
+        self.rrf_k = rrf_k
+        self.candidate_pool = candidate_pool
+        self.reranker = reranker
+
+    @metrics.timed("hybrid_search")
+    def search(self, query: str, n_results: int = 5, doc_type=None, source=None) -> List[Dict]:
+        """
+        Keyword + semantic search
+
+        Returns results in the search_similar format; similarity_score holds the
+        fused score scaled to 0-1, with vector_score and keyword_score alongside.
+        doc_type and source filter both retrievers, as in search_similar.
+        """
+        pool = max(self.candidate_pool, n_results, self.reranker.candidate_pool if self.reranker else 0)
+        vector_results = self.embeddings_manager.search_similar(
+            query, n_results=pool, doc_type=doc_type, source=source)
+        keyword_results = self.embeddings_manager.keyword_index.search(
+            query, n_results=pool, filters={'doc_type': doc_type, 'source': source})
+
+        candidates: Dict[str, Dict] = {}
+        for result in vector_results:
+            candidates[result['id']] = dict(result, vector_score=result['similarity_score'],
+                                            keyword_score=0.0)
+        found = []
+        for chunk_id, score in keyword_results:
+            if chunk_id not in candidates:
+                doc = self.embeddings_manager.keyword_index.get(chunk_id)
+                if doc is None:
+                    # Deleted by ingestion running in the background since the search
+                    continue
+                candidates[chunk_id] = {'id': chunk_id, 'content': doc['content'],
+                                        'metadata': dict(doc['metadata']), 'vector_score': None}
+            candidates[chunk_id]['keyword_score'] = score
+            found.append((chunk_id, score))
+        keyword_results = found
+
+        if self.fusion == "rrf":
+            fused = self._rrf([r['id'] for r in vector_results], [i for i, _ in keyword_results])
+        else:
+            fused = self._weighted({r['id']: r['similarity_score'] for r in vector_results},
+                                   dict(keyword_results))
+
+        keep = max(n_results, self.reranker.candidate_pool) if self.reranker else n_results
+        ranked = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:keep]
+        results = [dict(candidates[chunk_id], similarity_score=score) for chunk_id, score in ranked]
+        if self.reranker:
+            return self.reranker.rerank(query, results, n_results)
+        return results
+
+    def _rrf(self, vector_ids: List[str], keyword_ids: List[str]) -> Dict[str, float]:
+        """Reciprocal rank fusion, scaled so a first place in both lists scores 1.0"""
+        scores: Dict[str, float] = defaultdict(float)
+        for ranking in (vector_ids, keyword_ids):
+            for rank, chunk_id in enumerate(ranking):
+                scores[chunk_id] += 1.0 / (self.rrf_k + rank + 1)
+        best = 2.0 / (self.rrf_k + 1)
+        return {chunk_id: score / best for chunk_id, score in scores.items()}
+
+    def _weighted(self, vector_scores: Dict[str, float], keyword_scores: Dict[str, float]) -> Dict[str, float]:
+        """Blend of min-max normalized vector and BM25 scores"""
+        vector_norm = self._min_max(vector_scores)
+        keyword_norm = self._min_max(keyword_scores)
+        return {chunk_id: self.alpha * vector_norm.get(chunk_id, 0.0)
+                + (1 - self.alpha) * keyword_norm.get(chunk_id, 0.0)
+                for chunk_id in set(vector_scores) | set(keyword_scores)}
+
+    @staticmethod
+    def _min_max(scores: Dict[str, float]) -> Dict[str, float]:
+        """Scale scores to 0-1"""
+        if not scores:
+            return {}
+        low, high = min(scores.values()), max(scores.values())
+        if high == low:
+            return {chunk_id: 1.0 for chunk_id in scores}
+        return {chunk_id: (score - low) / (high - low) for chunk_id, score in scores.items()}
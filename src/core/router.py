@@ -0,0 +1,109 @@
+"""
+Knowledge Base Router for Knowledge Transfer Assistant
+Sends each query to the relevant named knowledge bases in parallel and merges their rankings
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Union
+
+from .instrumentation import metrics
+from .retriever import tokenize
+
+
+class KnowledgeBaseRouter:
+    """Picks knowledge bases by doc_type or query keywords, fans out to them and merges results"""
+
+    def __init__(self, knowledge_bases: Dict, doc_types: Optional[Dict[str, List[str]]] = None,
+                 keywords: Optional[Dict[str, List[str]]] = None, max_workers: Optional[int] = None,
+                 rrf_k: int = 60):
+        """
+        Initialize the router
+
+        Args:
+            knowledge_bases: Name -> HybridRetriever or EmbeddingsManager, one per knowledge base
+            doc_types: Name -> document types the knowledge base holds, used for doc_type filters
+            keywords: Name -> words or phrases that send a query to the knowledge base
+            max_workers: Threads searching knowledge bases concurrently (default one per base)
+            rrf_k: Rank offset in the reciprocal rank fusion of the bases' results
+        """
+        self.knowledge_bases = knowledge_bases
+        self.doc_types = {name: set(types) for name, types in (doc_types or {}).items()}
+        self.keywords = {name: [tuple(tokenize(keyword)) for keyword in words]
+                         for name, words in (keywords or {}).items()}
+        self.rrf_k = rrf_k
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or max(1, len(knowledge_bases)),
+                                            thread_name_prefix="kb-router")
+
+    def route(self, query: str, doc_type: Union[str, List[str], None] = None) -> List[str]:
+        """
+        Names of the knowledge bases a query should search
+
+        A doc_type filter selects the bases holding those types (bases without declared
+        doc_types may hold any type). Otherwise the bases
+        whose keywords occur in the query are chosen, best match first; a query that
+        matches no keywords goes to every base.
+        """
+        if doc_type:
+            wanted = {doc_type} if isinstance(doc_type, str) else set(doc_type)
+            names = [name for name in self.knowledge_bases
+                     if name not in self.doc_types or self.doc_types[name] & wanted]
+            if names:
+                return names
+
+        tokens = tokenize(query)
+        scores = {name: self._keyword_hits(tokens, self.keywords.get(name, []))
+                  for name in self.knowledge_bases}
+        matched = sorted((name for name, score in scores.items() if score), key=lambda name: -scores[name])
+        return matched or list(self.knowledge_bases)
+
+    @metrics.timed("routed_search")
+    def search(self, query: str, n_results: int = 5, doc_type=None, source=None,
+               knowledge_bases: Optional[List[str]] = None) -> List[Dict]:
+        """
+        Search the routed knowledge bases concurrently and merge their rankings
+
+        Each base ranks by its own scores (fused hybrid scores are rank-based), which are
+        not comparable between bases, so results are merged by reciprocal rank fusion of
+        each base's order, or by cross-encoder score when every result was reranked.
+        Results from a single base keep its order.
+
+        Args:
+            query: Question or search text
+            n_results: Number of results to return in total
+            doc_type: Document type filter, also used for routing
+            source: Source file filter
+            knowledge_bases: Search exactly these bases instead of routing
+
+        Returns:
+            Results in the search_similar format, each with the 'knowledge_base' it came
+            from and the 'merge_score' it was merged by; similarity_score is the score
+            the knowledge base ranked it by
+        """
+        names = knowledge_bases or self.route(query, doc_type)
+        metrics.increment("knowledge_bases_searched", len(names))
+        futures = {name: self._executor.submit(self._search_one, name, query, n_results, doc_type, source)
+                   for name in names}
+
+        merged = []
+        for name, future in futures.items():
+            # Ties between bases go to the better routed one, as the sort is stable
+            merged.extend(dict(result, knowledge_base=name, merge_score=1.0 / (self.rrf_k + rank + 1))
+                          for rank, result in enumerate(future.result()))
+        if merged and all('rerank_score' in result for result in merged):
+            for result in merged:
+                result['merge_score'] = result['rerank_score']
+        merged.sort(key=lambda result: result['merge_score'], reverse=True)
+        return merged[:n_results]
+
+    def _search_one(self, name: str, query: str, n_results: int, doc_type, source) -> List[Dict]:
+        """Results from one knowledge base, whichever kind of searcher it is"""
+        searcher = self.knowledge_bases[name]
+        search = getattr(searcher, 'search', None) or searcher.search_similar
+        return search(query, n_results=n_results, doc_type=doc_type, source=source)
+
+    @staticmethod
+    def _keyword_hits(tokens: List[str], phrases: List[tuple]) -> int:
+        """Number of keyword phrases that occur in the query tokens"""
+        return sum(1 for phrase in phrases
+                   if phrase and any(tuple(tokens[i:i + len(phrase)]) == phrase
+                                     for i in range(len(tokens) - len(phrase) + 1)))
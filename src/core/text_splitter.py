@@ -0,0 +1,86 @@
+"""
+Text Splitter for Knowledge Transfer Assistant
+Dependency-free recursive character splitter, a drop-in for LangChain's
+RecursiveCharacterTextSplitter without importing langchain
+"""
+
+from typing import List, Optional
+
+
+class RecursiveTextSplitter:
+    """Splits text on the coarsest separator that yields pieces under chunk_size, recursing on the rest"""
+
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200,
+                 separators: Optional[List[str]] = None):
+        """
+        Initialize the splitter
+
+        Args:
+            chunk_size: Maximum characters per chunk
+            chunk_overlap: Characters carried over from the end of one chunk into the next
+            separators: Plain-text separators, coarsest first ("" splits into characters)
+        """
+        if chunk_overlap > chunk_size:
+            raise ValueError(f"Chunk overlap ({chunk_overlap}) is larger than chunk size ({chunk_size})")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = separators or ["\n\n", "\n", " ", ""]
+
+    def split_text(self, text: str) -> List[str]:
+        """Split text into chunks of at most chunk_size characters where possible"""
+        return self._split(text, self.separators)
+
+    def _split(self, text: str, separators: List[str]) -> List[str]:
+        """Split on the first separator present in text, recursing into oversized pieces"""
+        separator, remaining = separators[-1], []
+        for i, candidate in enumerate(separators):
+            if candidate == "":
+                separator = candidate
+                break
+            if candidate in text:
+                separator, remaining = candidate, separators[i + 1:]
+                break
+
+        chunks, small = [], []
+        for piece in self._split_keeping_separator(text, separator):
+            if len(piece) < self.chunk_size:
+                small.append(piece)
+                continue
+            if small:
+                chunks.extend(self._merge(small))
+                small = []
+            chunks.extend(self._split(piece, remaining) if remaining else [piece])
+        if small:
+            chunks.extend(self._merge(small))
+        return chunks
+
+    @staticmethod
+    def _split_keeping_separator(text: str, separator: str) -> List[str]:
+        """Pieces of text, each starting with the separator that preceded it"""
+        if not separator:
+            return list(text)
+        parts = text.split(separator)
+        pieces = parts[:1] + [separator + part for part in parts[1:]]
+        return [piece for piece in pieces if piece]
+
+    def _merge(self, pieces: List[str]) -> List[str]:
+        """Join small pieces into chunks, starting each chunk with up to chunk_overlap of the last"""
+        chunks, current, total = [], [], 0
+        for piece in pieces:
+            if total + len(piece) > self.chunk_size and current:
+                self._append_chunk(chunks, current)
+                # Drop pieces from the front until what is left fits the overlap
+                # and leaves room for the new piece
+                while total > self.chunk_overlap or (total + len(piece) > self.chunk_size and total > 0):
+                    total -= len(current.pop(0))
+            current.append(piece)
+            total += len(piece)
+        self._append_chunk(chunks, current)
+        return chunks
+
+    @staticmethod
+    def _append_chunk(chunks: List[str], pieces: List[str]) -> None:
+        """Add the stripped concatenation of pieces, unless it is empty"""
+        chunk = "".join(pieces).strip()
+        if chunk:
+            chunks.append(chunk)
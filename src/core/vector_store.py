@@ -0,0 +1,332 @@
+"""
+Vector Stores for Knowledge Transfer Assistant
+Interchangeable storage and nearest-neighbour search backends for chunk embeddings
+"""
+
+import json
+import os
+import threading
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from . import resources
+
+
+def matches_where(metadata: Dict, where: Optional[Dict]) -> bool:
+    """True if metadata satisfies a Chroma-style where clause"""
+    if not where:
+        return True
+    for key, condition in where.items():
+        if key == '$and':
+            if not all(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif key == '$or':
+            if not any(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            for operator, operand in condition.items():
+                if operator == '$eq' and value != operand:
+                    return False
+                if operator == '$ne' and value == operand:
+                    return False
+                if operator == '$in' and value not in operand:
+                    return False
+                if operator == '$nin' and value in operand:
+                    return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+
+class VectorStore:
+    """
+    Storage and search interface used by EmbeddingsManager
+
+    get() returns Chroma's result shape (a dict of 'ids' plus one list per included
+    field) and distances follow Chroma's conventions, so similarity is 1 - distance.
+    """
+
+    # True if query() scores every matching vector instead of searching an approximate index
+    exact = False
+    # Largest number of chunks one upsert accepts
+    max_batch_size = 5461
+
+    @property
+    def space(self) -> str:
+        """Distance space: "l2", "cosine" or "ip" """
+        raise NotImplementedError
+
+    def count(self) -> int:
+        """Number of stored chunks"""
+        raise NotImplementedError
+
+    def upsert(self, ids: List[str], embeddings: np.ndarray, documents: List[str],
+               metadatas: List[Dict]) -> None:
+        """Add chunks, replacing any already stored under the same IDs"""
+        raise NotImplementedError
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None) -> None:
+        """Delete chunks by ID or by metadata filter"""
+        raise NotImplementedError
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None,
+            include: Iterable[str] = ('documents', 'metadatas'), limit: Optional[int] = None,
+            offset: int = 0) -> Dict:
+        """Stored chunks by ID and/or filter, paged with limit and offset"""
+        raise NotImplementedError
+
+    def query(self, query_embedding: np.ndarray, n_results: int, where: Optional[Dict] = None) -> Dict:
+        """Nearest chunks: flat lists of 'ids', 'documents', 'metadatas' and 'distances'"""
+        raise NotImplementedError
+
+    def save(self) -> None:
+        """Persist pending writes (no-op for stores that write through)"""
+
+    def close(self) -> None:
+        """Release the store's resources"""
+
+
+class ChromaVectorStore(VectorStore):
+    """A ChromaDB collection in a persistent database folder, searched through its HNSW index"""
+
+    def __init__(self, db_path: str, collection_name: str):
+        """
+        Initialize the Chroma store
+
+        Args:
+            db_path: Database folder; its client is shared by every store in the process
+            collection_name: Collection holding this knowledge base
+        """
+        self.db_path = db_path
+        self.client = resources.get_chroma_client(db_path)
+        self.max_batch_size = getattr(self.client, 'max_batch_size', self.max_batch_size)
+        try:
+            self.collection = self.client.get_collection(collection_name)
+        except:
+            self.collection = self.client.create_collection(collection_name)
+
+    @property
+    def space(self) -> str:
+        return (self.collection.metadata or {}).get('hnsw:space', 'l2')
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    def upsert(self, ids: List[str], embeddings: np.ndarray, documents: List[str],
+               metadatas: List[Dict]) -> None:
+        # Chroma only accepts nested lists, so convert at the boundary, one batch at a time
+        self.collection.upsert(ids=ids, embeddings=np.asarray(embeddings).tolist(),
+                               documents=documents, metadatas=metadatas)
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None) -> None:
+        if ids:
+            self.collection.delete(ids=list(ids))
+        elif where:
+            self.collection.delete(where=where)
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None,
+            include: Iterable[str] = ('documents', 'metadatas'), limit: Optional[int] = None,
+            offset: int = 0) -> Dict:
+        return self.collection.get(ids=ids, where=where, include=list(include), limit=limit,
+                                   offset=offset or None)
+
+    def query(self, query_embedding: np.ndarray, n_results: int, where: Optional[Dict] = None) -> Dict:
+        results = self.collection.query(query_embeddings=[np.asarray(query_embedding).tolist()],
+                                        n_results=n_results, where=where)
+        return {key: results[key][0] for key in ('ids', 'documents', 'metadatas', 'distances')}
+
+    def close(self) -> None:
+        resources.release(resources.client_key(self.db_path))
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    Exact search over an in-process float32 matrix, for small corpora and tests
+
+    Vectors are normalized on insert, so a query is one matrix-vector product and an
+    argpartition. Saved stores are memory-mapped .npy files plus a JSON file of
+    documents and metadata; without a path the store lives only in memory.
+    """
+
+    exact = True
+    max_batch_size = 100000
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Initialize the NumPy store
+
+        Args:
+            path: Folder the store is saved in and loaded from (None keeps it in memory only)
+        """
+        self.path = path
+        self.ids: List[str] = []
+        self.documents: List[str] = []
+        self.metadatas: List[Dict] = []
+        self.vectors: Optional[np.ndarray] = None  # (n, d) float32, unit length
+        self._positions: Dict[str, int] = {}
+        # Added rows are buffered and concatenated once, before the next read or save
+        self._pending: List[np.ndarray] = []
+        self._dirty = False  # changed since the last save or load
+        self._lock = threading.Lock()
+
+        if path and os.path.exists(os.path.join(path, "records.json")):
+            self.load()
+
+    @property
+    def space(self) -> str:
+        return 'cosine'
+
+    def count(self) -> int:
+        return len(self.ids)
+
+    def upsert(self, ids: List[str], embeddings: np.ndarray, documents: List[str],
+               metadatas: List[Dict]) -> None:
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings = embeddings / np.maximum(norms, 1e-12)
+        with self._lock:
+            self._remove([chunk_id for chunk_id in ids if chunk_id in self._positions])
+            self._pending.append(embeddings)
+            for chunk_id, document, metadata in zip(ids, documents, metadatas):
+                self._positions[chunk_id] = len(self.ids)
+                self.ids.append(chunk_id)
+                self.documents.append(document)
+                self.metadatas.append(dict(metadata))
+            self._dirty = True
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None) -> None:
+        with self._lock:
+            if ids:
+                self._remove([chunk_id for chunk_id in ids if chunk_id in self._positions])
+            elif where:
+                self._remove([self.ids[row] for row in self._rows(where=where)])
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None,
+            include: Iterable[str] = ('documents', 'metadatas'), limit: Optional[int] = None,
+            offset: int = 0) -> Dict:
+        with self._lock:
+            self._consolidate()
+            rows = self._rows(ids, where)
+            rows = rows[offset:offset + limit if limit is not None else None]
+            return self._records(rows, include)
+
+    def query(self, query_embedding: np.ndarray, n_results: int, where: Optional[Dict] = None) -> Dict:
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        with self._lock:
+            self._consolidate()
+            rows = np.asarray(self._rows(where=where), dtype=np.int64)
+            if not len(rows) or n_results <= 0:
+                return self._records([], ('documents', 'metadatas'), distances=[])
+
+            vectors = self.vectors if where is None else self.vectors[rows]
+            distances = 1 - np.asarray(vectors @ query)
+            if n_results < len(rows):
+                top = np.argpartition(distances, n_results - 1)[:n_results]
+            else:
+                top = np.arange(len(rows))
+            top = top[np.argsort(distances[top])]
+            return self._records([int(row) for row in rows[top]], ('documents', 'metadatas'),
+                                 distances=[float(distance) for distance in distances[top]])
+
+    def save(self) -> None:
+        """Write the store files if anything changed; vectors are memory-mapped again on load"""
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            self._consolidate()
+            os.makedirs(self.path, exist_ok=True)
+            vectors = self.vectors if self.vectors is not None else np.empty((0, 0), dtype=np.float32)
+            # Write to a temporary file first: the current file may be memory-mapped
+            with open(os.path.join(self.path, "vectors.npy.tmp"), 'wb') as file:
+                np.save(file, np.asarray(vectors))
+            os.replace(os.path.join(self.path, "vectors.npy.tmp"), os.path.join(self.path, "vectors.npy"))
+            tmp_path = os.path.join(self.path, "records.json.tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as file:
+                json.dump({'ids': self.ids, 'documents': self.documents, 'metadatas': self.metadatas}, file)
+            os.replace(tmp_path, os.path.join(self.path, "records.json"))
+            self._dirty = False
+
+    def load(self) -> None:
+        """Open a saved store, starting empty if it is unreadable"""
+        try:
+            with open(os.path.join(self.path, "records.json"), 'r', encoding='utf-8') as file:
+                data = json.load(file)
+            vectors = np.load(os.path.join(self.path, "vectors.npy"), mmap_mode='r')
+            if len(vectors) != len(data['ids']):
+                raise ValueError("vectors and records are out of step")
+            self.ids, self.documents, self.metadatas = data['ids'], data['documents'], data['metadatas']
+            self.vectors = vectors if len(vectors) else None
+            self._positions = {chunk_id: i for i, chunk_id in enumerate(self.ids)}
+            self._dirty = False
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Ignoring unusable vector store {self.path}: {str(e)}")
+            self.ids, self.documents, self.metadatas, self._positions = [], [], [], {}
+            self.vectors, self._pending = None, []
+
+    def _rows(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None) -> List[int]:
+        """Row numbers of the chunks with the given IDs that match where; caller holds the lock"""
+        if ids is not None:
+            rows = [self._positions[chunk_id] for chunk_id in ids if chunk_id in self._positions]
+        else:
+            rows = range(len(self.ids))
+        return [row for row in rows if matches_where(self.metadatas[row], where)]
+
+    def _records(self, rows: List[int], include: Iterable[str], distances: Optional[List[float]] = None) -> Dict:
+        """Chroma-shaped result for rows; caller holds the lock"""
+        result = {'ids': [self.ids[row] for row in rows]}
+        if 'documents' in include:
+            result['documents'] = [self.documents[row] for row in rows]
+        if 'metadatas' in include:
+            result['metadatas'] = [dict(self.metadatas[row]) for row in rows]
+        if 'embeddings' in include:
+            result['embeddings'] = np.asarray(self.vectors[rows]) if rows else np.empty((0, 0), dtype=np.float32)
+        if distances is not None:
+            result['distances'] = distances
+        return result
+
+    def _consolidate(self) -> None:
+        """Append buffered vectors to the matrix; caller holds the lock"""
+        if not self._pending:
+            return
+        parts = self._pending if self.vectors is None else [np.asarray(self.vectors)] + self._pending
+        self.vectors = np.concatenate(parts)
+        self._pending = []
+
+    def _remove(self, ids: List[str]) -> None:
+        """Drop rows for IDs; caller holds the lock"""
+        if not ids:
+            return
+        self._consolidate()
+        drop = {self._positions[chunk_id] for chunk_id in ids}
+        keep = [row for row in range(len(self.ids)) if row not in drop]
+        self.vectors = np.asarray(self.vectors)[keep] if keep else None
+        self.ids = [self.ids[row] for row in keep]
+        self.documents = [self.documents[row] for row in keep]
+        self.metadatas = [self.metadatas[row] for row in keep]
+        self._positions = {chunk_id: i for i, chunk_id in enumerate(self.ids)}
+        self._dirty = True
+
+
+def create_vector_store(backend: str, db_path: Optional[str], collection_name: str,
+                        path: Optional[str] = None) -> VectorStore:
+    """
+    Vector store for a knowledge base
+
+    Args:
+        backend: "chroma" or "numpy"
+        db_path: Chroma database folder
+        collection_name: Chroma collection name
+        path: Folder for the NumPy store's files (None keeps it in memory only)
+    """
+    if backend == "chroma":
+        if db_path is None:
+            raise ValueError("The chroma vector store needs a db_path")
+        return ChromaVectorStore(db_path, collection_name)
+    if backend == "numpy":
+        return NumpyVectorStore(path)
+    raise ValueError(f"Unknown vector store: {backend}")
@@ -1,14 +1,22 @@
 import streamlit as st
 import sys
 import os
+from concurrent.futures import ThreadPoolExecutor
 
 # Add src to path for imports
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
 from core.document_processor import DocumentProcessor
 from core.embeddings import EmbeddingsManager
-import requests
-import json
+from core.ingestion_worker import IngestionWorker
+from core.retriever import HybridRetriever
+from core.reranker import CrossEncoderReranker
+from core.chat_bot import ChatBot, ChatBotError
+from core.context_builder import ContextBuilder
+from core.conversation import ConversationMemory
+from core.answer_cache import AnswerCache
+from core.page_store import PageStore
+from core.instrumentation import metrics
 
 st.set_page_config(
     page_title="Knowledge Transfer Assistant",
@@ -19,44 +27,110 @@ st.set_page_config(
 st.title("🤖 Knowledge Transfer Assistant")
 st.markdown("*AI-powered knowledge transfer for DataPower, API Connect, and Environment Management*")
 
-# Initialize session state
+
+
+@st.cache_resource
+def load_knowledge_base():
+    """Model, vector database, LLM client and ingestion worker shared by every browser session"""
+    # Copies and revisions of the same guide are linked to the chunks already stored
+    embeddings_manager = EmbeddingsManager(deduplicate=True)
+    page_store = PageStore("data/processed/page_store")
+    processor = DocumentProcessor(chunk_size=600, chunk_overlap=100, workers=None, page_store=page_store)
+    
+    # Answers to paraphrased questions over the same chunks are reused; re-ingesting
+    # a chunk drops every answer that was based on it
+    answer_cache = AnswerCache(embeddings_manager.index_path("answer_cache.sqlite3"))
+    embeddings_manager.add_change_listener(answer_cache.invalidate_chunks)
+    return {
+        'embeddings_manager': embeddings_manager,
+        'retriever': HybridRetriever(embeddings_manager, reranker=CrossEncoderReranker(latency_budget=0.5)),
+        'chat_bot': ChatBot(),
+        'context_builder': ContextBuilder(token_budget=1500),
+        'answer_cache': answer_cache,
+        'page_store': page_store,
+        # Conversation summaries are updated here, off the request path
+        'summary_executor': ThreadPoolExecutor(max_workers=2, thread_name_prefix="conversation-summary"),
+        'ingestion_worker': IngestionWorker(embeddings_manager, processor).start()
+    }
+
+
+knowledge_base = load_knowledge_base()
+embeddings_manager = knowledge_base['embeddings_manager']
+
+# Per-session state is the chat history and its memory for follow-up questions
 if 'messages' not in st.session_state:
     st.session_state.messages = []
-if 'system_ready' not in st.session_state:
-    st.session_state.system_ready = False
+if 'conversation' not in st.session_state:
+    st.session_state.conversation = ConversationMemory(knowledge_base['chat_bot'],
+                                                       executor=knowledge_base['summary_executor'])
+conversation = st.session_state.conversation
+
+# An already populated vector database is ready without re-initializing
+total_chunks = embeddings_manager.vector_store.count()
+system_ready = total_chunks > 0
 
 # Sidebar for system status
 with st.sidebar:
     st.header("📊 System Status")
     
+    ingestion_worker = knowledge_base['ingestion_worker']
     if st.button("🔄 Initialize Knowledge Base"):
-        with st.spinner("Processing documents..."):
-            try:
-                # Process documents
-                processor = DocumentProcessor(chunk_size=600, chunk_overlap=100)
-                docs = processor.process_documents("data/sample_docs")
-                
-                # Setup embeddings
-                embeddings_manager = EmbeddingsManager()
-                embeddings_manager.add_documents(docs)
-                
-                st.session_state.embeddings_manager = embeddings_manager
-                st.session_state.system_ready = True
-                st.session_state.total_chunks = len(docs)
-                
-                st.success(f"✅ Processed {len(docs)} document chunks")
-                
-            except Exception as e:
-                st.error(f"❌ Error: {str(e)}")
+        # Process only new or changed documents, in the background; the chat keeps
+        # answering from the existing index meanwhile
+        if ingestion_worker.is_busy():
+            st.info("⏳ Ingestion is already in progress")
+        else:
+            ingestion_worker.submit("data/sample_docs", sync=True)
+    
+    recent_jobs = ingestion_worker.queue.jobs(limit=1)
+    if recent_jobs:
+        job = ingestion_worker.progress(recent_jobs[0]['id'])
+        if job['status'] in ('queued', 'running'):
+            if job['files_total']:
+                st.progress(job['files_done'] / job['files_total'])
+            eta = f", about {job['eta_seconds']:.0f}s left" if job['eta_seconds'] is not None else ""
+            st.caption(f"⏳ Processing documents: {job['files_done']}/{job['files_total']} files, "
+                       f"{job['chunks']} chunks{eta}")
+            st.button("↻ Refresh progress")
+        elif job['status'] == 'failed':
+            st.error(f"❌ Error: {job['error']}")
+        elif job['status'] == 'done':
+            summary = job['summary']
+            st.caption(f"✅ Last sync: {summary['added'] + summary['updated']} files processed, "
+                       f"{summary['unchanged']} unchanged, {summary['removed']} removed")
+            if summary.get('deduplication', {}).get('duplicates'):
+                report = summary['deduplication']
+                st.caption(f"♻️ {report['duplicates']} duplicate chunks skipped "
+                           f"({report['duplicate_ratio']:.0%}, ~{report['embed_seconds_saved']:.0f}s of embedding saved)")
     
-    if st.session_state.system_ready:
+    if system_ready:
+        st.multiselect(
+            "📂 Limit answers to document types",
+            ["datapower", "architecture", "standards", "general"],
+            key="doc_type_filter"
+        )
+        
+        if st.button("🧹 New conversation"):
+            st.session_state.messages = []
+            conversation.clear()
+        
         st.success("🟢 System Ready")
-        st.info(f"📄 {st.session_state.total_chunks} chunks loaded")
+        st.info(f"📄 {total_chunks} chunks loaded")
+        cache_stats = embeddings_manager.cache_stats()['results']
+        st.caption(f"🗄️ Search cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses")
+        answer_stats = knowledge_base['answer_cache'].stats()
+        st.caption(f"⚡ Answer cache: {answer_stats['hits']} hits / {answer_stats['misses']} misses")
     else:
         st.warning("🟡 Click 'Initialize Knowledge Base' to start")
+    
+    # Stage latencies, recorded when the app runs with KTA_METRICS=1
+    if metrics.enabled and st.checkbox("⏱️ Show latency metrics"):
+        st.dataframe(metrics.summary(), hide_index=True)
+        st.download_button("Export (Prometheus)", metrics.to_prometheus(), file_name="metrics.prom")
+        st.download_button("Export (JSON lines)", metrics.to_json_lines(), file_name="metrics.jsonl")
 
 # Main chat interface
-if st.session_state.system_ready:
+if system_ready:
     # Display chat messages
     for message in st.session_state.messages:
         with st.chat_message(message["role"]):
@@ -69,89 +143,85 @@ if st.session_state.system_ready:
         with st.chat_message("user"):
             st.markdown(prompt)
         
-        # Generate response (FIXED INDENTATION)
-        with st.chat_message("assistant"):
-            with st.spinner("Searching knowledge base and generating response..."):
-                try:
+        # Generate response
+        with st.chat_message("assistant"), metrics.span("chat_request"):
+            response_placeholder = st.empty()
+            try:
+                # Follow-ups like "and how do I renew it?" are searched with the topic they refer to
+                search_query = conversation.rewrite_query(prompt)
+                if search_query != prompt:
+                    st.caption(f"🔗 Searching for: {search_query}")
+                
+                with st.spinner("Searching knowledge base..."):
                     # Search for relevant documents
-                    results = st.session_state.embeddings_manager.search_similar(prompt, n_results=3)
-                    
-                    # Prepare context
-                    context_chunks = []
-                    sources = []
+                    results = knowledge_base['retriever'].search(
+                        search_query, n_results=8, doc_type=st.session_state.get('doc_type_filter') or None)
                     
-                    for i, result in enumerate(results, 1):
-                        context_chunks.append(result['content'])
-                        sources.append({
-                            'source': result['metadata']['source'],
-                            'score': result['similarity_score'],
-                            'chunk_id': result['metadata'].get('chunk_id', i)
-                        })
+                    # Merge overlapping chunks and pack the best passages into the token budget
+                    context = knowledge_base['context_builder'].build(results)
+                    passages = context['passages']
+                    context_text = context['text']
+                
+                chat_bot = knowledge_base['chat_bot']
+                with metrics.span("prompt_build"):
+                    llama_prompt = chat_bot.build_prompt(prompt, context_text, conversation.history_text())
+                    sources_text = chat_bot.format_sources(passages)
+                
+                answer_cache = knowledge_base['answer_cache']
+                query_embedding = embeddings_manager.encode_query(search_query)
+                context_key = answer_cache.context_key(results)
+                cached = answer_cache.lookup(query_embedding, context_key, model=chat_bot.model)
+                
+                try:
+                    if cached is not None:
+                        st.caption(f"⚡ Cached answer to a similar question: \"{cached['question']}\"")
+                        llama_answer = cached['answer']
+                    else:
+                        # Stream tokens into the chat bubble as Llama generates them
+                        llama_answer = ""
+                        for token in chat_bot.stream(llama_prompt):
+                            llama_answer += token
+                            response_placeholder.markdown(llama_answer + "▌")
+                        answer_cache.store(search_query, query_embedding, context_key,
+                                           [result['id'] for result in results], llama_answer,
+                                           model=chat_bot.model)
                     
-                    # Create context for Llama
-                    context_text = "\n\n---\n\n".join(context_chunks)
+                    final_response = f"{llama_answer}\n\n{sources_text}"
+                    conversation.add_turn(prompt, llama_answer, query=search_query)
                     
-                    # Create prompt for Llama
-                    llama_prompt = f"""You are a helpful technical assistant specializing in DataPower, API Connect, and IT environment management. 
-
-Based on the following documentation excerpts, provide a clear, structured answer to the user's question.
-
-DOCUMENTATION:
-{context_text}
-
-USER QUESTION: {prompt}
-
-Please provide:
-1. A direct answer to the question
-2. Step-by-step instructions if applicable
-3. Key points organized clearly
-4. Mention which aspects come from the documentation
-
-Format your response to be helpful for someone learning these technologies."""
-
-                    # Send to Ollama
-                    ollama_response = requests.post(
-                        'http://localhost:11434/api/generate',
-                        json={
-                            'model': 'llama3.1',
-                            'prompt': llama_prompt,
-                            'stream': False
-                        }
-                    )
+                except ChatBotError as e:
+                    # Fallback to simple response if Llama fails
+                    st.caption(f"⚠️ {str(e)}")
+                    final_response = "**Based on the documentation:**\n\n"
+                    for i, passage in enumerate(passages, 1):
+                        final_response += f"**Point {i}:** {passage['content'][:200]}...\n\n"
                     
-                    if ollama_response.status_code == 200:
-                        llama_answer = ollama_response.json()['response']
-                        
-                        # Format the complete response
-                        final_response = f"""{llama_answer}
-
----
-**📚 Sources:**"""
-                        
-                        for i, source in enumerate(sources, 1):
-                            final_response += f"""
-- **{source['source']}** (Relevance: {source['score']:.2f})"""
-                        
-                        st.markdown(final_response)
-                        st.session_state.messages.append({"role": "assistant", "content": final_response})
-                        
-                    else:
-                        # Fallback to simple response if Llama fails
-                        fallback_response = "**Based on the documentation:**\n\n"
-                        for i, chunk in enumerate(context_chunks, 1):
-                            fallback_response += f"**Point {i}:** {chunk[:200]}...\n\n"
-                        
-                        fallback_response += "**📚 Sources:**\n"
-                        for source in sources:
-                            fallback_response += f"- {source['source']}\n"
-                        
-                        st.markdown(fallback_response)
-                        st.session_state.messages.append({"role": "assistant", "content": fallback_response})
-                        
-                except Exception as e:
-                    error_msg = f"❌ Error: {str(e)}"
-                    st.error(error_msg)
-                    st.session_state.messages.append({"role": "assistant", "content": error_msg})
+                    final_response += "**📚 Sources:**\n"
+                    for passage in passages:
+                        final_response += f"- {passage['metadata']['source']}\n"
+                    conversation.add_turn(prompt, "", query=search_query)
+                
+                response_placeholder.markdown(final_response)
+                st.session_state.messages.append({"role": "assistant", "content": final_response})
+                
+                # Source pages are read from the page store, without reopening the PDFs
+                shown_pages = set()
+                for passage in passages:
+                    metadata = passage['metadata']
+                    page_range = (metadata['source'], metadata.get('page'), metadata.get('page_end'))
+                    if metadata.get('page') is None or page_range in shown_pages:
+                        continue
+                    shown_pages.add(page_range)
+                    pages = knowledge_base['page_store'].get_pages(
+                        metadata['source'], metadata['page'], metadata.get('page_end', metadata['page']))
+                    if pages:
+                        with st.expander(f"📄 {metadata['source']}, page {metadata['page']}"):
+                            st.text("\n\n".join(pages))
+                
+            except Exception as e:
+                error_msg = f"❌ Error: {str(e)}"
+                st.error(error_msg)
+                st.session_state.messages.append({"role": "assistant", "content": error_msg})
 
 else:
     st.info("👆 Please initialize the knowledge base using the sidebar to get started.")
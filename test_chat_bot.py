@@ -0,0 +1,86 @@
+# Check the streaming Ollama client against the local stub server
+import socket
+import threading
+
+import pytest
+
+from src.core.chat_bot import ChatBot, ChatBotError
+from src.core.ollama_stub import StubOllamaServer
+
+ANSWER = "Upload the certificate and create a crypto certificate object for it."
+
+
+def test_tokens_stream_in_order_with_time_to_first_token():
+    with StubOllamaServer(ANSWER, first_token_delay=0.2, token_delay=0.02) as stub:
+        chat_bot = ChatBot(base_url=stub.url)
+        timings = {}
+        tokens = list(chat_bot.stream("prompt", timings=timings))
+        chat_bot.close()
+
+    assert len(tokens) == len(ANSWER.split(" "))
+    assert "".join(tokens) == ANSWER
+    assert 0.2 <= timings['time_to_first_token'] < timings['total']
+    # The rest of the answer arrived after the first token, token by token
+    assert timings['total'] - timings['time_to_first_token'] >= 0.02 * (len(tokens) - 1)
+    assert chat_bot.last_timings is timings
+
+
+def test_concurrent_streams_reuse_the_session():
+    with StubOllamaServer(ANSWER, token_delay=0.01) as stub:
+        chat_bot = ChatBot(base_url=stub.url)
+        answers = []
+        threads = [threading.Thread(target=lambda: answers.append(chat_bot.generate("prompt")))
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        chat_bot.close()
+        assert answers == [ANSWER] * 4
+        assert stub.requests_served == 4
+
+
+def test_read_timeout_before_the_first_token():
+    with StubOllamaServer(ANSWER, first_token_delay=1.0) as stub:
+        chat_bot = ChatBot(base_url=stub.url, read_timeout=0.2)
+        with pytest.raises(ChatBotError, match="did not respond in time"):
+            list(chat_bot.stream("prompt"))
+        chat_bot.close()
+
+
+def test_read_timeout_between_tokens():
+    with StubOllamaServer(ANSWER, token_delay=1.0) as stub:
+        chat_bot = ChatBot(base_url=stub.url, read_timeout=0.2)
+        tokens = []
+        with pytest.raises(ChatBotError, match="stopped responding"):
+            for token in chat_bot.stream("prompt"):
+                tokens.append(token)
+        chat_bot.close()
+    assert tokens == [ANSWER.split(" ")[0] + " "]
+
+
+def test_cancel_event_stops_the_generation():
+    with StubOllamaServer(ANSWER, token_delay=0.05) as stub:
+        chat_bot = ChatBot(base_url=stub.url)
+        cancel_event = threading.Event()
+        tokens = []
+        for token in chat_bot.stream("prompt", cancel_event=cancel_event):
+            tokens.append(token)
+            if len(tokens) == 2:
+                cancel_event.set()
+        chat_bot.close()
+
+    assert len(tokens) == 2
+    assert chat_bot.last_timings['total'] < 0.05 * len(ANSWER.split(" "))
+
+
+def test_unreachable_server():
+    # A port that was free a moment ago has nothing listening on it
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    chat_bot = ChatBot(base_url=f"http://127.0.0.1:{port}", connect_timeout=0.5)
+    assert not chat_bot.is_available()
+    with pytest.raises(ChatBotError, match="Could not reach Ollama"):
+        chat_bot.generate("prompt")
+    chat_bot.close()
@@ -0,0 +1,46 @@
+# Check which questions are rewritten with the topic of the previous turn
+from src.core.conversation import ConversationMemory
+
+PREVIOUS = "How do I install an SSL certificate on DataPower?"
+
+STANDALONE = [
+    "What is the command that restarts the API Connect gateway?",
+    "How does one configure a DataPower domain?",
+    "Is there a limit on the number of API Connect catalogs?",
+    "Does the gateway support TLS 1.3?",
+    "What is DataPower?",
+]
+
+FOLLOW_UPS = [
+    "and how do I renew it?",
+    "What about the expiry date?",
+    "How do I export them?",
+    "Why?",
+    "Can you explain this in more detail?",
+]
+
+
+def memory_after_one_turn():
+    memory = ConversationMemory()
+    memory.add_turn(PREVIOUS, "Upload the certificate in the crypto configuration.")
+    return memory
+
+
+def test_standalone_questions_are_not_rewritten():
+    memory = memory_after_one_turn()
+    for question in STANDALONE:
+        assert not memory.is_follow_up(question), question
+        assert memory.rewrite_query(question) == question
+
+
+def test_follow_ups_inherit_the_previous_topic():
+    memory = memory_after_one_turn()
+    for question in FOLLOW_UPS:
+        assert memory.is_follow_up(question), question
+        rewritten = memory.rewrite_query(question)
+        assert rewritten.startswith(question.strip())
+        assert "certificate" in rewritten
+
+
+def test_first_question_is_never_a_follow_up():
+    assert not ConversationMemory().is_follow_up("How do I renew it?")
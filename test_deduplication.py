@@ -0,0 +1,84 @@
+# Check that re-ingesting deduplicated chunks keeps every text stored or linked exactly once
+import zlib
+
+import numpy as np
+
+from src.core.embeddings import EmbeddingsManager
+
+INSTALL = ("Install the SSL certificate on DataPower by uploading the key and certificate files "
+           "to the cert folder and creating a crypto key and crypto certificate object for them")
+RESTART = ("Restart the API Connect gateway from the management console or with the restart "
+           "command after changing the gateway service configuration")
+RENEW = ("Renew the SSL certificate before it expires by requesting a new certificate from the "
+         "certificate authority and replacing the crypto certificate object")
+
+
+class HashingModel:
+    """Bag-of-words vectors, so tests need no downloaded model"""
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True):
+        vectors = np.zeros((len(texts), 64), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                vectors[row, zlib.crc32(word.encode()) % 64] += 1.0
+        return vectors
+
+
+def make_manager():
+    manager = EmbeddingsManager(db_path=None, cache_dir=None, vector_store="numpy", deduplicate=True)
+    manager._embedding_model = HashingModel()
+    return manager
+
+
+def chunk(source, content):
+    return {'content': content, 'source': source, 'chunk_id': 0, 'doc_type': 'pdf'}
+
+
+def stored_text(manager, chunk_id):
+    stored = manager.vector_store.get(ids=[chunk_id], include=['documents'])
+    keyword_doc = manager.keyword_index.get(chunk_id)
+    return (stored['documents'][0] if stored['ids'] else None,
+            keyword_doc['content'] if keyword_doc else None)
+
+
+def test_copies_of_a_revised_chunk_are_stored_again():
+    manager = make_manager()
+    manager.add_documents_stream([chunk("v1.pdf", INSTALL), chunk("v2.pdf", INSTALL)])
+    assert manager.duplicate_index.links["v2.pdf_0"]['canonical'] == "v1.pdf_0"
+    assert stored_text(manager, "v2.pdf_0") == (None, None)
+
+    # v1 is revised: v2's copy no longer repeats it and must be searchable on its own
+    manager.add_documents_stream([chunk("v1.pdf", RESTART)])
+    assert stored_text(manager, "v1.pdf_0") == (RESTART, RESTART)
+    assert stored_text(manager, "v2.pdf_0") == (INSTALL, INSTALL)
+    assert manager.duplicate_index.links == {}
+    assert manager.search_similar(INSTALL, n_results=1)[0]['id'] == "v2.pdf_0"
+
+
+def test_copies_of_an_unchanged_chunk_stay_linked():
+    manager = make_manager()
+    manager.add_documents_stream([chunk("v1.pdf", INSTALL), chunk("v2.pdf", INSTALL)])
+    manager.add_documents_stream([chunk("v1.pdf", INSTALL)])
+    assert manager.duplicate_index.links["v2.pdf_0"]['canonical'] == "v1.pdf_0"
+    assert manager.vector_store.count() == 1
+
+
+def test_stored_chunk_that_becomes_a_duplicate_is_deleted():
+    manager = make_manager()
+    manager.add_documents_stream([chunk("x.pdf", RENEW), chunk("y.pdf", RESTART)])
+    assert manager.vector_store.count() == 2
+
+    # x is revised into a copy of y: it is linked, and its old text leaves the store and indexes
+    manager.add_documents_stream([chunk("x.pdf", RESTART)])
+    assert manager.duplicate_index.links["x.pdf_0"]['canonical'] == "y.pdf_0"
+    assert stored_text(manager, "x.pdf_0") == (None, None)
+    assert manager.vector_store.count() == len(manager.keyword_index) == 1
+    assert all(result['id'] == "y.pdf_0" for result in manager.search_similar(RENEW, n_results=5))
+
+
+def test_deleting_the_canonical_chunk_stores_its_copy():
+    manager = make_manager()
+    manager.add_documents_stream([chunk("v1.pdf", INSTALL), chunk("v2.pdf", INSTALL)])
+    manager.delete_documents(source="v1.pdf")
+    assert stored_text(manager, "v2.pdf_0") == (INSTALL, INSTALL)
+    assert manager.vector_store.count() == 1
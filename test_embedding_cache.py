@@ -0,0 +1,87 @@
+# Check that embedding caches sharing a folder never hand out another text's vector
+import multiprocessing
+import zlib
+
+import numpy as np
+
+from src.core import resources
+from src.core.embedding_cache import EmbeddingCache
+
+DIM = 8
+
+
+def vector_for(text):
+    """Deterministic vector that identifies its text"""
+    return np.random.RandomState(zlib.crc32(text.encode())).randn(DIM).astype(np.float32)
+
+
+def assert_cached_correctly(cache, texts):
+    for text, vector in zip(texts, cache.get_many(texts)):
+        if vector is not None:
+            np.testing.assert_array_equal(vector, vector_for(text))
+
+
+def test_two_instances_on_one_folder(tmp_path):
+    first = EmbeddingCache("model", str(tmp_path))
+    second = EmbeddingCache("model", str(tmp_path))
+    first_texts = [f"first {i}" for i in range(50)]
+    second_texts = [f"second {i}" for i in range(50)]
+
+    # Interleaved writes would have claimed the same rows when each instance only knew its own entries
+    for i in range(0, 50, 10):
+        first.put_many(first_texts[i:i + 10], np.stack([vector_for(t) for t in first_texts[i:i + 10]]))
+        second.put_many(second_texts[i:i + 10], np.stack([vector_for(t) for t in second_texts[i:i + 10]]))
+    first.flush()
+    second.flush()
+
+    for cache in (first, second, EmbeddingCache("model", str(tmp_path))):
+        vectors = cache.get_many(first_texts + second_texts)
+        assert all(vector is not None for vector in vectors)
+        assert_cached_correctly(cache, first_texts + second_texts)
+
+
+def test_eviction_by_another_instance(tmp_path):
+    small = 20 * DIM * 4 / 2**20  # room for 20 vectors
+    first = EmbeddingCache("model", str(tmp_path), max_size_mb=small)
+    second = EmbeddingCache("model", str(tmp_path), max_size_mb=small)
+    old = [f"old {i}" for i in range(20)]
+    first.put_many(old, np.stack([vector_for(t) for t in old]))
+    assert all(vector is not None for vector in first.get_many(old))
+
+    # The second instance evicts rows the first one still lists
+    new = [f"new {i}" for i in range(15)]
+    second.put_many(new, np.stack([vector_for(t) for t in new]))
+    assert_cached_correctly(first, old + new)
+    assert sum(vector is not None for vector in first.get_many(old)) == 5
+
+
+def fill_cache(cache_dir, prefix):
+    cache = EmbeddingCache("model", cache_dir)
+    texts = [f"{prefix} {i}" for i in range(1500)]
+    for i in range(0, len(texts), 25):
+        batch = texts[i:i + 25]
+        cache.put_many(batch, np.stack([vector_for(t) for t in batch]))
+    cache.flush()
+
+
+def test_processes_writing_concurrently(tmp_path):
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=fill_cache, args=(str(tmp_path), prefix)) for prefix in ("a", "b")]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+        assert worker.exitcode == 0
+
+    texts = [f"{prefix} {i}" for prefix in ("a", "b") for i in range(1500)]
+    cache = EmbeddingCache("model", str(tmp_path))
+    assert all(vector is not None for vector in cache.get_many(texts))
+    assert_cached_correctly(cache, texts)
+
+
+def test_managers_share_one_cache_instance(tmp_path):
+    first = resources.get_embedding_cache("model", str(tmp_path))
+    second = resources.get_embedding_cache("model", str(tmp_path))
+    assert first is second
+    resources.release(resources.cache_key("model", str(tmp_path)))
+    resources.release(resources.cache_key("model", str(tmp_path)))
@@ -0,0 +1,29 @@
+# Check that streamed chunks are written in batches the vector store accepts
+import numpy as np
+
+from src.core.embeddings import EmbeddingsManager
+from test_deduplication import HashingModel
+
+
+def test_write_batches_stay_within_the_store_limit():
+    manager = EmbeddingsManager(db_path=None, cache_dir=None, vector_store="numpy")
+    manager._embedding_model = HashingModel()
+    manager.vector_store.max_batch_size = 50
+    written = []
+    upsert = manager.vector_store.upsert
+    manager.vector_store.upsert = lambda ids, *args: (written.append(len(ids)), upsert(ids, *args))
+
+    documents = ({'content': f"chunk number {i} of the guide", 'source': "guide.pdf",
+                  'chunk_id': i, 'doc_type': 'pdf'} for i in range(230))
+    batches = []
+    total = manager.add_documents_stream(documents, encode_batch_size=64, write_batch_size=512,
+                                         progress_callback=lambda stats: batches.append(stats['batches']))
+    assert total == 230 == manager.vector_store.count()
+    assert max(written) <= 50 and sum(written) == 230
+    assert batches[-1] == len(written)
+    # Each chunk is stored with its own embedding across the batch boundaries
+    stored = manager.vector_store.get(ids=["guide.pdf_49", "guide.pdf_50", "guide.pdf_229"],
+                                      include=['embeddings', 'documents'])
+    expected = HashingModel().encode(stored['documents'])
+    for embedding, vector in zip(stored['embeddings'], expected):
+        np.testing.assert_allclose(embedding, vector / np.linalg.norm(vector), rtol=1e-5)
@@ -1,26 +1,20 @@
 # Test hybrid approach: keyword + semantic search
 from src.core.document_processor import DocumentProcessor
 from src.core.embeddings import EmbeddingsManager
-import re
+from src.core.retriever import HybridRetriever
 
 print("🔍 Testing Hybrid Search (Keyword + Semantic)")
 print("=" * 60)
 
-# Set up system
+# Set up system: one index, built once
 processor = DocumentProcessor(chunk_size=400, chunk_overlap=50)  # Smaller chunks
 docs = processor.process_documents("data/sample_docs")
+# In-memory store, so the test never writes into the shared vector database
+embeddings_manager = EmbeddingsManager(db_path=None, vector_store="numpy")
+embeddings_manager.add_documents(docs)
+retriever = HybridRetriever(embeddings_manager)
 
-# Create a simple keyword filter function
-def keyword_filter(docs, keywords):
-    """Filter documents that contain any of the keywords"""
-    filtered = []
-    for doc in docs:
-        content_lower = doc['content'].lower()
-        if any(keyword.lower() in content_lower for keyword in keywords):
-            filtered.append(doc)
-    return filtered
-
-# Test questions with keyword pre-filtering
+# Test questions and the keywords a good hit should contain
 test_cases = [
     {
         "question": "SSL certificate setup",
@@ -42,31 +36,28 @@ for i, test in enumerate(test_cases, 1):
     print(f"Keywords: {test['keywords']}")
     print("-" * 50)
     
-    # Step 1: Filter by keywords first
-    keyword_filtered = keyword_filter(docs, test['keywords'])
-    print(f"📝 Keyword filter found: {len(keyword_filtered)} relevant chunks")
+    # BM25 keyword scores and vector similarity are fused in a single query
+    results = retriever.search(test['question'], n_results=3)
     
-    if keyword_filtered:
-        # Step 2: Use embeddings on the filtered set
-        embeddings_manager = EmbeddingsManager()
-        embeddings_manager.add_documents(keyword_filtered)
+    for j, result in enumerate(results, 1):
+        content_lower = result['content'].lower()
+        has_keywords = any(keyword in content_lower for keyword in test['keywords'])
+        vector_score = result['vector_score']
+        vector_text = f"{vector_score:.3f}" if vector_score is not None else "-"
+        content = result['content'][:200].replace('\n', ' ')
         
-        results = embeddings_manager.search_similar(test['question'], n_results=min(3, len(keyword_filtered)))
+        print(f"\n  Result {j}: Hybrid {result['similarity_score']:.3f}, "
+              f"BM25 {result['keyword_score']:.2f}, Vector {vector_text}")
+        print(f"  Content: {content}...")
         
-        for j, result in enumerate(results, 1):
-            score = result['similarity_score']
-            content = result['content'][:200].replace('\n', ' ')
-            
-            print(f"\n  Result {j}: Score {score:.3f}")
-            print(f"  Content: {content}...")
-            
-            if score > 0.3:
-                print(f"  ✅ Reasonable match!")
-            else:
-                print(f"  ⚠️ Low semantic score but contains keywords")
-    else:
-        print("❌ No chunks found with those keywords")
+        if has_keywords:
+            print(f"  ✅ Contains keywords!")
+        else:
+            print(f"  ⚠️ Semantic match only")
+    
+    if not results:
+        print("❌ No chunks found")
 
 print(f"\n{'='*60}")
-print("💡 Hybrid approach: Filter by keywords first, then semantic search")
-print("This should give better results for technical content!")
\ No newline at end of file
+print("💡 Hybrid approach: BM25 keyword index fused with semantic search")
+print("This should give better results for technical content!")
@@ -0,0 +1,51 @@
+# Check that importing the core modules stays fast and leaves heavy dependencies unloaded
+import json
+import subprocess
+import sys
+
+# Seconds allowed for a fresh interpreter to import every core module
+IMPORT_BUDGET = 1.5
+
+CORE_MODULES = [
+    "src.core.document_processor",
+    "src.core.embeddings",
+    "src.core.ingestion",
+    "src.core.retriever",
+    "src.core.reranker",
+    "src.core.chat_bot",
+    "src.core.context_builder",
+]
+
+# Modules that must only be imported on first use
+HEAVY_MODULES = ["torch", "sentence_transformers", "chromadb", "langchain"]
+
+PROBE = f"""
+import json, sys, time
+start = time.perf_counter()
+for name in {CORE_MODULES!r}:
+    __import__(name)
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'loaded': [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def measure_imports():
+    """Import time and heavy modules loaded, measured in a fresh interpreter"""
+    output = subprocess.run([sys.executable, "-c", PROBE], capture_output=True, text=True, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def test_import_time():
+    result = measure_imports()
+    assert not result['loaded'], f"Imported at module load: {result['loaded']}"
+    assert result['seconds'] < IMPORT_BUDGET, f"Core imports took {result['seconds']:.2f}s"
+
+
+if __name__ == "__main__":
+    print("⏱️ Measuring Core Import Time")
+    print("=" * 50)
+    result = measure_imports()
+    print(f"Import time: {result['seconds']:.3f}s (budget {IMPORT_BUDGET}s)")
+    print(f"Heavy modules loaded: {result['loaded'] or 'none'}")
+    test_import_time()
+    print("✅ Import budget met")
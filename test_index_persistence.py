@@ -0,0 +1,78 @@
+# Check that the companion indexes only rewrite their files when something changed
+import os
+
+import numpy as np
+
+from src.core.dedup import NearDuplicateIndex
+from src.core.retriever import BM25Index
+from src.core.vector_store import NumpyVectorStore
+
+TEXTS = ["restart the gateway with the restart command", "renew the SSL certificate before it expires"]
+METADATAS = [{'source': 'a.pdf', 'doc_type': 'pdf', 'chunk_id': i} for i in range(len(TEXTS))]
+
+
+def modified(path):
+    return os.stat(path).st_mtime_ns
+
+
+def test_bm25_index_saves_only_changes(tmp_path):
+    path = str(tmp_path / "bm25_index.json")
+    index = BM25Index(path)
+    index.add(["a_0", "a_1"], TEXTS, METADATAS)
+    index.save()
+    written = modified(path)
+
+    reloaded = BM25Index(path)
+    reloaded.save()
+    reloaded.remove(["missing"])
+    reloaded.save()
+    assert modified(path) == written
+
+    reloaded.remove(["a_0"])
+    reloaded.save()
+    assert len(BM25Index(path)) == 1
+
+
+def test_numpy_store_saves_only_changes(tmp_path):
+    path = str(tmp_path / "numpy_store")
+    store = NumpyVectorStore(path)
+    store.upsert(["a_0", "a_1"], np.eye(2, 4, dtype=np.float32), TEXTS, METADATAS)
+    store.save()
+    written = modified(os.path.join(path, "records.json"))
+
+    reloaded = NumpyVectorStore(path)
+    reloaded.save()
+    reloaded.delete(ids=["missing"])
+    reloaded.save()
+    assert modified(os.path.join(path, "records.json")) == written
+
+    reloaded.delete(where={'chunk_id': 1})
+    reloaded.save()
+    assert NumpyVectorStore(path).ids == ["a_0"]
+
+
+def test_duplicate_index_saves_only_changes(tmp_path):
+    path = str(tmp_path / "near_duplicates")
+    index = NearDuplicateIndex(path)
+    documents = [dict(metadata, content=text) for text, metadata in zip(TEXTS, METADATAS)]
+    index.filter(documents + [dict(documents[0], chunk_id=2)], ["a_0", "a_1", "a_2"])
+    index.save()
+    written = modified(os.path.join(path, "index.json"))
+
+    reloaded = NearDuplicateIndex(path)
+    reloaded.save()
+    reloaded.remove(["missing"])
+    reloaded.save()
+    assert modified(os.path.join(path, "index.json")) == written
+
+    reloaded.remove(["a_2"])
+    reloaded.save()
+    assert NearDuplicateIndex(path).stats()['duplicates'] == 0
+
+
+def test_duplicate_index_keeps_encoding_cost(tmp_path):
+    path = str(tmp_path / "near_duplicates")
+    index = NearDuplicateIndex(path)
+    index.record_encoding(chunks=10, seconds=0.5, dimension=384)
+    index.save()
+    assert NearDuplicateIndex(path).stats()['encoding'] == {'chunks': 10, 'seconds': 0.5, 'dimension': 384}
@@ -0,0 +1,114 @@
+# Check that sync_documents skips unchanged PDFs, replaces stale chunks and purges removed files
+from src.core.document_processor import DocumentProcessor
+from src.core.embeddings import EmbeddingsManager
+from src.core.ingestion import IngestionManifest, sync_documents
+from test_deduplication import HashingModel
+
+GATEWAY = ["Restart the DataPower gateway from the web console.",
+           "Use the restart command when the console does not respond.",
+           "Check the system log for errors after the restart."]
+CERTIFICATES = ["Upload the SSL certificate to the cert folder.",
+                "Create a crypto certificate object that points to the file."]
+
+
+def write_pdf(path, pages):
+    """Minimal PDF with one line of text per list item on each page"""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for lines in pages:
+        stream = "BT /F1 10 Tf 50 750 Td " + " ".join(f"({line}) Tj 0 -14 Td" for line in lines) + " ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {len(objects)} 0 R "
+                       "/Resources << /Font << /F1 3 0 R >> >> >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    data, offsets = b"%PDF-1.4\n", []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(data))
+        data += f"{number} 0 obj\n{body}\nendobj\n".encode()
+    xref = len(data)
+    data += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    data += b"".join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+    data += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    path.write_bytes(data)
+
+
+class CountingModel(HashingModel):
+    """Hashing model that remembers how many texts it encoded"""
+
+    encoded = 0
+
+    def encode(self, texts, **kwargs):
+        self.encoded += len(texts)
+        return super().encode(texts, **kwargs)
+
+
+def sync(tmp_path, manager):
+    processor = DocumentProcessor(chunk_size=80, chunk_overlap=0)
+    return sync_documents(str(tmp_path / "docs"), processor, manager,
+                          manifest_path=str(tmp_path / IngestionManifest.FILENAME))
+
+
+def sources(manager):
+    return sorted({metadata['source'] for metadata in manager.vector_store.get()['metadatas']})
+
+
+def test_sync_skips_replaces_and_purges(tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    write_pdf(docs / "DataPower_gateway.pdf", [GATEWAY])
+    write_pdf(docs / "certificates.pdf", [CERTIFICATES])
+    manager = EmbeddingsManager(db_path=None, cache_dir=None, vector_store="numpy")
+    model = manager._embedding_model = CountingModel()
+
+    summary = sync(tmp_path, manager)
+    assert (summary['added'], summary['updated'], summary['removed'], summary['unchanged']) == (2, 0, 0, 0)
+    assert sources(manager) == ["DataPower_gateway.pdf", "certificates.pdf"]
+    gateway_ids = IngestionManifest(str(tmp_path / IngestionManifest.FILENAME)).chunk_ids("DataPower_gateway.pdf")
+    assert len(gateway_ids) > 1
+    assert summary['total_chunks'] == manager.vector_store.count() == len(manager.keyword_index)
+
+    # Nothing changed: no file is extracted or encoded again
+    encoded = model.encoded
+    summary = sync(tmp_path, manager)
+    assert (summary['added'], summary['updated'], summary['unchanged']) == (0, 0, 2)
+    assert model.encoded == encoded
+
+    # A shorter revision replaces the file's chunks, and its dropped chunks are deleted
+    write_pdf(docs / "DataPower_gateway.pdf", [GATEWAY[:1]])
+    summary = sync(tmp_path, manager)
+    assert (summary['updated'], summary['unchanged']) == (1, 1)
+    manifest = IngestionManifest(str(tmp_path / IngestionManifest.FILENAME))
+    new_ids = manifest.chunk_ids("DataPower_gateway.pdf")
+    assert len(new_ids) < len(gateway_ids)
+    for chunk_id in set(gateway_ids) - set(new_ids):
+        assert manager.keyword_index.get(chunk_id) is None
+        assert not manager.vector_store.get(ids=[chunk_id])['ids']
+    stored = manager.vector_store.get(where={'source': "DataPower_gateway.pdf"}, include=['documents'])
+    assert sorted(stored['ids']) == sorted(new_ids)
+    assert "system log" not in " ".join(stored['documents'])
+
+    # A file removed from the folder is purged from the store, the keyword index and the manifest
+    (docs / "certificates.pdf").unlink()
+    summary = sync(tmp_path, manager)
+    assert (summary['removed'], summary['unchanged']) == (1, 1)
+    assert sources(manager) == ["DataPower_gateway.pdf"]
+    assert manager.keyword_index.ids_where({'source': "certificates.pdf"}) == []
+    assert "certificates.pdf" not in IngestionManifest(str(tmp_path / IngestionManifest.FILENAME)).files
+
+
+def test_changed_chunking_re_ingests_everything(tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    write_pdf(docs / "certificates.pdf", [CERTIFICATES])
+    manager = EmbeddingsManager(db_path=None, cache_dir=None, vector_store="numpy")
+    manager._embedding_model = HashingModel()
+    sync(tmp_path, manager)
+
+    processor = DocumentProcessor(chunk_size=400, chunk_overlap=0)
+    summary = sync_documents(str(docs), processor, manager,
+                             manifest_path=str(tmp_path / IngestionManifest.FILENAME))
+    assert (summary['added'], summary['unchanged']) == (1, 0)
+    assert manager.vector_store.get()['ids'] == ["certificates.pdf_0"]
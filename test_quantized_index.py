@@ -0,0 +1,96 @@
+# Check that the quantized index survives repeated save/reload cycles and ranks like float search
+import numpy as np
+
+from src.core.quantized_index import QuantizedIndex, compute_distances, measure_recall
+
+
+def make_vectors(count=200, dim=32, seed=0):
+    """Random float32 vectors and their IDs"""
+    rng = np.random.RandomState(seed)
+    return [f"chunk-{i}" for i in range(count)], rng.randn(count, dim).astype(np.float32)
+
+
+def test_save_reload_save(tmp_path):
+    ids, vectors = make_vectors()
+    path = str(tmp_path / "quantized")
+    index = QuantizedIndex(path, precision="binary", space="cosine")
+    index.add(ids, vectors)
+    index.save()
+
+    # The reloaded index maps its arrays from the files it saves over
+    reloaded = QuantizedIndex(path, precision="binary", space="cosine")
+    assert isinstance(reloaded.int8_codes, np.memmap)
+    reloaded.save()
+    assert reloaded.search(vectors[5], 1)[0][0] == "chunk-5"
+    reloaded.add(["extra"], vectors[:1] * 2)
+    reloaded.remove(ids[:10])
+    reloaded.save()
+    reloaded.save()
+
+    again = QuantizedIndex(path, precision="binary", space="cosine")
+    assert again.ids == ids[10:] + ["extra"]
+    np.testing.assert_array_equal(np.asarray(again.int8_codes), np.asarray(reloaded.int8_codes))
+    np.testing.assert_array_equal(again.scales, reloaded.scales)
+    assert again.search(vectors[20], 1)[0][0] == "chunk-20"
+
+
+def test_writes_leave_the_mapped_arrays_on_disk(tmp_path):
+    ids, vectors = make_vectors()
+    path = str(tmp_path / "quantized")
+    index = QuantizedIndex(path, precision="int8", space="cosine")
+    index.add(ids, vectors)
+    index.save()
+
+    reloaded = QuantizedIndex(path, precision="int8", space="cosine")
+    reloaded.remove(ids[:50])
+    reloaded.add(["chunk-60", "extra"], -vectors[:2])
+    # New rows are kept beside the mapped codes and removed ones are masked until saved
+    assert isinstance(reloaded.int8_codes, np.memmap)
+    assert len(reloaded) == 151
+    assert reloaded.search(-vectors[1], 1)[0][0] == "extra"
+    assert reloaded.search(-vectors[0], 1)[0][0] == "chunk-60"
+    assert not set(reloaded.candidates(vectors[10], 20)) & set(ids[:50])
+
+    reloaded.save()
+    again = QuantizedIndex(path, precision="int8", space="cosine")
+    assert again.ids == ids[50:60] + ids[61:] + ["chunk-60", "extra"]
+    assert again.search(vectors[100], 1)[0][0] == "chunk-100"
+
+
+def test_unchanged_index_is_not_rewritten(tmp_path):
+    ids, vectors = make_vectors(count=20)
+    path = tmp_path / "quantized"
+    index = QuantizedIndex(str(path), precision="int8")
+    index.add(ids, vectors)
+    index.save()
+    written = (path / "int8_codes.npy").stat().st_mtime_ns
+
+    QuantizedIndex(str(path), precision="int8").save()
+    assert (path / "int8_codes.npy").stat().st_mtime_ns == written
+
+
+def test_recall_against_float_search():
+    ids, vectors = make_vectors(count=500, dim=64)
+    queries = make_vectors(count=20, dim=64, seed=1)[1]
+    for space in ("l2", "cosine", "ip"):
+        index = QuantizedIndex(None, precision="int8", space=space)
+        index.add(ids, vectors)
+        assert measure_recall(index, vectors, ids, queries, k=10) >= 0.9
+        # Reported distances stay close to the float distances
+        for chunk_id, distance in index.search(queries[0], 5):
+            exact = compute_distances(queries[0], vectors[ids.index(chunk_id)][None, :], space)[0]
+            assert abs(distance - exact) < 0.05 * max(1.0, abs(exact))
+
+
+def test_int8_scores_match_dequantized_vectors():
+    ids, vectors = make_vectors(count=50)
+    query = make_vectors(count=1, seed=2)[1][0]
+    for space in ("l2", "cosine", "ip"):
+        index = QuantizedIndex(None, precision="int8", space=space)
+        index.add(ids, vectors)
+        codes, scales = index.quantize_int8(vectors)
+        dequantized = codes.astype(np.float32) * scales[:, None]
+        hits = dict(index.search(query, len(ids)))
+        expected = compute_distances(query, dequantized, space)
+        np.testing.assert_allclose([hits[chunk_id] for chunk_id in ids], expected, rtol=1e-4, atol=1e-4)
+        assert set(index.candidates(query, 2)) <= set(ids)
@@ -0,0 +1,26 @@
+# Check that hybrid search tolerates chunks deleted by background ingestion mid-search
+from src.core.embeddings import EmbeddingsManager
+from src.core.retriever import HybridRetriever
+from test_deduplication import HashingModel, INSTALL, RESTART, chunk
+
+
+def test_chunk_deleted_between_keyword_search_and_lookup():
+    manager = EmbeddingsManager(db_path=None, cache_dir=None, vector_store="numpy")
+    manager._embedding_model = HashingModel()
+    manager.add_documents_stream([chunk("a.pdf", INSTALL), chunk("b.pdf", RESTART)])
+    keyword_search = manager.keyword_index.search
+
+    def search_then_delete(query, n_results=10, filters=None):
+        # The ingestion worker finishes deleting b.pdf right after the keyword search
+        results = keyword_search(query, n_results, filters)
+        manager.keyword_index.remove(["b.pdf_0"])
+        return results
+
+    # ...having already deleted it from the vector store
+    manager.vector_store.delete(ids=["b.pdf_0"])
+
+    manager.keyword_index.search = search_then_delete
+    retriever = HybridRetriever(manager)
+    results = retriever.search("restart the gateway", n_results=5, doc_type=["pdf"])
+    assert [result['id'] for result in results] == ["a.pdf_0"]
+    assert manager.keyword_index.ids_where({'source': "a.pdf"}) == ["a.pdf_0"]
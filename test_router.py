@@ -0,0 +1,41 @@
+# Check that the router merges knowledge bases by rank, not by their incomparable scores
+from src.core.router import KnowledgeBaseRouter
+
+
+class FixedSearcher:
+    """Knowledge base that returns the same ranking for every query"""
+
+    def __init__(self, name, scores):
+        self.results = [{'id': f"{name}_{i}", 'content': "", 'metadata': {}, 'similarity_score': score}
+                        for i, score in enumerate(scores)]
+
+    def search(self, query, n_results=5, doc_type=None, source=None):
+        return [dict(result) for result in self.results[:n_results]]
+
+
+def test_single_base_keeps_its_order():
+    # Hybrid scores of keyword hits can be below those of vector-only hits ranked after them
+    router = KnowledgeBaseRouter({'datapower': FixedSearcher("dp", [0.9, 0.3, 0.5, 0.4])})
+    results = router.search("restart the gateway", n_results=4)
+    assert [result['id'] for result in results] == ["dp_0", "dp_1", "dp_2", "dp_3"]
+    assert results[1]['similarity_score'] == 0.3
+
+
+def test_bases_are_interleaved_by_rank():
+    router = KnowledgeBaseRouter({'datapower': FixedSearcher("dp", [0.2, 0.1, 0.05]),
+                                  'api_connect': FixedSearcher("apic", [0.99, 0.98, 0.97])},
+                                 keywords={'datapower': ['datapower']})
+    results = router.search("restart the datapower gateway", n_results=4,
+                            knowledge_bases=['datapower', 'api_connect'])
+    assert [result['id'] for result in results] == ["dp_0", "apic_0", "dp_1", "apic_1"]
+    assert {result['knowledge_base'] for result in results} == {'datapower', 'api_connect'}
+
+
+def test_reranked_results_merge_by_cross_encoder_score():
+    first, second = FixedSearcher("dp", [0.9, 0.8]), FixedSearcher("apic", [0.7, 0.6])
+    for searcher, rerank_scores in ((first, [2.0, -1.0]), (second, [5.0, 1.0])):
+        for result, rerank_score in zip(searcher.results, rerank_scores):
+            result['rerank_score'] = rerank_score
+    router = KnowledgeBaseRouter({'datapower': first, 'api_connect': second})
+    results = router.search("certificates", n_results=4)
+    assert [result['id'] for result in results] == ["apic_0", "dp_0", "apic_1", "dp_1"]